@@ -1,9 +1,31 @@
 """Python file that contains graph and vertex class"""
 
 from __future__ import annotations
-from typing import Any, Union
+from contextlib import nullcontext
+from typing import Any, Iterable, Optional, Union
 import csv
+import heapq
+import time
 import networkx as nx
+import numpy as np
+from similarity_engine import SimilarityEngine
+from similarity_cache import LRUCache
+from graph_metrics import Metrics
+from similarity_index import SimilarityIndex
+from columnar import ColumnarFile, is_columnar
+from review_scores import ReviewColumns, STRATEGIES, row_scores, row_weights
+from review_stream import CHUNK_BYTES, MAX_MEMORY, stream_chunks
+from snapshot import GraphSnapshot, KINDS, open_snapshot, source_key, write_snapshot
+
+# The kinds of vertices, interned as their index in KINDS
+KIND_IDS = {kind: kind_id for kind_id, kind in enumerate(KINDS)}
+# Ways to aggregate the reviews of a (course, professor) pair into the weight of their edge
+AGGREGATES = ("last", "mean", "response", "recency")
+# How much the weight of a review decays for every year it is older than the latest one
+RECENCY_DECAY = 0.5
+# Review items have at most two decimal places, so review scores (see review_score_sum) are whole
+# multiples of 1 / SCORE_UNITS. Summing them in these units is exact, whatever the order of the rows.
+SCORE_UNITS = 4000
 
 
 class Graph:
@@ -13,17 +35,95 @@ class Graph:
     from that class that aren't overridden here.
     """
     _vertices: dict[Any, _Vertex]
+    # Private Instance Attributes:
+    #   - _engine: the precomputed similarity engine used by recommend_courses, or None if it
+    #       has not been built (or the graph changed since it was built)
+    #   - _review_stats: the review statistics of every (course, professor) pair ingested so far,
+    #       by term index, as [score sum, number of reviews, weighted score sum, weight sum], where
+    #       scores are in SCORE_UNITS (see group_reviews)
+    #   - _index: the inverted index used by recommend_courses when the similarity engine has not
+    #       been built, or None if it has not been built (or the graph changed since it was built)
+    #   - _table: the precomputed top courses of every course with their scores, used by
+    #       recommend_courses, or None if no table is used (or the graph changed since)
+    #   - _version: the number of changes made to this graph, used to invalidate cache entries
+    #   - _cache: the cache of similarity scores and top courses, or None if caching is disabled
+    #   - _kind_members: the items of the vertices of every kind, by kind id
+    #   - _metrics: the metrics of the instrumented methods, or None if metrics are disabled
+    _engine: Optional[SimilarityEngine]
+    _index: Optional[SimilarityIndex]
+    _table: Optional[dict[str, list[tuple[str, float]]]]
+    _version: int
+    _cache: Optional[LRUCache]
+    _review_stats: dict[tuple[str, str], dict[int, list]]
+    _kind_members: dict[int, set[Any]]
+    _metrics: Optional[Metrics]
 
     def __init__(self) -> None:
         """Initialize an empty graph (no vertices or edges)."""
         self._vertices = {}
+        self._engine = None
+        self._index = None
+        self._table = None
+        self._version = 0
+        self._cache = None
+        self._review_stats = {}
+        self._kind_members = {kind_id: set() for kind_id in range(len(KINDS))}
+        self._metrics = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot: GraphSnapshot) -> Graph:
+        """Return the graph stored in the given snapshot.
+
+        The vertices and edges are copied out of the memory-mapped arrays of the snapshot, so the
+        returned graph does not depend on the snapshot, and takes as much memory as a graph built
+        from the source files.
+        """
+        graph = cls()
+        vertices = [_Vertex(item, KINDS[kind_id]) for item, kind_id in zip(snapshot.items(), snapshot.kinds.tolist())]
+        indptr = snapshot.indptr.tolist()
+        indices = snapshot.indices.tolist()
+        weights = snapshot.edge_weights()
+
+        for i, v in enumerate(vertices):
+            start, end = indptr[i], indptr[i + 1]
+            v.neighbours = dict(zip([vertices[j] for j in indices[start:end]], weights[start:end]))
+            for u, weight in v.neighbours.items():
+                v.buckets.setdefault(u.kind_id, {})[u] = weight
+            graph._vertices[v.item] = v
+            graph._kind_members[v.kind_id].add(v.item)
+
+        for course_id, professor_id, term, score_sum, count, weighted_sum, weight_sum in snapshot.review_stats():
+            pair = (vertices[course_id].item, vertices[professor_id].item)
+            graph._review_stats.setdefault(pair, {})[term] = [score_sum, count, weighted_sum, weight_sum]
+
+        return graph
+
+    def save_snapshot(self, path: str, key: str = '') -> None:
+        """Save this graph to a binary snapshot at path.
+        key identifies the source files this graph was built from (see snapshot.source_key).
+        """
+        ids = {v: i for i, v in enumerate(self._vertices.values())}
+        review_stats = []
+        for (course, professor), terms in self._review_stats.items():
+            for term, stats in terms.items():
+                review_stats.append((ids[self._vertices[course]], ids[self._vertices[professor]], term, *stats))
+
+        write_snapshot(path, key,
+                       [v.item for v in ids],
+                       [v.kind for v in ids],
+                       [[(ids[u], weight) for u, weight in v.neighbours.items()] for v in ids],
+                       review_stats)
 
     def add_vertex(self, item: Any, kind: str) -> None:
         """Add a vertex with the given item and kind to this graph.
         """
-        mapping = ["course", "programme", "course_level", "breadth_req", "professor"]
-        if item not in self._vertices and kind in mapping:
+        if item not in self._vertices and kind in KIND_IDS:
             self._vertices[item] = _Vertex(item, kind)
+            self._kind_members[KIND_IDS[kind]].add(item)
+            self._engine = None
+            self._index = None
+            self._table = None
+            self._version += 1
 
     def add_edge(self, item1: Any, item2: Any, weight: Union[int, float] = 1) -> None:
         """Add an edge between the two vertices with the given items in this graph,
@@ -34,19 +134,139 @@ class Graph:
             v2 = self._vertices[item2]
 
             # Add the new edge
-            v1.neighbours[v2] = weight
-            v2.neighbours[v1] = weight
+            v1.add_neighbour(v2, weight)
+            v2.add_neighbour(v1, weight)
+            self._engine = None
+            self._index = None
+            self._table = None
+            self._version += 1
         else:
             # We didn't find an existing vertex for both items.
             raise ValueError
 
+    def ingest_reviews(self, rows: Iterable[list[str]], courses_breadthreq_mapping: dict[str, list[int]],
+                       aggregate: str = "last", strategy: str = "default") -> set[str]:
+        """Add the given review rows to this graph in place and return the set of courses they touched.
+
+        Only the missing course, professor, programme, course level and breadth requirement
+        vertices are created. The rows are grouped by (course, professor) first, and every
+        course-professor edge is written once, with the score of the last review of that pair, or
+        a weight aggregated from all its reviews so far (see load_graph). If the similarity engine has been built,
+        only the touched courses are re-encoded in it.
+        Rows of courses that are not in courses_breadthreq_mapping are ignored, and the rows are
+        scored with strategy, which must be the one the reviews of this graph were scored with.
+
+        Preconditions:
+            - every row in rows is a row of a review dataset, split into its columns
+            - courses_breadthreq_mapping was returned by load_course_breadthreqs
+            - aggregate in AGGREGATES
+            - strategy in STRATEGIES
+        """
+        groups = group_reviews(ReviewColumns.from_rows(rows), courses_breadthreq_mapping, strategy)
+        return self.merge_reviews(groups, courses_breadthreq_mapping, aggregate)
+
+    def merge_reviews(self, groups: dict[tuple[str, str], list], courses_breadthreq_mapping: dict[str, list[int]],
+                      aggregate: str = "last", last_scores: Optional[dict[tuple[str, str], float]] = None) -> set[str]:
+        """Add the reviews grouped by group_reviews to this graph in place, as ingest_reviews does,
+        and return the set of courses they touched.
+
+        If last_scores is specified, the course-professor edges are not written yet: the score of
+        the last review of every pair is stored in last_scores instead, so that the edges of the
+        reviews merged in several calls are written once by write_review_edges. The similarity
+        engine and index are then dropped rather than updated.
+        The statistics in groups are moved into this graph, so groups must not be used afterwards.
+
+        Preconditions:
+            - groups was returned by group_reviews(columns, courses_breadthreq_mapping)
+            - aggregate in AGGREGATES
+        """
+        course_level_mapping = {
+            1: {"100": 10, "100/200": 15},
+            2: {"200": 20, "100/200": 15, "200/300": 25},
+            3: {"300": 30, "200/300": 25, "300/400": 35},
+            4: {"400": 40, "300/400": 35}
+        }
+
+        engine, index = self._engine, self._index
+        new_courses = {}
+        for course, professor in groups:
+            # The pairs are in the order of their first row, so vertices are created in that order too.
+            # The vertices of the pairs reviewed before already exist.
+            if (course, professor) in self._review_stats:
+                continue
+            elif course not in self._vertices:
+                new_courses[course] = course_level_mapping[int(course[3:4])]
+                self.add_vertex(course, "course")
+                self.add_vertex(course[0:3], "programme")
+            self.add_vertex(professor, "professor")
+
+            if course in new_courses:
+                for crs_level_key in new_courses[course]:
+                    self.add_vertex(crs_level_key, "course_level")
+
+                for breadthreq in courses_breadthreq_mapping[course]:
+                    self.add_vertex(breadthreq, "breadth_req")
+
+        for course, course_levels in new_courses.items():
+            self.add_edge(course, course[0:3])
+
+            for crs_level_key in course_levels:
+                self.add_edge(course, crs_level_key, course_levels[crs_level_key])
+
+            for breadthreq in courses_breadthreq_mapping[course]:
+                self.add_edge(course, breadthreq)
+
+        # The statistics of groups are moved into self._review_stats rather than copied
+        for pair, (group_stats, _) in groups.items():
+            pair_stats = self._review_stats.setdefault(pair, group_stats)
+            if pair_stats is group_stats:
+                continue
+            for term, term_stats in group_stats.items():
+                totals = pair_stats.setdefault(term, term_stats)
+                if totals is not term_stats:
+                    totals[0] += term_stats[0]
+                    totals[1] += term_stats[1]
+                    totals[2] += term_stats[2]
+                    totals[3] += term_stats[3]
+
+        touched = {course for course, _ in groups}
+        if last_scores is not None:
+            last_scores.update((pair, last_score) for pair, (_, last_score) in groups.items())
+            self._engine = None
+            self._index = None
+            self._table = None
+            return touched
+
+        self.write_review_edges({pair: last_score for pair, (_, last_score) in groups.items()}, aggregate)
+        if engine is not None:
+            engine.update(self, touched)
+            self._engine = engine
+        if index is not None:
+            index.update(self, touched)
+            self._index = index
+
+        return touched
+
+    def write_review_edges(self, last_scores: dict[tuple[str, str], float], aggregate: str = "last") -> None:
+        """Write the edge of every (course, professor) pair in last_scores, with a weight aggregated
+        from the reviews of that pair merged so far, or the score of its last review if aggregate is "last".
+
+        Preconditions:
+            - all(pair in self._review_stats for pair in last_scores)
+            - aggregate in AGGREGATES
+        """
+        for pair in last_scores:
+            if aggregate == "last":
+                self.add_edge(pair[0], pair[1], last_scores[pair])
+            else:
+                self.add_edge(pair[0], pair[1], aggregate_review_score(self._review_stats[pair], aggregate))
+
     def adjacent(self, item1: Any, item2: Any) -> bool:
         """Return whether item1 and item2 are adjacent vertices in this graph.
         Return False if item1 or item2 do not appear as vertices in this graph.
         """
         if item1 in self._vertices and item2 in self._vertices:
-            v1 = self._vertices[item1]
-            return any(v2.item == item2 for v2 in v1.neighbours)
+            return self._vertices[item2] in self._vertices[item1].neighbours
         else:
             return False
 
@@ -60,13 +280,34 @@ class Graph:
         else:
             raise ValueError
 
+    def get_weighted_neighbours(self, item: Any, kind: str = '') -> dict[Any, Union[int, float]]:
+        """Return a mapping from the neighbours of the given item to their edge weights.
+        If kind is specified, only return the neighbours of that kind.
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        if item in self._vertices:
+            v = self._vertices[item]
+            if kind == '':
+                return {u.item: weight for u, weight in v.neighbours.items()}
+            else:
+                return {u.item: weight for u, weight in v.buckets.get(KIND_IDS.get(kind), {}).items()}
+        else:
+            raise ValueError
+
     def get_all_vertices(self, kind: str = '') -> set[str]:
         """Return a set of all vertex items in this graph.
         """
+        start = time.perf_counter() if self._metrics is not None else 0.0
+
         if kind != '':
-            return {v.item for v in self._vertices.values() if v.kind == kind}
+            items = set(self._kind_members.get(KIND_IDS.get(kind), ()))
         else:
-            return set(self._vertices.keys())
+            items = set(self._vertices.keys())
+
+        if self._metrics is not None:
+            self._metrics.record("vertex_scan", time.perf_counter() - start)
+            self._metrics.increment("vertex_scan.items", len(items))
+        return items
 
     def similarity_score(self, item1: str, item2: str) -> float:
         """Get similarity score
@@ -77,41 +318,184 @@ class Graph:
         if item1 not in self._vertices or item2 not in self._vertices:
             raise ValueError
 
-        v1 = self._vertices[item1]
-        v2 = self._vertices[item2]
-        return v1.get_similarity_score(v2)
+        start = time.perf_counter() if self._metrics is not None else 0.0
+
+        if self._cache is not None:
+            key = ("score", frozenset((item1, item2)))
+            score = self._cache.get(key, self._version)
+            if score is None:
+                score = self._vertices[item1].get_similarity_score(self._vertices[item2])
+                self._cache.put(key, score, self._version)
+        else:
+            v1 = self._vertices[item1]
+            v2 = self._vertices[item2]
+            score = v1.get_similarity_score(v2)
+
+        if self._metrics is not None:
+            self._metrics.record("similarity_score", time.perf_counter() - start)
+        return score
+
+    def enable_cache(self, max_bytes: int = 64 * 1024 * 1024) -> LRUCache:
+        """Cache similarity scores and the top courses of every course recommended from now on,
+        within the given memory budget, and return the cache.
+
+        Cache entries are invalidated whenever a vertex or an edge is added. Use the hits,
+        misses and evictions counters of the cache to size it.
+        """
+        self._cache = LRUCache(max_bytes)
+        return self._cache
+
+    def enable_metrics(self, profile_rate: float = 0.0, profile_dir: str = "profiles") -> Metrics:
+        """Count and time the calls to similarity_score, get_all_vertices and the ranking of
+        courses from now on, per recommendation request too, and return the metrics.
+
+        The given fraction of recommendation requests are profiled with cProfile, and their stats
+        saved to profile_dir (see Metrics.profile_next to profile a single request).
+
+        Preconditions:
+            - 0 <= profile_rate <= 1
+        """
+        self._metrics = Metrics(profile_rate, profile_dir)
+        return self._metrics
+
+    def disable_metrics(self) -> None:
+        """Stop collecting metrics."""
+        self._metrics = None
+
+    def build_engine(self) -> SimilarityEngine:
+        """Build the precomputed similarity engine used by recommend_courses and return it.
+
+        The engine is dropped whenever a vertex or an edge is added, so build it again
+        after changing the graph.
+        """
+        self._engine = SimilarityEngine(self)
+        return self._engine
+
+    def build_index(self) -> SimilarityIndex:
+        """Build the inverted index of courses used by recommend_courses and return it.
+
+        With the index, only the courses that share a neighbour with a course are scored,
+        and the scan stops once the top courses can no longer change. Like the similarity
+        engine, the index is dropped whenever a vertex or an edge is added.
+        """
+        self._index = SimilarityIndex(self)
+        return self._index
+
+    def use_recommendation_table(self, table: dict[str, list[tuple[str, float]]]) -> None:
+        """Use the given table of the top courses of every course (see precompute_similarity)
+        in recommend_courses, whenever it is deep enough for the requested limit.
+
+        Like the similarity engine, the table is dropped whenever a vertex or an edge is added.
+
+        Preconditions:
+            - table was computed from a graph with the same vertices and edges as this graph
+        """
+        self._table = table
 
     def recommend_courses(self, courses: list[str], limit: int = 3) -> dict[str, list[str]]:
         """Return a list of up to <limit> recommended courses based on similarity to the list of courses.
 
+        Courses are ranked by similarity score, from highest to lowest, and then by course code.
+        A precomputed recommendation table is used first if there is one. Otherwise, if the
+        similarity engine or the inverted index has been built, it is used to score the courses.
+
         Preconditions:
             - All({course in self._vertices for course in courses})
             - All({self._vertices[course].kind == 'course' for course in courses})
             - limit >= 1
         """
+        with self._metrics.request("recommend_courses") if self._metrics is not None else nullcontext():
+            return {course: [crs for crs, _ in self._ranked_courses(course, limit)] for course in courses}
 
-        recommended_course = {}
-        for course in courses:
-            sub_recommended_course = []
-            sub_recommended_course_mapping = {}
-            for new_crs in self.get_all_vertices("course"):
-                if new_crs in course:
-                    continue
+    def recommend_courses_batch(self, students: list[list[str]], limit: int = 3,
+                                merge: bool = False) -> list[Union[dict[str, list[str]], list[str]]]:
+        """Return the recommended courses of every student in students, in the same order.
 
-                next_index = 0
-                new_crs_score = self.similarity_score(course, new_crs)
-                for crs in sub_recommended_course:
-                    crs_score = sub_recommended_course_mapping[crs]
+        Every distinct course in the batch is only scored once. If merge is False, the
+        recommendation of a student is the same as recommend_courses(courses, limit).
+        Otherwise, it is a single list of up to <limit> courses, ranked by their highest
+        similarity score to any of the student's courses, and excluding the student's courses.
 
-                    if new_crs_score < crs_score or (new_crs_score == crs_score and new_crs > crs):
-                        next_index += 1
+        Preconditions:
+            - All({course in self._vertices for courses in students for course in courses})
+            - All({self._vertices[course].kind == 'course' for courses in students for course in courses})
+            - limit >= 1
+        """
+        with self._metrics.request("recommend_courses_batch") if self._metrics is not None else nullcontext():
+            return self._recommend_courses_batch(students, limit, merge)
+
+    def _recommend_courses_batch(self, students: list[list[str]], limit: int,
+                                 merge: bool) -> list[Union[dict[str, list[str]], list[str]]]:
+        """Return the recommended courses of every student in students, like recommend_courses_batch."""
+        depth = limit
+        if merge:
+            depth += max((len(courses) for courses in students), default=0)
+
+        # Score every distinct course only once
+        ranked = {}
+        for courses in students:
+            for course in courses:
+                if course not in ranked:
+                    ranked[course] = self._ranked_courses(course, depth)
+
+        recommendations = []
+        for courses in students:
+            if not merge:
+                recommendations.append({course: [crs for crs, _ in ranked[course][:limit]] for course in courses})
+                continue
+
+            best_scores = {}
+            for course in courses:
+                for crs, score in ranked[course]:
+                    if crs not in courses and score > best_scores.get(crs, -1.0):
+                        best_scores[crs] = score
+
+            ranking = heapq.nsmallest(limit, ((-score, crs) for crs, score in best_scores.items()))
+            recommendations.append([crs for _, crs in ranking])
+
+        return recommendations
+
+    def _ranked_courses(self, course: str, limit: int) -> list[tuple[str, float]]:
+        """Return up to <limit> courses most similar to course with their similarity scores,
+        ranked from highest to lowest score and then by course code.
+
+        If metrics are enabled, the ranking is timed as "rank.<source>", where source is where
+        the ranking came from: "cache", "table", "engine", "index" or "scan".
+        """
+        start = time.perf_counter() if self._metrics is not None else 0.0
+
+        if self._cache is not None:
+            # A cached ranking of at least <limit> courses, or of every other course, can be reused
+            ranked = self._cache.get(("top", course), self._version)
+            if ranked is not None and (len(ranked[1]) >= limit or len(ranked[1]) < ranked[0]):
+                if self._metrics is not None:
+                    self._metrics.record("rank.cache", time.perf_counter() - start)
+                return ranked[1][:limit]
+
+        if self._table is not None and course in self._table and limit <= len(self._table[course]):
+            source = "table"
+            ranked = self._table[course][:limit]
+        elif self._engine is not None:
+            source = "engine"
+            ranked = self._engine.ranked(course, limit)
+        elif self._index is not None:
+            source = "index"
+            ranked = self._index.ranked(course, limit)
+        else:
+            source = "scan"
+            ranking = []
+            for new_crs in self.get_all_vertices("course"):
+                if new_crs not in course:
+                    ranking.append((-self.similarity_score(course, new_crs), new_crs))
 
-                sub_recommended_course_mapping[new_crs] = new_crs_score
-                sub_recommended_course.insert(next_index, new_crs)
+            ranked = [(crs, -score) for score, crs in heapq.nsmallest(limit, ranking)]
 
-            recommended_course[course] = sub_recommended_course[:limit]
+        if self._cache is not None:
+            self._cache.put(("top", course), (limit, ranked), self._version)
+        if self._metrics is not None:
+            self._metrics.record(f"rank.{source}", time.perf_counter() - start)
 
-        return recommended_course
+        return ranked
 
     def to_networkx(self, max_vertices: int = 5000) -> nx.Graph:
         """Convert this graph into a networkx Graph.
@@ -137,24 +521,78 @@ class Graph:
 
         return graph_nx
 
+    def to_arrays(self, max_vertices: int = 5000, course: Optional[str] = None,
+                  hops: int = 2) -> tuple[list, list[str], np.ndarray, np.ndarray]:
+        """Return the items and kinds of at most max_vertices vertices of this graph, and the edges
+        between them as two arrays of the indices of their endpoints in items.
+
+        If course is given, only the vertices at most hops edges away from course are returned,
+        closest first. Otherwise the vertices are picked in the same order as to_networkx picks them.
+        Unlike to_networkx, this does not build a networkx graph, so it is cheap on large graphs.
+        Raise a ValueError if course does not appear as a vertex in this graph.
+
+        Preconditions:
+            - max_vertices >= 1
+            - hops >= 0
+        """
+        ids = {}
+        if course is not None:
+            if course not in self._vertices:
+                raise ValueError
+            ids[self._vertices[course]] = 0
+            frontier = [self._vertices[course]]
+            for _ in range(hops):
+                next_frontier = []
+                for v in frontier:
+                    for u in v.neighbours:
+                        if u not in ids and len(ids) < max_vertices:
+                            ids[u] = len(ids)
+                            next_frontier.append(u)
+                frontier = next_frontier
+        else:
+            for v in self._vertices.values():
+                if len(ids) >= max_vertices:
+                    break
+                ids.setdefault(v, len(ids))
+                for u in v.neighbours:
+                    if len(ids) >= max_vertices:
+                        break
+                    ids.setdefault(u, len(ids))
+
+        sources, targets = [], []
+        for v, i in ids.items():
+            for u in v.neighbours:
+                j = ids.get(u)
+                if j is not None and i < j:
+                    sources.append(i)
+                    targets.append(j)
+
+        return ([v.item for v in ids], [v.kind for v in ids],
+                np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64))
+
 
 class _Vertex:
     """
 
     Instance Attributes:
         - item: The data stored in this vertex, representing a user or course.
-        - kind: The type of this vertex: 'course', 'programme', 'breath', 'course_level'.
+        - kind_id: The type of this vertex, as an index into KINDS.
         - neighbours: The vertices that are adjacent to this vertex, and their corresponding
             edge weights.
+        - buckets: The same neighbours and edge weights, grouped by kind id.
 
     Representation Invariants:
         - self not in self.neighbours
         - all(self in u.neighbours for u in self.neighbours)
-        - self.kind in {'course', 'programme', 'breadth_req', 'course_level', 'professor'}
+        - 0 <= self.kind_id < len(KINDS)
+        - all(self.buckets[u.kind_id][u] == self.neighbours[u] for u in self.neighbours)
     """
+    # Vertices have no __dict__, which saves about 100 bytes per vertex
+    __slots__ = ("item", "kind_id", "neighbours", "buckets")
     item: Any
-    kind: str
+    kind_id: int
     neighbours: dict[_Vertex, Union[int, float]]
+    buckets: dict[int, dict[_Vertex, Union[int, float]]]
 
     def __init__(self, item: Any, kind: str) -> None:
         """Initialize a new vertex with the given item and kind.
@@ -165,33 +603,40 @@ class _Vertex:
             - kind in {'course', 'programme', 'breadth_req', 'course_level', 'professor'}
         """
         self.item = item
-        self.kind = kind
+        self.kind_id = KIND_IDS[kind]
         self.neighbours = {}
+        self.buckets = {}
+
+    @property
+    def kind(self) -> str:
+        """The type of this vertex: 'course', 'programme', 'breadth_req', 'course_level' or 'professor'."""
+        return KINDS[self.kind_id]
 
     def degree(self) -> int:
         """Return the degree of this vertex."""
         return len(self.neighbours)
 
-    def __weighted_helper(self, other: _Vertex) -> float:
-        """Return the weight between two vertex.
-        """
+    def add_neighbour(self, other: _Vertex, weight: Union[int, float]) -> None:
+        """Make other a neighbour of this vertex with the given edge weight, or update its weight."""
+        self.neighbours[other] = weight
+        self.buckets.setdefault(other.kind_id, {})[other] = weight
 
-        if other in self.neighbours:
-            return self.neighbours[other]
-        else:
-            return 0.0
-
-    def _similarity_score_helper(self, v1: _Vertex, other: _Vertex, v_n_and_u: list[set[_Vertex]], kind: str) -> None:
-        """Helper function of get similarity score"""
-        neighbours_set2 = set(n for n in other.neighbours if n.kind == kind)
-        v_n = v_n_and_u[0]
-        v_u = v_n_and_u[1]
-        for v2 in neighbours_set2:
-            if v1.item == v2.item and self.__weighted_helper(v1) == other.__weighted_helper(v2):
-                v_n.add(v1)
-
-            if v2 not in v_u:
-                v_u.add(v2)
+    def _similarity_score_helper(self, other: _Vertex, kind_id: int) -> tuple[int, int]:
+        """Helper function of get similarity score. Return the number of neighbours of the given kind
+        shared by this vertex and other with the same edge weight, and the number of neighbours of
+        that kind of either vertex.
+        """
+        neighbours1 = self.buckets.get(kind_id, {})
+        neighbours2 = other.buckets.get(kind_id, {})
+        num_shared = 0
+        num_same_weight = 0
+        for v in neighbours1:
+            if v in neighbours2:
+                num_shared += 1
+                if neighbours1[v] == neighbours2[v]:
+                    num_same_weight += 1
+
+        return num_same_weight, len(neighbours1) + len(neighbours2) - num_shared
 
     def get_similarity_score(self, other: _Vertex) -> float:
         """Return the weighted similarity score between this vertex and other.
@@ -204,15 +649,10 @@ class _Vertex:
         else:
             weight = {"programme": 0.4, "professor": 0.2, "breadth_req": 0.2, "course_level": 0.2}
             for kind in weight:
-                v_n = set()
-                v_u = set()
-                neighbours_set1 = set(n for n in self.neighbours if n.kind == kind)
-                for v1 in neighbours_set1:
-                    v_u.add(v1)
-                    self._similarity_score_helper(v1, other, [v_n, v_u], kind)
-
-                if len(v_u) != 0:
-                    weight[kind] *= len(v_n) / len(v_u)
+                len_v_n, len_v_u = self._similarity_score_helper(other, KIND_IDS[kind])
+
+                if len_v_u != 0:
+                    weight[kind] *= len_v_n / len_v_u
                 else:
                     weight[kind] = 0
 
@@ -220,7 +660,9 @@ class _Vertex:
 
 
 def review_score_sum(row: list) -> float:
-    """Helper function of load_graph. Return a sum of review scores."""
+    """Return a sum of review scores.
+    This is the score of a single row; group_reviews scores whole chunks with review_scores.row_scores.
+    """
     sum_of_score = 0
     for score in row[8:17]:
         if score != "N/A":
@@ -229,69 +671,204 @@ def review_score_sum(row: list) -> float:
     return sum_of_score / 40
 
 
-def load_graph(reviews_file: str, course_file: str) -> Graph:
-    """Return a course review graph corresponding to the given datasets.
+def group_reviews(columns: ReviewColumns, courses_breadthreq_mapping: dict[str, list[int]],
+                  strategy: str = "default") -> dict[tuple[str, str], list]:
+    """Helper function of Graph.ingest_reviews. Return the review statistics of the rows in columns,
+    grouped by (course, professor) in the order of their first row.
+
+    Every group is [statistics by term index, score of the last review], where the statistics
+    of a term are [score sum, number of reviews, weighted score sum, weight sum] and scores are
+    in SCORE_UNITS. Rows of courses that are not in courses_breadthreq_mapping are ignored.
+    The score and the weight of every row are computed at once with the given strategy by
+    review_scores.row_scores and row_weights. With the "default" strategy, the score of a row is
+    the same as review_score_sum(row), and its weight is its number of responses (STRSP).
 
     Preconditions:
-        - reviews_file is the path to a CSV file corresponding to the book review data
-          format described on the assignment handout
-        - course_file is the path to a CSV file corresponding to the book data
-          format described on the assignment handout
+        - strategy in STRATEGIES
+    """
+    rows = [i for i, course in enumerate(columns.courses) if course in courses_breadthreq_mapping]
+    if len(rows) == 0:
+        return {}
+
+    # Number the pairs in the order of their first row
+    pair_ids = {}
+    term_indices = {}
+    pairs = []
+    terms = []
+    for i in rows:
+        pairs.append(pair_ids.setdefault((columns.courses[i], columns.professors[i]), len(pair_ids)))
+        term = (columns.terms[i], columns.years[i])
+        if term not in term_indices:
+            term_indices[term] = term_index(*term)
+        terms.append(term_indices[term])
+
+    rows = np.array(rows, dtype=np.int64)
+    pairs = np.array(pairs, dtype=np.int64)
+    terms = np.array(terms, dtype=np.int64)
+    scores = row_scores(columns, strategy)[rows]
+    score_units = np.rint(scores * SCORE_UNITS).astype(np.int64)
+    weights = row_weights(columns, strategy)[rows]
+
+    # Sum the statistics of every (pair, term) in exact integers
+    first_term = int(terms.min())
+    num_terms = int(terms.max()) - first_term + 1
+    keys, key_ids = np.unique(pairs * num_terms + terms - first_term, return_inverse=True)
+    stats = np.zeros((len(keys), 4), dtype=np.int64)
+    np.add.at(stats, key_ids, np.stack([score_units, np.ones_like(score_units), score_units * weights,
+                                        weights], axis=1))
+
+    last_rows = np.zeros(len(pair_ids), dtype=np.int64)
+    np.maximum.at(last_rows, pairs, np.arange(len(rows)))
+    groups = {pair: [{}, score] for pair, score in zip(pair_ids, scores[last_rows].tolist())}
+
+    group_list = list(groups.values())
+    for key, term_stats in zip(keys.tolist(), stats.tolist()):
+        group_list[key // num_terms][0][key % num_terms + first_term] = term_stats
+
+    return groups
+
+
+def term_index(term: str, year: str) -> int:
+    """Helper function of Graph.ingest_reviews. Return the index of the given term,
+    counting the terms (winter, summer and fall) from year 0.
+    """
+    return int(year) * 3 + ["winter", "summer", "fall"].index(term.strip().lower())
 
+
+def aggregate_review_score(stats: dict[int, list], aggregate: str) -> float:
+    """Helper function of Graph.ingest_reviews. Return the aggregate review score of a
+    (course, professor) pair with the given review statistics by term.
+
+    aggregate is one of:
+        - "mean": the mean score of all the reviews
+        - "response": the mean score weighted by the weights of the reviews (by default, the
+          number of students who completed each evaluation, see group_reviews), or the mean
+          score if they are all 0
+        - "recency": the mean score weighted by RECENCY_DECAY for every year between the
+          review and the latest review of the pair
+
+    Preconditions:
+        - aggregate in AGGREGATES and aggregate != "last"
+        - stats != {}
     """
+    terms = sorted(stats)
+    count = sum(stats[term][1] for term in terms)
+    weights = sum(stats[term][3] for term in terms)
 
-    g = Graph()
+    if aggregate == "response" and weights > 0:
+        return sum(stats[term][2] for term in terms) / (weights * SCORE_UNITS)
+    elif aggregate == "recency":
+        decay = [RECENCY_DECAY ** ((terms[-1] - term) / 3) for term in terms]
+        return (sum(d * stats[term][0] for d, term in zip(decay, terms))
+                / (sum(d * stats[term][1] for d, term in zip(decay, terms)) * SCORE_UNITS))
+    else:
+        return sum(stats[term][0] for term in terms) / (count * SCORE_UNITS)
+
+
+def load_course_breadthreqs(course_file: str) -> dict[str, list[int]]:
+    """Return a mapping from every course code in the given course dataset to its breadth requirements.
+    course_file may also be in the columnar format (see columnar.py), in which case only its
+    code and breadth_req columns are read.
+
+    Preconditions:
+        - course_file is the path to a CSV file corresponding to the book data
+          format described on the assignment handout, or to the same data in the columnar format
+    """
     breadthreq_mapping = {"creative and cultural representations (1)": 1,
                           "thought, belief, and behaviour (2)": 2,
                           "society and its institutions (3)": 3,
                           "living things and their environment (4)": 4,
                           "the physical and mathematical universes (5)": 5}
 
-    course_level_mapping = {
-        1: {"100": 10, "100/200": 15},
-        2: {"200": 20, "100/200": 15, "200/300": 25},
-        3: {"300": 30, "200/300": 25, "300/400": 35},
-        4: {"400": 40, "300/400": 35}
-    }
-
     courses_breadthreq_mapping = {}
 
-    with open(course_file, 'r') as f:
-        reader = csv.reader(f, delimiter="|")
-
-        for row in reader:
-            lst = []
-            for breadthreq in row[4].split(","):
-                if breadthreq in breadthreq_mapping:
-                    lst.append(breadthreq_mapping[breadthreq.strip().lower()])
-            courses_breadthreq_mapping[row[0]] = lst
-
-    with open(reviews_file, 'r') as f:
-        reader = csv.reader(f, delimiter=":")
-
-        for row in reader:
-            if row[2] in courses_breadthreq_mapping:
-                mapping = {
-                    "course": row[2],
-                    "course_level": int(row[2][3:4]),
-                    "professor": row[4] + " " + row[5],
-                    "programme": row[2][0:3]
-                }
-                g.add_vertex(mapping["course"], "course")
-                g.add_vertex(mapping["programme"], "programme")
-                g.add_vertex(mapping["professor"], "professor")
-                g.add_edge(mapping["course"], mapping["programme"])
-                g.add_edge(mapping["course"], mapping["professor"], review_score_sum(row))
-
-                course_levels = course_level_mapping[mapping["course_level"]]
-                for crs_level_key in course_levels:
-                    g.add_vertex(crs_level_key, "course_level")
-                    g.add_edge(mapping["course"], crs_level_key, course_levels[crs_level_key])
-
-                breadthreqs = courses_breadthreq_mapping[mapping["course"]]
-                for breadthreq in breadthreqs:
-                    g.add_vertex(breadthreq, "breadth_req")
-                    g.add_edge(mapping["course"], breadthreq)
+    for code, breadthreqs in _course_breadthreq_rows(course_file):
+        lst = []
+        for breadthreq in breadthreqs.split(","):
+            if breadthreq in breadthreq_mapping:
+                lst.append(breadthreq_mapping[breadthreq.strip().lower()])
+        courses_breadthreq_mapping[code] = lst
+
+    return courses_breadthreq_mapping
+
+
+def _course_breadthreq_rows(course_file: str) -> Iterable[tuple[str, str]]:
+    """Helper function of load_course_breadthreqs. Yield the code and the breadth requirements
+    of every course in the given course dataset, in the text or the columnar format."""
+    if is_columnar(course_file):
+        columns = ColumnarFile(course_file)
+        for row_group in range(len(columns.row_group_sizes)):
+            yield from zip(columns.values("code", row_group), columns.values("breadth_req", row_group))
+    else:
+        with open(course_file, 'r') as f:
+            for row in csv.reader(f, delimiter="|"):
+                yield row[0], row[4]
+
+
+def load_graph(reviews_file: str, course_file: str, snapshot_path: str = '', aggregate: str = "last",
+               chunk_bytes: int = CHUNK_BYTES, max_memory: int = MAX_MEMORY, report: bool = False,
+               strategy: str = "default") -> Graph:
+    """Return a course review graph corresponding to the given datasets.
+
+    The weight of the edge of every (course, professor) pair is the score of the last review of
+    that pair by default ("last"). Use "mean", "response" or "recency" to aggregate every review
+    of the pair into the weight instead (see aggregate_review_score). Reviews are scored and
+    weighted with the named strategy of review_scores.STRATEGIES, such as "no_workload", which
+    leaves the workload item out of the scores, or "response_rate", which weights the reviews by
+    their response rate in the "response" aggregate.
+
+    The review dataset is streamed in chunks of about chunk_bytes: a background thread reads and
+    groups the rows of every chunk (see group_reviews), while the groups of the previous chunks
+    are merged into the graph. At most max_memory bytes of chunks are read ahead. If report is
+    True, the number of rows loaded and the rows per second are printed along the way.
+
+    Either dataset may also be in the columnar format (see columnar.py). A columnar review
+    dataset is read a row group at a time instead of in chunks, and only the columns the graph
+    is built from are read.
+
+    If snapshot_path is specified and a snapshot built from the current version of both
+    datasets exists there, the graph is loaded from the snapshot instead. Otherwise, the graph
+    is built from the datasets and then saved to snapshot_path.
+
+    Preconditions:
+        - reviews_file is the path to a CSV file corresponding to the book review data
+          format described on the assignment handout
+        - course_file is the path to a CSV file corresponding to the book data
+          format described on the assignment handout
+        - aggregate in AGGREGATES
+        - strategy in STRATEGIES
+        - chunk_bytes >= 1
+        - max_memory >= chunk_bytes
+    """
+
+    if snapshot_path != '':
+        key = f"{source_key(reviews_file, course_file)}|aggregate={aggregate}|strategy={strategy}"
+        snapshot = open_snapshot(snapshot_path, key)
+        if snapshot is not None:
+            return Graph.from_snapshot(snapshot)
+
+    g = Graph()
+    courses_breadthreq_mapping = load_course_breadthreqs(course_file)
+
+    def group_chunk(text: str) -> dict[tuple[str, str], list]:
+        """Return the review statistics of the rows in a chunk of text."""
+        return group_reviews(ReviewColumns.from_text(text), courses_breadthreq_mapping, strategy)
+
+    if is_columnar(reviews_file):
+        columns = ColumnarFile(reviews_file)
+        chunks = (group_reviews(ReviewColumns.from_columnar(columns, row_group), courses_breadthreq_mapping, strategy)
+                  for row_group in range(len(columns.row_group_sizes)))
+    else:
+        chunks = stream_chunks(reviews_file, group_chunk, chunk_bytes, max_memory, report=report)
+
+    # Every course-professor edge is written once, after the last chunk
+    last_scores = {}
+    for groups in chunks:
+        g.merge_reviews(groups, courses_breadthreq_mapping, aggregate, last_scores)
+    g.write_review_edges(last_scores, aggregate)
+
+    if snapshot_path != '':
+        g.save_snapshot(snapshot_path, key)
 
     return g
 
@@ -301,6 +878,8 @@ if __name__ == "__main__":
 
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ['csv'],
-        'allowed-io': ['load_graph']
+        'extra-imports': ['contextlib', 'csv', 'heapq', 'time', 'networkx', 'numpy', 'columnar', 'similarity_cache',
+                          'similarity_engine', 'similarity_index', 'review_scores', 'review_stream', 'snapshot',
+                          'graph_metrics'],
+        'allowed-io': ['load_graph', 'load_course_breadthreqs']
     })
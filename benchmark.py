@@ -0,0 +1,309 @@
+"""BENCHMARK
+This is a python file that benchmarks the hot paths of the course recommendation system:
+load_graph, Graph.similarity_score, Graph.recommend_courses (with and without the similarity
+engine), Graph.to_networkx and main.__input_similar_helper.
+
+Every dataset is benchmarked in a fresh process, so that a dataset is not affected by the
+ones before it. The bundled review datasets are benchmarked as they are, and
+review_full.csv is also scaled up: copy i of every course and professor gets the suffix i
+(see scale_dataset), so a scale of 10 has 10 times the courses, professors and reviews.
+Synthetic datasets of any number of programmes can be benchmarked too (see synthetic_dataset.py).
+
+Every operation is repeated until it has run for at least min_seconds (or max_ops times), with
+inputs drawn from a seeded random generator. It is then called once more with tracemalloc on, to
+measure its peak memory (which is not timed, as tracing slows down allocations). The results
+are saved as JSON: {"meta": {...}, "results": {"<dataset>/<operation>": {"seconds": total wall
+time, "ops": number of operations, "ops_per_sec": ..., "peak_memory_bytes": the most memory
+allocated at once by one call of the operation, including numpy arrays}}}
+
+Usage:
+    python benchmark.py                                  # run and save benchmark_results.json
+    python benchmark.py --save-baseline                  # also save the results as the baseline
+    python benchmark.py --baseline benchmark_baseline.json --threshold 0.2
+    python benchmark.py --datasets --scales --synthetic 1000 5000  # synthetic datasets only
+Unless --save-baseline is given, the results are compared with the baseline whenever the
+baseline file exists, and the script exits with status 1 if an operation got more than
+threshold (20%) slower than in the baseline, or its peak memory grew by more than threshold.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+import base
+from fuzzy_index import FuzzyIndex
+from synthetic_dataset import DatasetConfig, generate_dataset
+
+COURSE_FILE = "dataset/course.csv"
+DATASETS = {
+    "small": "dataset/review_small.csv",
+    "medium": "dataset/review_medium.csv",
+    "large": "dataset/review_large.csv",
+    "full": "dataset/review_full.csv"
+}
+# The directory of the scaled datasets
+SCALED_DIR = "dataset/benchmark"
+# Peak memory increases smaller than this are not reported as regressions
+MIN_MEMORY_REGRESSION_BYTES = 4 * 1024 * 1024
+
+
+def scale_dataset(reviews_file: str, course_file: str, scale: int, save_dir: str) -> tuple[str, str]:
+    """Write a copy of the given datasets with every course and professor copied scale times,
+    and return the paths of the new review and course datasets.
+
+    Copy 0 is the original data, and copy i > 0 appends i to every course code and professor
+    last name, so the programme and course level of every course are kept. The files are
+    written line by line, and are not written again if they already exist.
+
+    Preconditions:
+        - scale >= 1
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(reviews_file))[0]
+    scaled_reviews = os.path.join(save_dir, f"{name}_x{scale}.csv")
+    scaled_courses = os.path.join(save_dir, f"course_x{scale}.csv")
+    width = len(str(scale - 1))
+
+    if not os.path.isfile(scaled_courses):
+        with open(course_file, 'r') as f, open(scaled_courses + ".tmp", 'w') as w:
+            lines = f.readlines()
+            for i in range(scale):
+                suffix = f"{i:0{width}}" if i > 0 else ""
+                for line in lines:
+                    code, rest = line.split("|", 1)
+                    w.write(f"{code}{suffix}|{rest}")
+        os.replace(scaled_courses + ".tmp", scaled_courses)
+
+    if not os.path.isfile(scaled_reviews):
+        with open(reviews_file, 'r') as f, open(scaled_reviews + ".tmp", 'w') as w:
+            lines = f.readlines()
+            for i in range(scale):
+                suffix = f"{i:0{width}}" if i > 0 else ""
+                for line in lines:
+                    row = line.split(":")
+                    row[2] += suffix
+                    row[4] += suffix
+                    w.write(":".join(row))
+        os.replace(scaled_reviews + ".tmp", scaled_reviews)
+
+    return scaled_reviews, scaled_courses
+
+
+def _peak_memory(operation: Callable[[int], Any], i: int) -> int:
+    """Call operation(i) and return the most memory it allocated at once, in bytes, as traced by
+    tracemalloc. The memory allocated before the call is not counted.
+    """
+    tracemalloc.start()
+    try:
+        operation(i)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(operation: Callable[[int], Any], min_seconds: float, max_ops: int) -> dict[str, Any]:
+    """Call operation(i) for i = 0, 1, ... until it ran for at least min_seconds or max_ops times,
+    and return its timing, and the peak memory of one more call of operation(0).
+    """
+    ops = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while ops < max_ops and (ops == 0 or elapsed < min_seconds):
+        operation(ops)
+        ops += 1
+        elapsed = time.perf_counter() - start
+
+    return {"seconds": elapsed, "ops": ops, "ops_per_sec": ops / max(elapsed, 1e-12),
+            "peak_memory_bytes": _peak_memory(operation, 0)}
+
+
+def _typo(item: str, rng: random.Random) -> str:
+    """Return item with one of its characters replaced."""
+    i = rng.randrange(len(item))
+    return item[:i] + rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") + item[i + 1:]
+
+
+def run_dataset(reviews_file: str, course_file: str, seed: int = 0, min_seconds: float = 1.0,
+                max_ops: int = 1000) -> dict[str, dict[str, Any]]:
+    """Benchmark every operation on the given datasets and return the results, by operation.
+
+    Preconditions:
+        - min_seconds >= 0
+        - max_ops >= 1
+    """
+    import main
+
+    rng = random.Random(seed)
+    results = {}
+    with open(reviews_file, 'r') as f:
+        num_rows = sum(1 for _ in f)
+
+    graphs = []
+
+    def load(_: int) -> None:
+        graphs.clear()
+        graphs.append(base.load_graph(reviews_file, course_file))
+
+    results["load_graph"] = _measure(load, min_seconds, max_ops)
+    results["load_graph"]["rows"] = num_rows
+    results["load_graph"]["rows_per_sec"] = num_rows * results["load_graph"]["ops_per_sec"]
+    graph = graphs[0]
+
+    courses = sorted(graph.get_all_vertices("course"))
+    pairs = [(rng.choice(courses), rng.choice(courses)) for _ in range(max_ops)]
+    queries = [rng.choice(courses) for _ in range(max_ops)]
+    results["similarity_score"] = _measure(lambda i: graph.similarity_score(*pairs[i]), min_seconds, max_ops)
+    results["recommend_courses"] = _measure(lambda i: graph.recommend_courses([queries[i]], 3), min_seconds, max_ops)
+    results["build_engine"] = _measure(lambda _: graph.build_engine(), min_seconds, 1)
+    results["recommend_courses_engine"] = _measure(lambda i: graph.recommend_courses([queries[i]], 3),
+                                                   min_seconds, max_ops)
+    results["to_networkx"] = _measure(lambda _: graph.to_networkx(), min_seconds, max_ops)
+
+    lookups = [FuzzyIndex([])]
+
+    def build_lookup(_: int) -> None:
+        lookups[0] = FuzzyIndex(courses)
+
+    results["fuzzy_index_build"] = _measure(build_lookup, min_seconds, max_ops)
+    typos = [_typo(rng.choice(courses), rng) for _ in range(max_ops)]
+    similar_helper = getattr(main, "__input_similar_helper")
+    results["input_similar_helper"] = _measure(lambda i: similar_helper(typos[i], lookups[0]), min_seconds, max_ops)
+
+    for result in results.values():
+        result["courses"] = len(courses)
+    return results
+
+
+def run(datasets: dict[str, tuple[str, str]], seed: int = 0, min_seconds: float = 1.0,
+        max_ops: int = 1000) -> dict[str, Any]:
+    """Benchmark every dataset in datasets, a mapping from dataset names to (review file, course file),
+    each in a fresh process, and return the results.
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name, (reviews_file, course_file) in datasets.items():
+        print(f"Benchmarking {name}...")
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            dataset_results = pool.submit(run_dataset, reviews_file, course_file, seed, min_seconds, max_ops).result()
+
+        for operation, result in dataset_results.items():
+            results[f"{name}/{operation}"] = result
+            print(f"  {operation:<26} {result['ops_per_sec']:>14.2f} ops/s  {result['ops']:>6} ops  "
+                  f"{_format_bytes(result['peak_memory_bytes']):>10}")
+
+    meta = {"python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+            "cpu_count": os.cpu_count(), "seed": seed, "min_seconds": min_seconds, "max_ops": max_ops,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.2) -> list[str]:
+    """Return a description of every regression of results against baseline: every operation
+    whose ops/sec dropped by more than threshold, or whose peak memory rose by more than
+    threshold (and by at least MIN_MEMORY_REGRESSION_BYTES). Peak memories are only compared
+    when the baseline has them.
+
+    Preconditions:
+        - 0 <= threshold < 1
+    """
+    regressions = []
+    for key, result in results["results"].items():
+        if key not in baseline["results"]:
+            continue
+
+        before = baseline["results"][key]
+        if result["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{key}: {result['ops_per_sec']:.2f} ops/s, "
+                               f"{1 - result['ops_per_sec'] / before['ops_per_sec']:.0%} slower than the baseline")
+
+        memory, memory_before = result["peak_memory_bytes"], before.get("peak_memory_bytes")
+        if (memory_before is not None and memory > memory_before * (1 + threshold)
+                and memory - memory_before >= MIN_MEMORY_REGRESSION_BYTES):
+            regressions.append(f"{key}: peak memory of {_format_bytes(memory)}, "
+                               f"{_format_bytes(memory - memory_before)} more than the baseline")
+
+    return regressions
+
+
+def _format_bytes(num_bytes: int) -> str:
+    """Return num_bytes in a human-readable unit."""
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.0f} KB"
+    else:
+        return f"{num_bytes / 1024 / 1024:.1f} MB"
+
+
+def _read_json(path: str) -> dict:
+    """Return the JSON object saved at path."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, obj: dict) -> None:
+    """Save obj to path as JSON, through a temporary file."""
+    with open(path + ".tmp", "w") as w:
+        json.dump(obj, w, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['concurrent.futures', 'argparse', 'json', 'multiprocessing', 'os', 'platform', 'random',
+    #                       'sys', 'time', 'numpy', 'base', 'fuzzy_index',
+    #                       'synthetic_dataset', 'tracemalloc', 'main'],
+    #     'allowed-io': ['scale_dataset', 'run_dataset', 'run', '_read_json', '_write_json'],
+    # })
+
+    parser = argparse.ArgumentParser(description="Benchmark the course recommendation system.")
+    parser.add_argument("--datasets", nargs="*", default=list(DATASETS), choices=list(DATASETS),
+                        help="the bundled review datasets to benchmark")
+    parser.add_argument("--scales", nargs="*", type=int, default=[10, 100],
+                        help="the scales of review_full.csv to benchmark")
+    parser.add_argument("--synthetic", nargs="*", type=int, default=[],
+                        help="the numbers of programmes of the synthetic datasets to benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-seconds", type=float, default=1.0,
+                        help="the minimum time to repeat every operation for")
+    parser.add_argument("--max-ops", type=int, default=1000,
+                        help="the maximum number of times to repeat every operation")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="save the results as the new baseline instead of comparing with it")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="the slowdown (or memory growth) over the baseline reported as a regression")
+    args = parser.parse_args()
+
+    selected = {name: (DATASETS[name], COURSE_FILE) for name in args.datasets}
+    for dataset_scale in args.scales:
+        selected[f"full_x{dataset_scale}"] = scale_dataset(DATASETS["full"], COURSE_FILE, dataset_scale, SCALED_DIR)
+    for num_programmes in args.synthetic:
+        selected[f"synthetic_{num_programmes}"] = generate_dataset(
+            DatasetConfig(num_programmes, num_professors=20 * num_programmes, seed=args.seed),
+            os.path.join(SCALED_DIR, f"synthetic_{num_programmes}_seed{args.seed}"))
+
+    benchmark_results = run(selected, args.seed, args.min_seconds, args.max_ops)
+    _write_json(args.output, benchmark_results)
+    print(f"Results saved to {args.output}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, benchmark_results)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.isfile(args.baseline):
+        found = compare(benchmark_results, _read_json(args.baseline), args.threshold)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if len(found) > 0:
+            sys.exit(1)
+        print(f"No regression over {args.baseline} (threshold {args.threshold:.0%})")
@@ -0,0 +1,127 @@
+"""BENCHMARK_SCRAPE
+This is a python file that benchmarks the extraction of reviews from the pages of the
+evaluation grid downloaded by scrape_review: with Beautiful Soup 4 (a tree of the whole page,
+and 18 css queries per review) and with block_parser (one pass over the page, reading the
+cells of every review as they are parsed).
+
+The pages are read from a directory of saved html pages, as returned by EvalPage.get_data,
+or rendered from the rows of a review csv file in the same format as the grid. Both ways of
+extracting are checked to give the same rows, and the results are saved as JSON:
+{"meta": {...}, "results": {"<mode>": {"seconds": total wall time, "pages": ..., "rows": ...,
+"rows_per_sec": ...}}}
+
+Usage:
+    python benchmark_scrape.py                          # pages rendered from review_large.csv
+    python benchmark_scrape.py --pages <directory>      # saved pages, every *.html file
+"""
+
+from __future__ import annotations
+from html import escape
+from typing import Any
+import argparse
+import glob
+import json
+import os
+import platform
+import time
+from dataset_util import in_a_row
+from scrape_review import REVIEW_COLUMNS, get_review_info_from_page
+
+# The ways reviews are extracted, by the value of streaming in get_review_info_from_page
+MODES = {"beautifulsoup": False, "streaming": True}
+
+
+def render_review_page(rows: list[list[str]]) -> str:
+    """Return a page of the evaluation grid showing the given rows of a review csv file, as
+    returned by EvalPage.get_data.
+
+    Preconditions:
+        - all(len(row) == len(REVIEW_COLUMNS) for row in rows)
+    """
+    trs = []
+    for row in rows:
+        dept, div, code, lec, *rest = row
+        # The grid shows the course code and the lecture in a single cell
+        cells = [dept, div, f"{code}-{lec}"] + rest
+        tds = "".join(f'<td class="gCell">{escape(cell)}</td>' for cell in cells)
+        trs.append(f'<tr class="gData" sk="{escape(code)}">{tds}</tr>')
+
+    table_html = f'<table id="fbvGrid"><tbody>{"".join(trs)}</tbody></table>'
+    return f"<!DOCTYPE html></html><body>{table_html}</body></html>"
+
+
+def load_pages(pages_dir: str = "", reviews_file: str = "dataset/review_large.csv",
+               max_records: int = 100) -> list[str]:
+    """Return every *.html page of pages_dir, in the order of their names, or, if pages_dir is
+    empty, the pages showing the reviews of reviews_file, max_records at a time.
+    """
+    if pages_dir != "":
+        pages = []
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append(f.read())
+        return pages
+
+    with open(reviews_file, "r") as f:
+        rows = [line.rstrip("\n").split(":") for line in f if not line.startswith("#")]
+    return [render_review_page(rows[i:i + max_records]) for i in range(0, len(rows), max_records)]
+
+
+def run(pages: list[str], min_seconds: float = 1.0) -> dict[str, Any]:
+    """Extract the rows of every page in every mode, repeating the pages until it took at least
+    min_seconds, and return the timings. Raise ValueError if the modes give different rows.
+    """
+    results = {}
+    expected = None
+    for mode, streaming in MODES.items():
+        rows = [in_a_row(review_data, REVIEW_COLUMNS) for page in pages
+                for review_data in get_review_info_from_page(page, streaming)]
+        if expected is None:
+            expected = rows
+        elif rows != expected:
+            raise ValueError(f"{mode} extracted different rows")
+
+        num_pages, num_rows = 0, 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while num_pages == 0 or elapsed < min_seconds:
+            for page in pages:
+                num_rows += len(get_review_info_from_page(page, streaming))
+            num_pages += len(pages)
+            elapsed = time.perf_counter() - start
+
+        results[mode] = {"seconds": elapsed, "pages": num_pages, "rows": num_rows,
+                         "rows_per_sec": num_rows / max(elapsed, 1e-12)}
+
+    return {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                     "num_pages": len(pages), "num_rows": len(expected)},
+            "results": results}
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['html', 'argparse', 'glob', 'json', 'os', 'platform', 'time', 'dataset_util',
+    #                       'scrape_review'],
+    #     'allowed-io': ['load_pages'],
+    # })
+
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of reviews from evaluation pages.")
+    parser.add_argument("--pages", default="", help="a directory of saved evaluation pages (*.html)")
+    parser.add_argument("--reviews", default="dataset/review_large.csv",
+                        help="the review csv file to render pages from, without --pages")
+    parser.add_argument("--max-records", type=int, default=100, help="the number of reviews of every rendered page")
+    parser.add_argument("--min-seconds", type=float, default=1.0,
+                        help="the minimum time to repeat the extraction for, in every mode")
+    parser.add_argument("--output", default="benchmark_scrape_results.json")
+    args = parser.parse_args()
+
+    benchmark_results = run(load_pages(args.pages, args.reviews, args.max_records), args.min_seconds)
+    for benchmark_mode, result in benchmark_results["results"].items():
+        print(f"{benchmark_mode:>14}: {result['rows_per_sec']:>10.0f} rows/s "
+              f"({result['rows']} rows in {result['seconds']:.2f}s)")
+    with open(args.output + ".tmp", "w") as w:
+        json.dump(benchmark_results, w, indent=2)
+    os.replace(args.output + ".tmp", args.output)
+    print(f"Results saved to {args.output}")
@@ -0,0 +1,404 @@
+"""
+This is a helper module for scrape_course to extract information from html pages as they are parsed.
+
+A BlockParser finds the blocks of a page matching a CSS selector, and the text of the first
+element matching a CSS selector within every block, exactly as dataset_util.get_info_from_html
+does on a BeautifulSoup tree, along with attributes of the element of every block. But instead of building the tree
+of the whole page, it only keeps the open elements and the text of the fields being read, and
+produces the information of every block as soon as the block is closed.
+
+Only selectors made of tag names, class names and :nth-child(n) with a number n are supported,
+like ".a.b", ".a .b" (an element of class b inside an element of class a) or "td:nth-child(3)"
+(a td element that is the third element in its parent).
+"""
+
+from __future__ import annotations
+from codecs import getincrementaldecoder
+from html.parser import HTMLParser
+from typing import Iterator, Optional, Union
+import re
+from bs4.dammit import EncodingDetector, EntitySubstitution
+
+# The elements that never have content, and so no end tag (as in BeautifulSoup)
+VOID_ELEMENTS = {'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image',
+                 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source',
+                 'spacer', 'track', 'wbr'}
+# The elements whose text is not part of the text of the elements containing them (as in BeautifulSoup)
+STRING_CONTAINERS = {'rt', 'rp', 'style', 'script', 'template'}
+# The elements whose whitespace is kept as it is (as in BeautifulSoup)
+PRESERVE_WHITESPACE = {'pre', 'textarea'}
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+# The number of characters fed to the parser at a time
+CHUNK_CHARS = 64 * 1024
+# An element of a supported selector: a tag name, class names and :nth-child(n), all optional
+COMPOUND_PATTERN = re.compile(r"([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)(?::nth-child\((\d+)\))?")
+
+
+# An element of a selector: its tag, its classes and its position in its parent (see _parse_selector)
+_Compound = tuple[Optional[str], frozenset[str], Optional[int]]
+
+
+class _Block:
+    """The information read so far from a block.
+
+    Instance Attributes:
+        - depth: The depth of the element of the block among the open elements.
+        - fields: The parts of the text of every field found so far, by name.
+        - attributes: The attributes read from the element of the block, by name of the field.
+        - closed: Whether the element of the block has been closed.
+    """
+    depth: int
+    fields: dict[str, list[str]]
+    attributes: dict[str, str]
+    closed: bool
+
+    def __init__(self, depth: int, attributes: dict[str, str]) -> None:
+        """Initialize an open block with no field found yet."""
+        self.depth = depth
+        self.fields = {}
+        self.attributes = attributes
+        self.closed = False
+
+
+class BlockParser(HTMLParser):
+    """An html parser reading the text of fields from every block of a page.
+
+    Instance Attributes:
+        - blocks: The information of the blocks closed so far and not taken yet (see take_blocks),
+          in the order the blocks start in the page.
+    """
+    blocks: list[dict[str, str]]
+    # Private Instance Attributes:
+    #   - _block: the tag, classes and position of the elements of the blocks
+    #   - _selectors: the tag, classes and position of the elements of every field, from the
+    #       outermost to the innermost
+    #   - _attributes: the attribute of the element of the block read into every field
+    #   - _encoding: the encoding the page was decoded from, or None if it was not decoded
+    #   - _stack: the tag, the classes and the position in its parent of every open element,
+    #       from the outermost
+    #   - _num_children: the number of elements opened so far in the page and in every open
+    #       element, from the outermost
+    #   - _containers: the tags of the open elements in STRING_CONTAINERS, from the outermost
+    #   - _open_blocks: the blocks started and not taken yet, in the order they start
+    #   - _captures: the fields whose element is open, as (block, field, depth of the element,
+    #       string container of the element or None)
+    #   - _text: the parts of the current string, the text since the last tag
+    #   - _already_closed: the tags of the elements closed right away (like <br>) whose end tag,
+    #       if the page has one, must be ignored
+    #   - _num_preserving: the number of open elements in PRESERVE_WHITESPACE
+    _block: _Compound
+    _selectors: dict[str, list[_Compound]]
+    _attributes: dict[str, str]
+    _encoding: Optional[str]
+    _stack: list[tuple[str, frozenset[str], int]]
+    _num_children: list[int]
+    _containers: list[str]
+    _open_blocks: list[_Block]
+    _captures: list[tuple[_Block, str, int, Optional[str]]]
+    _text: list[str]
+    _already_closed: list[str]
+    _num_preserving: int
+
+    def __init__(self, block_selector: str, css_selector_mapping: dict[str, str],
+                 encoding: Optional[str] = None, block_attributes: Optional[dict[str, str]] = None) -> None:
+        """Initialize a parser of the blocks matching block_selector, reading the text of the first
+        element matching css_selector_mapping[key] in every block under key, and the attribute
+        block_attributes[key] of the element of every block under key ("" if it has none).
+        encoding is the encoding the page was decoded from, used to read numeric character
+        references like BeautifulSoup does.
+
+        Raise ValueError if a selector is not supported.
+        """
+        super().__init__(convert_charrefs=False)
+        block = _parse_selector(block_selector)
+        if len(block) != 1:
+            raise ValueError(f"Unsupported block selector: {block_selector}")
+
+        self.blocks = []
+        self._block = block[0]
+        self._selectors = {key: _parse_selector(selector) for key, selector in css_selector_mapping.items()}
+        self._attributes = {} if block_attributes is None else block_attributes
+        self._encoding = encoding
+        self._stack = []
+        self._num_children = [0]
+        self._containers = []
+        self._open_blocks = []
+        self._captures = []
+        self._text = []
+        self._already_closed = []
+        self._num_preserving = 0
+
+    def take_blocks(self) -> list[dict[str, str]]:
+        """Return and forget the information of the blocks closed so far."""
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+    def close(self) -> None:
+        """Finish parsing the page, closing every element left open."""
+        super().close()
+        self._end_text()
+        self._pop(0)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        """Open an element. An element that never has content is closed right away."""
+        self._start(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._end(tag)
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        """Open and close an element written like <tag/>."""
+        self._start(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        """Close the innermost open element with the given tag, unless it is the end tag of an
+        element that was closed right away."""
+        if tag in self._already_closed:
+            self._already_closed.remove(tag)
+        else:
+            self._end(tag)
+
+    def handle_data(self, data: str) -> None:
+        """Add text to the current string."""
+        self._text.append(data)
+
+    def handle_entityref(self, name: str) -> None:
+        """Add the character of a named character reference to the current string."""
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name: str) -> None:
+        """Add the character of a numeric character reference to the current string."""
+        if name[:1] in ("x", "X"):
+            codepoint = int(name.lstrip("xX"), 16)
+        else:
+            codepoint = int(name)
+
+        data = None
+        if codepoint < 256:
+            # Numeric references to bytes are often meant in the encoding of the page, or Windows-1252
+            for encoding in (self._encoding, 'windows-1252'):
+                if encoding:
+                    try:
+                        data = bytearray([codepoint]).decode(encoding)
+                    except UnicodeDecodeError:
+                        pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_comment(self, data: str) -> None:
+        """End the current string. Comments are not part of the text of an element."""
+        self._end_text()
+
+    def handle_decl(self, decl: str) -> None:
+        """End the current string. Declarations are not part of the text of an element."""
+        self._end_text()
+
+    def handle_pi(self, data: str) -> None:
+        """End the current string. Processing instructions are not part of the text of an element."""
+        self._end_text()
+
+    def unknown_decl(self, data: str) -> None:
+        """Add the text of a CDATA section to the fields being read."""
+        self._end_text()
+        if data.upper().startswith("CDATA["):
+            self._text.append(data[len("CDATA["):])
+            self._end_text("CDATA")
+        else:
+            self._text.clear()
+
+    def _start(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        """Open an element, and start reading the fields and the block it is the element of."""
+        self._end_text()
+        value = None
+        for name, attr_value in attrs:
+            if name == "class":
+                value = attr_value
+        classes = frozenset(value.split()) if value else frozenset()
+
+        depth = len(self._stack)
+        self._num_children[-1] += 1
+        position = self._num_children[-1]
+        container = tag if tag in STRING_CONTAINERS else None
+        for block in self._open_blocks:
+            if not block.closed:
+                for key, selector in self._selectors.items():
+                    if key not in block.fields and self._matches(selector, tag, classes, position):
+                        block.fields[key] = []
+                        self._captures.append((block, key, depth, container))
+
+        self._stack.append((tag, classes, position))
+        self._num_children.append(0)
+        if container is not None:
+            self._containers.append(container)
+        if tag in PRESERVE_WHITESPACE:
+            self._num_preserving += 1
+        if _compound_matches(self._block, tag, classes, position):
+            attributes = {}
+            if self._attributes:
+                values = {name: attr_value or "" for name, attr_value in attrs}
+                attributes = {key: values.get(name, "") for key, name in self._attributes.items()}
+            self._open_blocks.append(_Block(depth, attributes))
+
+    def _end(self, tag: str) -> None:
+        """Close the innermost open element with the given tag, and the elements inside it.
+        Ignore the end tag if there is no such element."""
+        self._end_text()
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                self._pop(depth)
+                return
+
+    def _end_text(self, kind: Optional[str] = None) -> None:
+        """End the current string, and add it to the fields being read that include text of its
+        kind: the innermost string container around it, "CDATA" for a CDATA section, or None.
+
+        Like in BeautifulSoup, a string of ASCII whitespace is replaced by a single newline, if it
+        has one, or space, unless it is inside a <pre> or <textarea>.
+        """
+        if len(self._text) == 0:
+            return
+
+        text = "".join(self._text)
+        self._text.clear()
+        if self._num_preserving == 0 and text.strip(ASCII_SPACES) == "":
+            text = "\n" if "\n" in text else " "
+
+        if kind is None and self._containers:
+            kind = self._containers[-1]
+        for block, key, _, container in self._captures:
+            if kind == container or (container is None and kind == "CDATA"):
+                block.fields[key].append(text)
+
+    def _matches(self, selector: list[_Compound], tag: str, classes: frozenset[str], position: int) -> bool:
+        """Return whether an element with the given tag and classes, opened inside the open
+        elements at the given position in its parent, matches selector."""
+        if not _compound_matches(selector[-1], tag, classes, position):
+            return False
+
+        i = 0
+        for ancestor in self._stack:
+            if i < len(selector) - 1 and _compound_matches(selector[i], *ancestor):
+                i += 1
+        return i == len(selector) - 1
+
+    def _pop(self, depth: int) -> None:
+        """Close the open elements from the given depth, and the fields and blocks they are the
+        elements of."""
+        while len(self._stack) > depth:
+            tag, _, _ = self._stack.pop()
+            self._num_children.pop()
+            if tag in STRING_CONTAINERS:
+                self._containers.pop()
+            if tag in PRESERVE_WHITESPACE:
+                self._num_preserving -= 1
+
+        self._captures = [capture for capture in self._captures if capture[2] < depth]
+        for block in self._open_blocks:
+            if block.depth >= depth:
+                block.closed = True
+
+        # Blocks are produced in the order they start, so a closed block waits for the blocks around it
+        while self._open_blocks and self._open_blocks[0].closed:
+            block = self._open_blocks.pop(0)
+            data = {key: "".join(block.fields[key]).strip().replace("\n", "")
+                    if key in block.fields else "" for key in self._selectors}
+            data.update(block.attributes)
+            self.blocks.append(data)
+
+
+def stream_blocks(content: Union[bytes, str], block_selector: str, css_selector_mapping: dict[str, str],
+                  chunk_chars: int = CHUNK_CHARS,
+                  block_attributes: Optional[dict[str, str]] = None) -> Iterator[dict[str, str]]:
+    """Yield the information of every block of the html page content matching block_selector,
+    in the order of the page, as a mapping from every key of css_selector_mapping to the text of
+    the first element of the block matching its selector ("" if there is none), and from every
+    key of block_attributes to the value of that attribute of the element of the block ("" if it
+    has none).
+
+    The page is decoded and parsed chunk_chars characters at a time, and the information of a
+    block is yielded as soon as the block is closed. The encoding of a page given as bytes is
+    detected like BeautifulSoup does.
+
+    Preconditions:
+        - chunk_chars >= 1
+    """
+    if isinstance(content, str):
+        parser = BlockParser(block_selector, css_selector_mapping, None, block_attributes)
+        for start in range(0, len(content), chunk_chars):
+            parser.feed(content[start:start + chunk_chars])
+            yield from parser.take_blocks()
+        parser.close()
+        yield from parser.take_blocks()
+        return
+
+    encoding, markup = _detect_encoding(content, chunk_chars)
+    parser = BlockParser(block_selector, css_selector_mapping, encoding, block_attributes)
+    decoder = getincrementaldecoder(encoding)("replace")
+
+    for start in range(0, len(markup), chunk_chars):
+        parser.feed(decoder.decode(markup[start:start + chunk_chars]))
+        yield from parser.take_blocks()
+
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield from parser.take_blocks()
+
+
+def _detect_encoding(content: bytes, chunk_chars: int) -> tuple[str, bytes]:
+    """Return the first encoding, among the ones BeautifulSoup would try, that decodes content,
+    and content without its byte order mark.
+    """
+    detector = EncodingDetector(content, is_html=True)
+    for encoding in detector.encodings:
+        try:
+            decoder = getincrementaldecoder(encoding)()
+            for start in range(0, len(detector.markup), chunk_chars):
+                decoder.decode(detector.markup[start:start + chunk_chars])
+            decoder.decode(b"", final=True)
+            return encoding, detector.markup
+        except (UnicodeDecodeError, LookupError):
+            pass
+
+    return 'windows-1252', detector.markup
+
+
+def _parse_selector(selector: str) -> list[_Compound]:
+    """Return the tag, the classes and the position of every element of a selector made of tag
+    names, class names and :nth-child(n), from the outermost to the innermost. The tag and the
+    position are None if the selector does not specify them.
+    Raise ValueError if the selector has anything else.
+    """
+    compounds = []
+    for compound in selector.split():
+        match = COMPOUND_PATTERN.fullmatch(compound)
+        if match is None:
+            raise ValueError(f"Unsupported selector: {selector}")
+        tag, classes, position = match.groups()
+        compounds.append((tag.lower() if tag else None, frozenset(classes.split(".")[1:]),
+                          int(position) if position else None))
+
+    if len(compounds) == 0:
+        raise ValueError(f"Unsupported selector: {selector}")
+    return compounds
+
+
+def _compound_matches(compound: _Compound, tag: str, classes: frozenset[str], position: int) -> bool:
+    """Return whether an element with the given tag and classes, at the given position in its
+    parent, matches an element of a selector."""
+    return ((compound[0] is None or compound[0] == tag) and compound[1] <= classes
+            and (compound[2] is None or compound[2] == position))
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['codecs', 'html.parser', 're', 'bs4.dammit'],
+    })
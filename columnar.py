@@ -0,0 +1,333 @@
+"""Python file that reads and writes the course and review datasets in a binary columnar format.
+
+A columnar file stores every column of a dataset separately, in row groups of up to
+row_group_rows rows, so a reader only touches the columns it needs (column projection), and a
+writer only holds one row group in memory. Every column has a type:
+  - "dictionary": text with few distinct values (like departments, professors or terms), stored
+    as an index into the list of the distinct values of the column
+  - "string": any text, stored as the offsets of every value into their UTF-8 bytes
+  - "float": a number, stored as a double, with NaN for "N/A"
+  - "int": a whole number, stored as a 64-bit integer, with -1 for "N/A"
+Unlike the text datasets, a value can hold any character, including the delimiter.
+
+The file has the following layout, like a snapshot (see snapshot.py) but with its metadata at
+the end, so that the row groups can be written as they are filled:
+  - MAGIC
+  - the arrays of every row group, each aligned to 8 bytes
+  - the footer, a JSON object with the kind of dataset, the type of every column, the distinct
+    values of every dictionary column, and the number of rows and the offset, dtype and length
+    of every array of every row group
+  - the length of the footer as a little-endian unsigned 64-bit integer, and MAGIC again
+"""
+
+from __future__ import annotations
+from typing import BinaryIO, Iterable, Optional
+import json
+import mmap
+import os
+import struct
+import sys
+import numpy as np
+
+MAGIC = b"CRSCOLS1"
+VERSION = 1
+TYPES = ("dictionary", "string", "float", "int")
+# The default number of rows of a row group
+ROW_GROUP_ROWS = 64 * 1024
+
+# The columns of a review dataset, in the order of the text format (see scrape_review.py)
+REVIEW_SCHEMA = {
+    "dept": "dictionary", "div": "dictionary", "code": "dictionary", "lec": "dictionary",
+    "lname": "dictionary", "fname": "dictionary", "term": "dictionary", "year": "dictionary",
+    "item1": "float", "item2": "float", "item3": "float", "item4": "float", "item5": "float",
+    "item6": "float", "item9": "float", "item10": "float", "item11": "float",
+    "stnum": "int", "strsp": "int"
+}
+# The columns of a course dataset, in the order of the text format (see scrape_course.py)
+COURSE_SCHEMA = {"code": "string", "name": "string", "prereq": "string", "coreq": "string",
+                 "breadth_req": "dictionary"}
+# The delimiter of every dataset in the text format
+DELIMITERS = {"reviews": ":", "courses": "|"}
+SCHEMAS = {"reviews": REVIEW_SCHEMA, "courses": COURSE_SCHEMA}
+
+
+class ColumnarWriter:
+    """A writer of a columnar file, one row group at a time.
+
+    The file is written to a temporary file first, and only replaces path once the writer is
+    closed, so an existing file at path is never left half written.
+
+    Instance Attributes:
+        - path: The path of the file.
+        - kind: The kind of dataset written.
+        - schema: The type of every column, by name, in the order of the values of a row.
+        - row_group_rows: The largest number of rows of a row group.
+        - num_rows: The number of rows written so far.
+
+    Representation Invariants:
+        - all(column_type in TYPES for column_type in self.schema.values())
+        - self.row_group_rows >= 1
+    """
+    path: str
+    kind: str
+    schema: dict[str, str]
+    row_group_rows: int
+    num_rows: int
+    # Private Instance Attributes:
+    #   - _file: the temporary file written to, or None once the writer is closed
+    #   - _dictionaries: the index of every distinct value of every dictionary column
+    #   - _values: the values of every column of the row group being filled
+    #   - _row_groups: the number of rows and the arrays of every row group written
+    _file: Optional[BinaryIO]
+    _dictionaries: dict[str, dict[str, int]]
+    _values: list[list[str]]
+    _row_groups: list[dict]
+
+    def __init__(self, path: str, kind: str, schema: Optional[dict[str, str]] = None,
+                 row_group_rows: int = ROW_GROUP_ROWS) -> None:
+        """Start writing a columnar file of the given kind of dataset to path, with the columns
+        of schema, or of SCHEMAS[kind] if schema is None.
+
+        Preconditions:
+            - schema is not None or kind in SCHEMAS
+            - row_group_rows >= 1
+        """
+        self.path = path
+        self.kind = kind
+        self.schema = dict(SCHEMAS[kind] if schema is None else schema)
+        self.row_group_rows = row_group_rows
+        self.num_rows = 0
+        self._dictionaries = {name: {} for name, column_type in self.schema.items() if column_type == "dictionary"}
+        self._values = [[] for _ in self.schema]
+        self._row_groups = []
+        self._file = open(f"{path}.tmp{os.getpid()}", "wb")
+        self._file.write(MAGIC)
+
+    def __enter__(self) -> ColumnarWriter:
+        """Return this writer, which is closed at the end of the with statement, or discarded
+        if the body of the with statement raises an error."""
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *exc_info: object) -> None:
+        """Close this writer, or discard the file if an error was raised."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write_row(self, values: list[str]) -> None:
+        """Add a row, given as the text of its value in every column (as in the text format).
+        Raise ValueError if the row does not have a value for every column, or a number
+        column has a value that is neither a number nor "N/A".
+        """
+        if len(values) != len(self.schema):
+            raise ValueError(f"Expected {len(self.schema)} columns, got {len(values)}: {values}")
+
+        for column, value in zip(self._values, values):
+            column.append(value)
+        self.num_rows += 1
+        if len(self._values[0]) >= self.row_group_rows:
+            self._write_row_group()
+
+    def write_rows(self, rows: Iterable[list[str]]) -> None:
+        """Add every row of rows (see write_row)."""
+        for row in rows:
+            self.write_row(row)
+
+    def close(self) -> None:
+        """Write the last row group and the footer, and replace the file at path."""
+        if self._file is None:
+            return
+
+        if len(self._values[0]) > 0 or len(self._row_groups) == 0:
+            self._write_row_group()
+        footer = {"version": VERSION, "kind": self.kind, "schema": self.schema, "num_rows": self.num_rows,
+                  "dictionaries": {name: list(values) for name, values in self._dictionaries.items()},
+                  "row_groups": self._row_groups}
+        footer_bytes = json.dumps(footer).encode("utf-8")
+        self._file.write(footer_bytes + struct.pack("<Q", len(footer_bytes)) + MAGIC)
+        tmp_path = self._file.name
+        self._file.close()
+        self._file = None
+        os.replace(tmp_path, self.path)
+
+    def discard(self) -> None:
+        """Stop writing, and delete the temporary file. The file at path is left as it was."""
+        if self._file is not None:
+            self._file.close()
+            os.remove(self._file.name)
+            self._file = None
+
+    def _write_row_group(self) -> None:
+        """Write the arrays of the row group being filled, and start a new one."""
+        arrays = {}
+        for (name, column_type), values in zip(self.schema.items(), self._values):
+            if column_type == "dictionary":
+                indices = self._dictionaries[name]
+                arrays[name] = np.array([indices.setdefault(value, len(indices)) for value in values],
+                                        dtype=np.uint32)
+            elif column_type == "string":
+                encoded = [value.encode("utf-8") for value in values]
+                offsets = np.zeros(len(values) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(e) for e in encoded])
+                arrays[f"{name}.offsets"] = offsets
+                arrays[f"{name}.data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+            elif column_type == "float":
+                arrays[name] = np.array([float(value) if value != "N/A" else np.nan for value in values],
+                                        dtype=np.float64)
+            else:
+                arrays[name] = np.array([int(value) if value != "N/A" else -1 for value in values], dtype=np.int64)
+
+        locations = {}
+        for name, array in arrays.items():
+            locations[name] = [self._file.tell(), array.dtype.str, len(array)]
+            self._file.write(array.tobytes())
+            self._file.write(b"\0" * (_aligned(array.nbytes) - array.nbytes))
+
+        self._row_groups.append({"num_rows": len(self._values[0]), "arrays": locations})
+        self._values = [[] for _ in self.schema]
+
+
+def _aligned(num_bytes: int) -> int:
+    """Return num_bytes rounded up to a multiple of 8."""
+    return (num_bytes + 7) // 8 * 8
+
+
+class ColumnarFile:
+    """A read-only, memory-mapped columnar file.
+
+    Only the arrays of the columns read are loaded from the file.
+
+    Instance Attributes:
+        - kind: The kind of dataset in the file.
+        - schema: The type of every column, by name, in the order of the values of a row.
+        - num_rows: The number of rows.
+        - dictionaries: The distinct values of every dictionary column, by name.
+        - row_group_sizes: The number of rows of every row group.
+    """
+    kind: str
+    schema: dict[str, str]
+    num_rows: int
+    dictionaries: dict[str, list[str]]
+    row_group_sizes: list[int]
+    # Private Instance Attributes:
+    #   - _mmap: the memory map of the file
+    #   - _row_groups: the offset, dtype and length of every array of every row group
+    _mmap: mmap.mmap
+    _row_groups: list[dict[str, list]]
+
+    def __init__(self, path: str) -> None:
+        """Memory-map the columnar file at path.
+
+        Raise ValueError if path is not a columnar file written by this version of ColumnarWriter.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        trailer = len(MAGIC) + 8
+        if len(self._mmap) < len(MAGIC) + trailer or self._mmap[:len(MAGIC)] != MAGIC \
+                or self._mmap[-len(MAGIC):] != MAGIC:
+            raise ValueError
+
+        footer_len = struct.unpack("<Q", self._mmap[-trailer:-len(MAGIC)])[0]
+        footer = json.loads(self._mmap[-trailer - footer_len:-trailer].decode("utf-8"))
+        if footer["version"] != VERSION:
+            raise ValueError
+
+        self.kind = footer["kind"]
+        self.schema = footer["schema"]
+        self.num_rows = footer["num_rows"]
+        self.dictionaries = footer["dictionaries"]
+        self._row_groups = [row_group["arrays"] for row_group in footer["row_groups"]]
+        self.row_group_sizes = [row_group["num_rows"] for row_group in footer["row_groups"]]
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return self.num_rows
+
+    def column(self, name: str, row_group: int) -> np.ndarray:
+        """Return the array of the column name in the given row group: the index of every value
+        into dictionaries[name] for a dictionary column, and the values of a number column.
+
+        Preconditions:
+            - name in self.schema and self.schema[name] != "string"
+            - 0 <= row_group < len(self.row_group_sizes)
+        """
+        return self._array(row_group, name)
+
+    def values(self, name: str, row_group: int) -> list[str]:
+        """Return the values of the column name in the given row group, as text (as in the text
+        format). Numbers are written back the way Python writes them, so "4" is given as "4.0"
+        in a float column.
+
+        Preconditions:
+            - name in self.schema
+            - 0 <= row_group < len(self.row_group_sizes)
+        """
+        column_type = self.schema[name]
+        if column_type == "dictionary":
+            return np.array(self.dictionaries[name], dtype=object)[self._array(row_group, name)].tolist()
+        elif column_type == "string":
+            offsets = self._array(row_group, f"{name}.offsets").tolist()
+            raw = self._array(row_group, f"{name}.data").tobytes()
+            if raw.isascii():
+                # Byte offsets are also character offsets, so decode everything at once
+                data = raw.decode("ascii")
+                return [data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+            return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        elif column_type == "float":
+            return ["N/A" if value != value else repr(value) for value in self._array(row_group, name).tolist()]
+        else:
+            return ["N/A" if value == -1 else str(value) for value in self._array(row_group, name).tolist()]
+
+    def rows(self, columns: Optional[list[str]] = None) -> Iterable[list[str]]:
+        """Yield every row, as the text of its value in every column of columns (every column
+        of the schema if columns is None), in order.
+        """
+        columns = list(self.schema) if columns is None else columns
+        for row_group in range(len(self.row_group_sizes)):
+            yield from (list(row) for row in zip(*(self.values(name, row_group) for name in columns)))
+
+    def _array(self, row_group: int, name: str) -> np.ndarray:
+        """Return the array name of the given row group, as a view of the file."""
+        offset, dtype, length = self._row_groups[row_group][name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=length, offset=offset)
+
+
+def is_columnar(path: str) -> bool:
+    """Return whether the file at path starts like a columnar file."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def convert_dataset(text_path: str, path: str, kind: str, row_group_rows: int = ROW_GROUP_ROWS) -> int:
+    """Write the dataset of the given kind at text_path, in the text format, to path as a
+    columnar file, and return the number of rows written. Empty lines and lines starting with
+    '#' are skipped. Raise ValueError if a line does not have a value for every column, as
+    happens when a value holds the delimiter.
+
+    Preconditions:
+        - kind in SCHEMAS
+        - row_group_rows >= 1
+    """
+    with open(text_path, "r") as f, ColumnarWriter(path, kind, row_group_rows=row_group_rows) as writer:
+        for line in f:
+            line = line.rstrip("\n")
+            if line != "" and not line.startswith("#"):
+                writer.write_row(line.split(DELIMITERS[kind]))
+        return writer.num_rows
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['json', 'mmap', 'os', 'struct', 'sys', 'numpy'],
+    #     'allowed-io': ['ColumnarWriter.__init__', 'ColumnarFile.__init__', 'is_columnar', 'convert_dataset'],
+    # })
+
+    # Usage: python columnar.py <reviews|courses> <text dataset> <columnar file>
+    if len(sys.argv) != 4 or sys.argv[1] not in SCHEMAS:
+        print("Usage: python columnar.py <reviews|courses> <text dataset> <columnar file>")
+        sys.exit(1)
+    print(f"{convert_dataset(sys.argv[2], sys.argv[3], sys.argv[1])} rows written to {sys.argv[3]}")
@@ -3,12 +3,16 @@ This is a helper module for scrape_review and scrape_crouse.
 """
 
 from bs4 import Tag
-import requests
+from page_fetcher import PageFetcher
+
+# The fetcher shared by every call of get_url_html, so that connections are reused
+_fetcher = PageFetcher()
+
 
 def get_url_html(url: str) -> bytes:
-    """Get html content of a webpage at specified url."""
-    r = requests.get(url, allow_redirects=True)
-    return r.content
+    """Get html content of a webpage at specified url.
+    The request is retried if it fails, and times out if the server does not answer."""
+    return _fetcher.fetch(url).content
 
 
 def in_a_row(mapping: dict[str, str], order: list, delimiter: str = ":") -> str:
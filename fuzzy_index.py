@@ -0,0 +1,125 @@
+"""Python file that contains a lookup index for fuzzy matching and prefix completion of vertex items.
+
+The similarity between two strings is the one used by main.__input_similar_helper: every
+character at the same position in both strings adds 2 / (total length) to the score, and every
+other pair of equal characters adds 0.01 / (total length). Instead of scoring every item, the
+index finds the items that share characters at the same positions as the query and only scores
+the ones that can reach the threshold.
+"""
+
+from __future__ import annotations
+from bisect import bisect_left
+import math
+from typing import Iterable
+
+# The minimum similarity score of the items suggested by FuzzyIndex.similar
+THRESHOLD_SCORE = 0.8
+
+
+def similarity(item: str, other: str) -> float:
+    """Return the similarity score between item and other."""
+    item_score = 0.0
+    for i in range(len(item)):
+        for j in range(len(other)):
+            if i == j and item[i] == other[j]:
+                item_score += 2.0 / (len(item) + len(other))
+            elif item[i] == other[j]:
+                item_score += 0.01 / (len(item) + len(other))
+
+    return item_score
+
+
+class FuzzyIndex:
+    """An index of strings for finding the ones similar to a query, or starting with a prefix.
+
+    Representation Invariants:
+        - self._items == sorted(set(self._items))
+    """
+    # Private Instance Attributes:
+    #   - _items: all the indexed strings, sorted
+    #   - _positions: the strings with every character at every position, by (position, character)
+    #   - _by_length: the strings of every length
+    _items: list[str]
+    _positions: dict[tuple[int, str], list[str]]
+    _by_length: dict[int, list[str]]
+
+    def __init__(self, items: Iterable[str]) -> None:
+        """Build the index of the given strings."""
+        self._items = sorted(set(items))
+        self._positions = {}
+        self._by_length = {}
+        for item in self._items:
+            self._by_length.setdefault(len(item), []).append(item)
+            for i, char in enumerate(item):
+                self._positions.setdefault((i, char), []).append(item)
+
+    def __len__(self) -> int:
+        """Return the number of indexed strings."""
+        return len(self._items)
+
+    def __contains__(self, item: str) -> bool:
+        """Return whether item is indexed."""
+        i = bisect_left(self._items, item)
+        return i < len(self._items) and self._items[i] == item
+
+    def similar(self, item: str, limit: int = 5) -> list[str]:
+        """Return up to <limit> indexed strings with a similarity score to item of at least
+        THRESHOLD_SCORE, from the highest to the lowest score and then in alphabetical order.
+
+        Preconditions:
+            - limit >= 1
+        """
+        required = {length: _required_same_position(len(item), length) for length in self._by_length}
+
+        candidates = set()
+        for length, others in self._by_length.items():
+            if required[length] <= 0:
+                candidates.update(others)
+
+        # A string with at least m characters at the same position as item has one of them among
+        # any len(item) - m + 1 positions of item, so only the smallest postings are scanned
+        min_required = min((r for r in required.values() if r > 0), default=len(item) + 1)
+        if min_required <= len(item):
+            postings = sorted((self._positions.get((i, char), []) for i, char in enumerate(item)), key=len)
+            for posting in postings[:len(item) - min_required + 1]:
+                candidates.update(posting)
+
+        similar_score = {}
+        for other in candidates:
+            num_same_position = sum(1 for char1, char2 in zip(item, other) if char1 == char2)
+            if num_same_position >= required[len(other)]:
+                item_score = similarity(item, other)
+                if item_score >= THRESHOLD_SCORE:
+                    similar_score[other] = item_score
+
+        return sorted(similar_score, key=lambda other: (-similar_score[other], other))[:limit]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """Return up to <limit> indexed strings starting with prefix, in alphabetical order."""
+        completions = []
+        i = bisect_left(self._items, prefix)
+        while i < len(self._items) and len(completions) < limit and self._items[i].startswith(prefix):
+            completions.append(self._items[i])
+            i += 1
+
+        return completions
+
+
+def _required_same_position(len1: int, len2: int) -> int:
+    """Return the minimum number of characters at the same position for two strings of the given
+    lengths to have a similarity score of at least THRESHOLD_SCORE, with some slack for floating
+    point rounding. Every other pair of equal characters is assumed to add to the score.
+    """
+    if len1 + len2 == 0:
+        return len1 + 1
+
+    return math.ceil((THRESHOLD_SCORE * (len1 + len2) - 0.01 * len1 * len2) / 2 - 1e-9)
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['bisect', 'math'],
+    })
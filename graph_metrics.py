@@ -0,0 +1,223 @@
+"""Python file that contains the opt-in metrics of a graph: counters, latency histograms and
+sampled profiles of recommendation requests.
+
+Metrics are only collected once they are enabled with Graph.enable_metrics; until then, the
+instrumented methods of the graph only check that no metrics are attached. Nested timings
+overlap: the time of a similarity score computed while ranking courses is counted both under
+"similarity_score" and under the ranking.
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+import cProfile
+import math
+import os
+import random
+import time
+
+# The number of buckets of a histogram: bucket i holds the values up to smallest * 2 ** i
+NUM_BUCKETS = 48
+
+
+class Histogram:
+    """A histogram of non-negative values, in buckets that double in size.
+
+    Instance Attributes:
+        - smallest: The upper bound of the first bucket.
+        - count: The number of values observed.
+        - total: The sum of the values observed.
+        - largest: The largest value observed.
+        - buckets: The number of values observed in every bucket.
+
+    Representation Invariants:
+        - self.smallest > 0
+        - len(self.buckets) == NUM_BUCKETS
+        - sum(self.buckets) == self.count
+    """
+    smallest: float
+    count: int
+    total: float
+    largest: float
+    buckets: list[int]
+
+    def __init__(self, smallest: float = 1e-6) -> None:
+        """Initialize an empty histogram whose first bucket holds the values up to smallest."""
+        self.smallest = smallest
+        self.count = 0
+        self.total = 0.0
+        self.largest = 0.0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def observe(self, value: float) -> None:
+        """Add value to the histogram."""
+        i = math.frexp(value / self.smallest)[1] if value > self.smallest else 0
+        self.buckets[min(i, NUM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.largest = max(self.largest, value)
+
+    def quantile(self, q: float) -> float:
+        """Return an upper bound of the q-quantile of the values observed: the upper bound of the
+        bucket holding it, or the largest value if it is smaller. Return 0.0 if there is none.
+
+        Preconditions:
+            - 0 <= q <= 1
+        """
+        rank = q * self.count
+        seen = 0
+        for i, num_values in enumerate(self.buckets):
+            seen += num_values
+            if seen >= rank and seen > 0:
+                return min(self.smallest * 2 ** i, self.largest)
+
+        return 0.0
+
+    def summary(self) -> dict[str, float]:
+        """Return the count, total, mean, largest value and the 50th, 90th and 99th percentiles
+        of the histogram.
+        """
+        return {"count": self.count, "total": self.total, "mean": self.total / max(self.count, 1),
+                "max": self.largest, "p50": self.quantile(0.5), "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99)}
+
+
+class Metrics:
+    """The counters and histograms of the instrumented operations of a graph.
+
+    Every timed operation has a counter of its calls and a histogram of their latency in
+    seconds, under its name. Every request (see request) also gets, for every operation timed
+    during it, a histogram of the time spent in it per request ("<request>.<operation>.seconds")
+    and of the number of calls per request ("<request>.<operation>.calls").
+
+    Metrics are not thread-safe: use them from the thread that uses the graph.
+
+    Instance Attributes:
+        - counters: The counters, by name.
+        - histograms: The histograms, by name.
+        - profile_rate: The fraction of requests profiled with cProfile.
+        - profile_dir: The directory where the profiles of the sampled requests are saved.
+        - last_profile: The path of the last profile saved, or None if none was saved.
+
+    Representation Invariants:
+        - 0 <= self.profile_rate <= 1
+    """
+    counters: dict[str, int]
+    histograms: dict[str, Histogram]
+    profile_rate: float
+    profile_dir: str
+    last_profile: Optional[str]
+    # Private Instance Attributes:
+    #   - _request: the number of calls and the time of every operation timed during the current
+    #       request, by name, or None if no request is being served
+    #   - _profile_path: where to save the profile of the next request, or None if it is sampled
+    #       like any other
+    #   - _random: the random generator used to sample the requests to profile
+    _request: Optional[dict[str, list]]
+    _profile_path: Optional[str]
+    _random: random.Random
+
+    def __init__(self, profile_rate: float = 0.0, profile_dir: str = "profiles", seed: int = 0) -> None:
+        """Initialize empty metrics, profiling the given fraction of requests into profile_dir."""
+        self.counters = {}
+        self.histograms = {}
+        self.profile_rate = profile_rate
+        self.profile_dir = profile_dir
+        self.last_profile = None
+        self._request = None
+        self._profile_path = None
+        self._random = random.Random(seed)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add amount to the counter name."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, smallest: float = 1e-6) -> None:
+        """Add value to the histogram name, creating it with the given first bucket if needed."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(smallest)
+        histogram.observe(value)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a call of the operation name that took the given number of seconds."""
+        self.increment(name)
+        self.observe(name, seconds)
+        if self._request is not None:
+            totals = self._request.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def request(self, name: str) -> Iterator[None]:
+        """Time the request name run in the body of this context manager, with the operations
+        called during it, and profile it if it is sampled. A request started during another one
+        is only timed as an operation of the outer request.
+        """
+        if self._request is not None:
+            start = time.perf_counter()
+            yield
+            self.record(name, time.perf_counter() - start)
+            return
+
+        profiler = None
+        if self._profile_path is not None or (self.profile_rate > 0 and self._random.random() < self.profile_rate):
+            profiler = cProfile.Profile()
+
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already running
+                profiler = None
+
+        self._request = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            operations, self._request = self._request, None
+
+        self.record(name, seconds)
+        for operation, (calls, operation_seconds) in operations.items():
+            self.observe(f"{name}.{operation}.seconds", operation_seconds)
+            self.observe(f"{name}.{operation}.calls", calls, smallest=1)
+        if profiler is not None:
+            self._save_profile(profiler, name)
+
+    def profile_next(self, path: str) -> None:
+        """Profile the next request with cProfile, and save its stats to path (see pstats.Stats)."""
+        self._profile_path = path
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the counters and the summaries of the histograms, as a JSON-serializable dict."""
+        return {"counters": dict(self.counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()}}
+
+    def reset(self) -> None:
+        """Clear every counter and histogram."""
+        self.counters.clear()
+        self.histograms.clear()
+
+    def _save_profile(self, profiler: cProfile.Profile, name: str) -> None:
+        """Save the stats of profiler, the profile of the request name."""
+        path = self._profile_path
+        if path is None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{name}_{self.counters.get(name, 0)}.pstats")
+        self._profile_path = None
+
+        profiler.dump_stats(path)
+        self.last_profile = path
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['contextlib', 'cProfile', 'math', 'os', 'random', 'time'],
+    })
@@ -0,0 +1,211 @@
+"""
+This is a helper module for scrape_course and dataset_util to download web pages.
+
+A PageFetcher reuses its connections through a pooled requests session, retries failed
+requests with exponential backoff, and times out requests that hang. Pages are fetched
+concurrently, at most max_concurrency at a time. With a cache directory, the body of every
+page is saved with its ETag and Last-Modified headers, and later fetches of the page are
+conditional: a page the server reports as unchanged (304 Not Modified) is not downloaded again.
+"""
+
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+import hashlib
+import json
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# The HTTP statuses of the requests that are retried
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class Page:
+    """A downloaded web page.
+
+    Instance Attributes:
+        - url: The url of the page.
+        - content: The body of the page.
+        - changed: Whether the page was downloaded, rather than reported unchanged since it was cached.
+    """
+    url: str
+    content: bytes
+    changed: bool
+
+    def __init__(self, url: str, content: bytes, changed: bool = True) -> None:
+        """Initialize a downloaded page."""
+        self.url = url
+        self.content = content
+        self.changed = changed
+
+
+class PageFetcher:
+    """A downloader of web pages through a pooled, retrying session, with an optional cache.
+
+    Instance Attributes:
+        - cache_dir: The directory where pages are cached for conditional requests, or '' for no cache.
+        - max_concurrency: The largest number of pages downloaded at once.
+        - timeout: The connect and read timeouts of every request, in seconds.
+
+    Representation Invariants:
+        - self.max_concurrency >= 1
+    """
+    cache_dir: str
+    max_concurrency: int
+    timeout: tuple[float, float]
+    # Private Instance Attributes:
+    #   - _session: the session whose connections are reused by every request
+    #   - _executor: the threads downloading pages concurrently, or None if none has been started
+    _session: requests.Session
+    _executor: Optional[ThreadPoolExecutor]
+
+    def __init__(self, cache_dir: str = '', max_concurrency: int = 4, retries: int = 3, backoff: float = 0.5,
+                 timeout: tuple[float, float] = (10.0, 60.0)) -> None:
+        """Initialize a page fetcher.
+
+        A failed request is retried up to <retries> times, waiting backoff * 2 ** (n - 1) seconds
+        before the n-th retry, or as long as the Retry-After header of the response asks.
+
+        Preconditions:
+            - max_concurrency >= 1
+            - retries >= 0
+            - backoff >= 0
+        """
+        self.cache_dir = cache_dir
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = None
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=("GET", "HEAD"), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency, max_retries=retry)
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def __enter__(self) -> PageFetcher:
+        """Return this fetcher, which is closed at the end of the with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this fetcher."""
+        self.close()
+
+    def fetch(self, url: str) -> Page:
+        """Download the page at url, following redirects.
+
+        If the page is cached and the server reports it unchanged, return the cached page with
+        changed set to False. Raise requests.RequestException if the request still fails after
+        every retry, or returns an error status.
+        """
+        cached = self._read_cache(url)
+        headers = {}
+        if cached is not None:
+            if cached[1].get("etag"):
+                headers["If-None-Match"] = cached[1]["etag"]
+            if cached[1].get("last_modified"):
+                headers["If-Modified-Since"] = cached[1]["last_modified"]
+
+        response = self._session.get(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+        if response.status_code == 304 and cached is not None:
+            return Page(url, cached[0], changed=False)
+
+        response.raise_for_status()
+        self._write_cache(url, response)
+        return Page(url, response.content)
+
+    def fetch_all(self, urls: list[str]) -> list[Page]:
+        """Download the pages at urls concurrently, and return them in the same order."""
+        futures = [self._submit(url) for url in urls]
+        return [future.result() for future in futures]
+
+    def fetch_pages(self, url_template: str, is_last: Callable[[Page], bool], first_page: int = 1,
+                    max_pages: int = -1) -> Iterator[Page]:
+        """Yield the pages of a paginated url, in order: url_template.format(page=n) for n from
+        first_page, up to and including the first page for which is_last returns True, or up to
+        <max_pages> pages if max_pages >= 1.
+
+        Up to max_concurrency pages are downloaded ahead of the one yielded, so a few pages after
+        the last one may be downloaded too.
+        """
+        pending = []
+        next_page = first_page
+        try:
+            while True:
+                while len(pending) < self.max_concurrency and (max_pages < 1 or next_page < first_page + max_pages):
+                    pending.append(self._submit(url_template.format(page=next_page)))
+                    next_page += 1
+                if len(pending) == 0:
+                    return
+
+                page = pending.pop(0).result()
+                yield page
+                if is_last(page):
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """Stop the download threads and close the connections of this fetcher."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._session.close()
+
+    def _submit(self, url: str) -> Future:
+        """Start downloading the page at url in a download thread, and return its future."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="fetch")
+        return self._executor.submit(self.fetch, url)
+
+    def _cache_path(self, url: str) -> str:
+        """Return the path of the cached page at url, without extension."""
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest()[:32])
+
+    def _read_cache(self, url: str) -> Optional[tuple[bytes, dict[str, str]]]:
+        """Return the cached body and headers of the page at url, or None if it is not cached."""
+        if self.cache_dir == '':
+            return None
+
+        path = self._cache_path(url)
+        try:
+            with open(path + ".json", 'r') as f:
+                headers = json.load(f)
+            with open(path + ".html", 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+
+        return content, headers
+
+    def _write_cache(self, url: str, response: requests.Response) -> None:
+        """Cache the body of response, the page at url, if it can be validated with an ETag or
+        Last-Modified header.
+        """
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if self.cache_dir == '' or (etag is None and last_modified is None):
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(url)
+        # The headers are written last, so they never describe a partly written body
+        with open(path + ".html.tmp", 'wb') as w:
+            w.write(response.content)
+        os.replace(path + ".html.tmp", path + ".html")
+        with open(path + ".json.tmp", 'w') as w:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, w)
+        os.replace(path + ".json.tmp", path + ".json")
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['concurrent.futures', 'hashlib', 'json', 'os', 'requests', 'requests.adapters',
+                          'urllib3.util.retry'],
+        'allowed-io': ['_read_cache', '_write_cache'],
+    })
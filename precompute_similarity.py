@@ -0,0 +1,140 @@
+"""PRECOMPUTE_SIMILARITY
+This is a python file that precomputes the similarity scores between every pair of courses
+and saves a table of the top courses of every course, which Graph.use_recommendation_table
+can load directly.
+
+The course list is split into shards, and the shards are scored by a pool of processes
+(one per core by default). Every worker loads its own copy of the graph from the same graph
+snapshot (see snapshot.py), and writes the result of each shard to its own file, so a crashed
+run can be resumed: the shards that are already on disk are skipped.
+
+The output directory contains:
+graph.snapshot: the graph snapshot the workers load the graph from
+shard_<i>.npz: the top courses (and optionally all the scores) of the courses in shard i
+top_<n>.json: the table of the top <n> courses of every course, with their scores
+"""
+
+from __future__ import annotations
+import json
+import os
+from multiprocessing import Pool
+import numpy as np
+import base
+from similarity_engine import SimilarityEngine
+from snapshot import open_snapshot
+
+# The similarity engine of a worker process, built once by _init_worker
+_worker_engine = None
+
+
+def _init_worker(snapshot_path: str) -> None:
+    """Initialize a worker process with the graph in the snapshot at snapshot_path."""
+    global _worker_engine
+    _worker_engine = SimilarityEngine(base.Graph.from_snapshot(open_snapshot(snapshot_path)))
+
+
+def _score_shard(task: tuple[str, list[str], int, bool]) -> str:
+    """Score the courses of a shard against every course and save the result.
+    task is (shard path, course codes, top_n, full). If full is True, also save all the scores.
+    Return the shard path.
+    """
+    shard_path, codes, top_n, full = task
+    engine = _worker_engine
+    top = [[""] * top_n for _ in codes]
+    top_scores = np.zeros((len(codes), top_n), dtype=np.float64)
+    scores = np.zeros((len(codes) if full else 0, len(engine.codes)), dtype=np.float64)
+    for i, code in enumerate(codes):
+        ranked = engine.ranked(code, top_n)
+        top[i][:len(ranked)] = [crs for crs, _ in ranked]
+        top_scores[i, :len(ranked)] = [score for _, score in ranked]
+        if full:
+            scores[i] = engine.score_all(code)
+
+    # Write to a temporary file first, so that a crash never leaves a half-written shard
+    tmp_path = f"{shard_path}.tmp.npz"
+    np.savez(tmp_path, codes=np.array(codes), top=np.array(top), top_scores=top_scores,
+             columns=np.array(engine.codes), scores=scores)
+    os.replace(tmp_path, shard_path)
+    return shard_path
+
+
+def precompute(reviews_file: str, course_file: str, save_dir: str, top_n: int = 10,
+               shard_size: int = 100, process_num: int = 0, full: bool = False) -> str:
+    """Precompute the top <top_n> courses of every course in the given datasets, save the table
+    to save_dir and return its path.
+    process_num: number of worker processes. Set to 0 to use every core
+    full: whether to also save the full course x course similarity table in the shards
+
+    Preconditions:
+      - top_n >= 1
+      - shard_size >= 1
+      - process_num >= 0
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    snapshot_path = os.path.join(save_dir, "graph.snapshot")
+    graph = base.load_graph(reviews_file, course_file, snapshot_path)
+    codes = sorted(graph.get_all_vertices("course"))
+    top_n = min(top_n, max(len(codes) - 1, 1))
+
+    # Shards of another version of the datasets or with other settings can't be resumed
+    manifest = {"key": open_snapshot(snapshot_path).key, "top_n": top_n, "shard_size": shard_size, "full": full}
+    manifest_path = os.path.join(save_dir, "manifest.json")
+    if not os.path.isfile(manifest_path) or _read_json(manifest_path) != manifest:
+        for filename in os.listdir(save_dir):
+            if filename.startswith("shard_"):
+                os.remove(os.path.join(save_dir, filename))
+        _write_json(manifest_path, manifest)
+
+    shards = []
+    for i in range(0, len(codes), shard_size):
+        shard_path = os.path.join(save_dir, f"shard_{i // shard_size:05}.npz")
+        shards.append((shard_path, codes[i:i + shard_size]))
+
+    pending = [(path, shard_codes, top_n, full) for path, shard_codes in shards if not os.path.isfile(path)]
+    print(f"Scoring {len(pending)} out of {len(shards)} shards ({len(shards) - len(pending)} already done)")
+    if len(pending) > 0:
+        with Pool(process_num or os.cpu_count(), _init_worker, (snapshot_path,)) as pool:
+            for done, _ in enumerate(pool.imap_unordered(_score_shard, pending), 1):
+                print(f"Scoring shards... {done} out of {len(pending)}", end="\r")
+        print()
+
+    table = {}
+    for shard_path, _ in shards:
+        with np.load(shard_path) as shard:
+            for code, top, top_scores in zip(shard["codes"].tolist(), shard["top"].tolist(),
+                                             shard["top_scores"].tolist()):
+                table[code] = [[crs, score] for crs, score in zip(top, top_scores) if crs != ""]
+
+    table_path = os.path.join(save_dir, f"top_{top_n}.json")
+    _write_json(table_path, {"top_n": top_n, "courses": table})
+    return table_path
+
+
+def load_table(table_path: str) -> dict[str, list[tuple[str, float]]]:
+    """Return the table of top courses saved by precompute at table_path."""
+    table = _read_json(table_path)
+    return {code: [(crs, score) for crs, score in top] for code, top in table["courses"].items()}
+
+
+def _read_json(path: str) -> dict:
+    """Return the JSON object saved at path."""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, obj: dict) -> None:
+    """Save obj to path as JSON, through a temporary file."""
+    with open(path + ".tmp", "w") as w:
+        json.dump(obj, w)
+    os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['json', 'os', 'multiprocessing', 'numpy', 'base', 'similarity_engine', 'snapshot'],
+    #     'allowed-io': ['precompute', '_read_json', '_write_json'],
+    # })
+
+    precompute("dataset/review_full.csv", "dataset/course.csv", "dataset/similarity/")
@@ -1,118 +1,410 @@
 """
 This is a helper module for scrape_review to automatically create and navigate a web browser
 to quercus and then the evaluation page.
+
+The pages control their browser through a Driver: ChromeDriver drives a headless Chrome with
+selenium, and any other class implementing the same methods (such as a fake browser serving
+canned html) can be used in its place. A SessionPool keeps several evaluation pages open, each
+in its own browser, so that many pages of reviews can be downloaded without starting a browser
+for every one, and replaces the browsers that break.
 """
 
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+import threading
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait, Select
 
+
+class Driver:
+    """The interface of the web browsers controlled by the pages.
+    Every element is specified by a css selector, and is waited for if it is not loaded yet.
+    """
+
+    def open(self, url: str) -> None:
+        """Load the page at url."""
+        raise NotImplementedError
+
+    def text(self, css_selector: str) -> str:
+        """Return the text of the specified element."""
+        raise NotImplementedError
+
+    def attribute(self, css_selector: str, name: str) -> str:
+        """Return the attribute name of the specified element."""
+        raise NotImplementedError
+
+    def type_text(self, css_selector: str, text: str, submit: bool = False, clear: bool = False) -> None:
+        """Type text in the specified element, clearing it first if clear is True, and then
+        pressing Enter if submit is True.
+        """
+        raise NotImplementedError
+
+    def click(self, css_selector: str) -> None:
+        """Click the specified element."""
+        raise NotImplementedError
+
+    def select_option(self, css_selector: str, index: int) -> None:
+        """Select the option index of the specified select element."""
+        raise NotImplementedError
+
+    def switch_to_frame(self, css_selector: str, timeout: float) -> None:
+        """Wait up to timeout seconds for the specified frame, and then control it."""
+        raise NotImplementedError
+
+    def wait_until_absent(self, css_selector: str, timeout: float) -> None:
+        """Wait up to timeout seconds until the specified element is not in the page."""
+        raise NotImplementedError
+
+    def is_alive(self) -> bool:
+        """Return whether the browser still responds."""
+        raise NotImplementedError
+
+    def quit(self) -> None:
+        """Close the browser."""
+        raise NotImplementedError
+
+
+class ChromeDriver(Driver):
+    """A headless google chrome browser controlled with selenium"""
+
+    browser: webdriver.Chrome
+
+    def __init__(self) -> None:
+        """Start a headless google chrome browser."""
+        options = Options()
+        options.add_argument("--headless")
+        self.browser = webdriver.Chrome(executable_path="chromedriver", options=options)
+        self.browser.implicitly_wait(10)
+
+    def open(self, url: str) -> None:
+        """Load the page at url."""
+        self.browser.get(url)
+
+    def text(self, css_selector: str) -> str:
+        """Return the text of the specified element."""
+        return self.browser.find_element(By.CSS_SELECTOR, css_selector).text
+
+    def attribute(self, css_selector: str, name: str) -> str:
+        """Return the attribute name of the specified element."""
+        return self.browser.find_element(By.CSS_SELECTOR, css_selector).get_attribute(name)
+
+    def type_text(self, css_selector: str, text: str, submit: bool = False, clear: bool = False) -> None:
+        """Type text in the specified element, clearing it first if clear is True, and then
+        pressing Enter if submit is True.
+        """
+        element = self.browser.find_element(By.CSS_SELECTOR, css_selector)
+        if clear:
+            element.clear()
+        element.send_keys(text)
+        if submit:
+            element.send_keys(Keys.ENTER)
+
+    def click(self, css_selector: str) -> None:
+        """Click the specified element."""
+        self.browser.find_element(By.CSS_SELECTOR, css_selector).click()
+
+    def select_option(self, css_selector: str, index: int) -> None:
+        """Select the option index of the specified select element."""
+        Select(self.browser.find_element(By.CSS_SELECTOR, css_selector)).select_by_index(index)
+
+    def switch_to_frame(self, css_selector: str, timeout: float) -> None:
+        """Wait up to timeout seconds for the specified frame, and then control it."""
+        WebDriverWait(self.browser, timeout).until(
+            EC.frame_to_be_available_and_switch_to_it((By.CSS_SELECTOR, css_selector))
+        )
+
+    def wait_until_absent(self, css_selector: str, timeout: float) -> None:
+        """Wait up to timeout seconds until the specified element is not in the page."""
+        WebDriverWait(self.browser, timeout, 0.01).until_not(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+        )
+
+    def is_alive(self) -> bool:
+        """Return whether the browser still responds."""
+        try:
+            _ = self.browser.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def quit(self) -> None:
+        """Close the browser."""
+        try:
+            self.browser.quit()
+        except WebDriverException:
+            pass
+
+
 class WebPage:
     """Parent class of QuercusPage and EvalPage"""
 
-    driver: webdriver.Chrome
-
-    def select(self, css_selector: str) -> WebElement:
-        """Select the specified html element"""
-        return self.driver.find_element(By.CSS_SELECTOR, css_selector)
+    driver: Driver
 
 
 class QuercusPage(WebPage):
     """A webdriver instance to login Quercus and find the link of evaluation page"""
 
+    # Private Instance Attributes:
+    #   - _owns_driver: whether the browser was started by the page, and is closed by it
+    _owns_driver: bool
+
+    def __init__(self, driver: Optional[Driver] = None) -> None:
+        """Initialize the page in driver, or in a new chrome browser if driver is None.
+        A browser started by the page is closed once the link is found.
+        """
+        self._owns_driver = driver is None
+        self.driver = ChromeDriver() if driver is None else driver
+
     def get_link(self, utorid: str, passwd: str) -> str:
         """Get the link for evaluation page"""
-        # initialize a google chrome browser
-        options = Options()
-        options.add_argument("--headless")
-        browser = webdriver.Chrome(executable_path="chromedriver", options=options)
-        browser.implicitly_wait(10)
-        browser.get("https://q.utoronto.ca")
-        self.driver = browser
+        self.driver.open("https://q.utoronto.ca")
 
         # login into quercus
-        self.select("#username").send_keys(utorid)
-        self.select("#password").send_keys(passwd)
-        self.select("#login-btn").click()
+        self.driver.type_text("#username", utorid)
+        self.driver.type_text("#password", passwd)
+        self.driver.click("#login-btn")
 
         # entering course evaluation pages
-        self.select("#context_external_tool_2015_menu_item a").click()
-        self.select("#section-tabs > li:nth-child(3)").click()
-        WebDriverWait(self.driver, 10).until(
-            EC.frame_to_be_available_and_switch_to_it((By.CSS_SELECTOR, "iframe[id*='tool_content']"))
-        )
-        link = self.select("#launcherElements tbody > tr:nth-child(3) a").get_attribute("href")
-        self.driver.close()
+        self.driver.click("#context_external_tool_2015_menu_item a")
+        self.driver.click("#section-tabs > li:nth-child(3)")
+        self.driver.switch_to_frame("iframe[id*='tool_content']", 10)
+        link = self.driver.attribute("#launcherElements tbody > tr:nth-child(3) a", "href")
+        if self._owns_driver:
+            self.driver.quit()
         return link
 
 
 class EvalPage(WebPage):
     """A webdriver instance to scrape review from UofT evaluation page"""
 
-    def __init__(self, url: str, max_records: int = 10) -> None:
+    def __init__(self, url: str, max_records: int = 10, driver: Optional[Driver] = None) -> None:
         """
-        Initialize an evaluation page in a chrome browser and configure it.
+        Initialize an evaluation page in driver, or in a new chrome browser if driver is None,
+        and configure it.
         max_page is the maximum number of items to display at once.
         If webdriver exit with error, try to start webdriver in headful mode
 
         Preconditions:
           - max_records in [5, 10, 15, 20, 25, 50, 100]
         """
-
-        # initialize a google chrome browser
-        options = Options()
-        options.add_argument("--headless")
-        browser = webdriver.Chrome(executable_path="chromedriver", options=options)
-        browser.implicitly_wait(10)
-        browser.get(url)
-        self.driver = browser
+        self.driver = ChromeDriver() if driver is None else driver
+        self.driver.open(url)
         self.wait()
 
         # set the maximum number of items to the specified value
         mapping = {5: 0, 10: 1, 15: 2, 20: 3, 25: 4, 50: 5, 100: 6}
         if max_records != 10:
-            select = Select(self.select("#fbvGridPageSizeSelectBlock select"))
-            select.select_by_index(mapping[max_records])
+            self.driver.select_option("#fbvGridPageSizeSelectBlock select", mapping[max_records])
             self.wait()
 
     def get_num_records(self) -> int:
         """Return the total number of records of evaluations"""
-        return int(self.select("#fbvGridNbItemsTotalLvl1").text[6:].strip())
+        return int(self.driver.text("#fbvGridNbItemsTotalLvl1")[6:].strip())
 
     def get_num_pages(self) -> int:
         """Return the total number of pages"""
-        return int(self.select("#fbvGridPagingContentHolderLvl1 tbody>tr:nth-child(1)>td:nth-child(5)").text.strip())
+        return int(self.driver.text("#fbvGridPagingContentHolderLvl1 tbody>tr:nth-child(1)>td:nth-child(5)").strip())
 
     def wait(self) -> None:
         """Wait until the datais loaded"""
-        WebDriverWait(self.driver, 600, 0.01).until_not(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "#waitMachineID"))
-        )
+        self.driver.wait_until_absent("#waitMachineID", 600)
 
     def get_data(self, num_page: int) -> str:
         """Get data in html form"""
         if num_page > self.get_num_pages():
             return "<!DOCTYPE html></html><body></body></html>"
 
-        input_dom = self.select("#gridPaging__getFbvGrid")
-        input_dom.clear()
-        input_dom.send_keys(str(num_page))
-        input_dom.send_keys(Keys.ENTER)
+        self.driver.type_text("#gridPaging__getFbvGrid", str(num_page), submit=True, clear=True)
         self.wait()
-        table_html = self.select("#fbvGrid").get_attribute("outerHTML")
+        table_html = self.driver.attribute("#fbvGrid", "outerHTML")
         return f"<!DOCTYPE html></html><body>{table_html}</body></html>"
 
+    def is_healthy(self) -> bool:
+        """Return whether the browser of the page still responds and still shows the evaluations."""
+        if not self.driver.is_alive():
+            return False
+        try:
+            self.get_num_pages()
+            return True
+        except Exception:
+            return False
+
+
+class SessionPool:
+    """A pool of evaluation pages, each open in its own browser, shared by the threads downloading
+    pages of reviews.
+
+    The browsers are started once, concurrently, and every page is reused for many downloads.
+    When a download through a page fails, the page is checked, and replaced by a page in a new
+    browser if it no longer responds.
+
+    Instance Attributes:
+        - url: The link of the evaluation page.
+        - max_records: The number of records of every page of reviews.
+        - size: The number of pages in the pool, in use or not.
+        - replacements: The number of broken pages replaced since the pool was started.
+        - open_attempts: The number of times a new browser is started to replace a broken page,
+            before the page is given up.
+
+    Representation Invariants:
+        - self.size >= 0
+        - self.open_attempts >= 1
+    """
+    url: str
+    max_records: int
+    size: int
+    replacements: int
+    open_attempts: int
+    # Private Instance Attributes:
+    #   - _driver_factory: the function starting a new browser
+    #   - _idle: the pages not in use
+    #   - _condition: the condition notified when a page is returned to the pool, guarding the pool
+    _driver_factory: Callable[[], Driver]
+    _idle: list[EvalPage]
+    _condition: threading.Condition
+
+    def __init__(self, url: str, size: int, max_records: int = 10,
+                 driver_factory: Callable[[], Driver] = ChromeDriver, open_attempts: int = 3,
+                 drivers: Optional[list[Driver]] = None) -> None:
+        """Open size evaluation pages at url: one in every browser of drivers, already started
+        (such as the browser of a QuercusPage), and the others in browsers started with driver_factory.
+        Raise the error of the first page that could not be opened, if every one failed.
+
+        Preconditions:
+          - size >= 1
+          - drivers is None or len(drivers) <= size
+          - open_attempts >= 1
+          - max_records in [5, 10, 15, 20, 25, 50, 100]
+        """
+        self.url = url
+        self.max_records = max_records
+        self.replacements = 0
+        self.open_attempts = open_attempts
+        self._driver_factory = driver_factory
+        self._condition = threading.Condition()
+
+        with ThreadPoolExecutor(size, thread_name_prefix="session") as executor:
+            started = drivers if drivers is not None else []
+            futures = [executor.submit(self._open_page, driver) for driver in started]
+            futures += [executor.submit(self._open_page) for _ in range(size - len(started))]
+        self._idle = [future.result() for future in futures if future.exception() is None]
+        self.size = len(self._idle)
+        if self.size == 0:
+            raise futures[0].exception()
+
+    def __enter__(self) -> SessionPool:
+        """Return this pool, which is closed at the end of the with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this pool."""
+        self.close()
+
+    @contextmanager
+    def session(self) -> Iterator[EvalPage]:
+        """Wait for a page that is not in use, and lend it for the body of this context manager.
+        If the body raises an error and the page is broken, it is replaced by a new one.
+        Raise RuntimeError if every page of the pool broke and could not be replaced.
+        """
+        with self._condition:
+            while len(self._idle) == 0:
+                if self.size == 0:
+                    raise RuntimeError("every browser of the session pool is broken")
+                self._condition.wait()
+            page = self._idle.pop()
+
+        healthy = True
+        try:
+            yield page
+        except Exception:
+            healthy = page.is_healthy()
+            raise
+        finally:
+            if not healthy:
+                page = self._replace(page)
+            with self._condition:
+                if page is not None:
+                    self._idle.append(page)
+                self._condition.notify()
+
+    def get_data(self, num_page: int) -> str:
+        """Get the data of the page num_page in html form, with a page of the pool."""
+        with self.session() as page:
+            return page.get_data(num_page)
+
+    def check(self) -> int:
+        """Replace the pages not in use that are broken, and return how many were broken."""
+        with self._condition:
+            pages, self._idle = self._idle, []
+
+        broken = 0
+        for page in pages:
+            if not page.is_healthy():
+                broken += 1
+                page = self._replace(page)
+            with self._condition:
+                if page is not None:
+                    self._idle.append(page)
+                self._condition.notify()
+
+        return broken
+
+    def close(self) -> None:
+        """Close the browsers of the pages not in use, which should be all of them."""
+        with self._condition:
+            pages, self._idle = self._idle, []
+            self.size -= len(pages)
+            self._condition.notify_all()
+        for page in pages:
+            page.driver.quit()
+
+    def _open_page(self, driver: Optional[Driver] = None) -> EvalPage:
+        """Open the evaluation page in driver, or in a new browser if driver is None, closing the
+        browser if it fails.
+        """
+        if driver is None:
+            driver = self._driver_factory()
+        try:
+            return EvalPage(self.url, self.max_records, driver)
+        except Exception:
+            driver.quit()
+            raise
+
+    def _replace(self, page: EvalPage) -> Optional[EvalPage]:
+        """Close the browser of the broken page, and return the page opened in a new browser
+        instead, or None if it could not be opened after open_attempts tries. In that case, the
+        pool has one page less.
+        """
+        page.driver.quit()
+        for _ in range(self.open_attempts):
+            try:
+                new_page = self._open_page()
+            except Exception:
+                continue
+            with self._condition:
+                self.replacements += 1
+            return new_page
+
+        with self._condition:
+            self.size -= 1
+            self._condition.notify_all()
+        return None
+
 
 if __name__ == "__main__":
     import python_ta
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ["selenium", "selenium.webdriver.common.keys", "selenium.webdriver.remote.webelement",
-                          "selenium.webdriver.chrome.options", "selenium.webdriver.common.by",
-                          "selenium.webdriver.support", "selenium.webdriver.support.ui"],
+        'disable': ['W0703'],
+        'extra-imports': ["concurrent.futures", "contextlib", "threading", "selenium", "selenium.common.exceptions",
+                          "selenium.webdriver.common.keys", "selenium.webdriver.chrome.options",
+                          "selenium.webdriver.common.by", "selenium.webdriver.support",
+                          "selenium.webdriver.support.ui"],
     })
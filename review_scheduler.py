@@ -0,0 +1,224 @@
+"""
+This is a helper module for scrape_review to download pages with a pool of worker processes.
+
+The pages to download are kept in a single queue by the scheduler, and every worker asks for
+the next page as soon as it is done with the previous one, so a slow worker only holds up the
+page it is on. A page that fails is put back at the end of the queue, up to max_retries times.
+A worker that dies or reports that it is broken is replaced, and the page it was on is put
+back in the queue as well.
+
+Workers report every page they finish through their pipe, and the scheduler sleeps until a
+worker reports or exits, so the progress is reported as it happens rather than polled.
+
+Workers are processes by default. They can also be threads of the scheduler's process, which
+can share objects that cannot be sent to another process, such as the browsers of a
+review_page.SessionPool.
+"""
+
+from __future__ import annotations
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Optional, Union
+import threading
+
+
+class WorkerBroken(Exception):
+    """Raised by PageWorker.save_page when the worker can save no more pages.
+    The worker process exits, and is replaced by a new one."""
+
+
+class PageWorker:
+    """Parent class of the workers of schedule_pages, which download and save the pages they are given"""
+
+    def save_page(self, num_page: int) -> int:
+        """Download and save the page num_page, and return the number of records saved.
+        Raise an exception if the page could not be saved, and WorkerBroken if the worker
+        cannot save any other page either.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release what the worker holds, once it is given no more pages."""
+
+
+class _Worker:
+    """A worker process, as seen by the scheduler.
+
+    Instance Attributes:
+        - index: The index given to the worker factory of the process.
+        - process: The worker process, or thread.
+        - conn: The end of the pipe to the worker held by the scheduler.
+        - page: The page the worker is saving, or None if it is waiting for one.
+        - num_saved: The number of pages the worker has saved.
+    """
+    index: int
+    process: Union[Process, threading.Thread]
+    conn: Connection
+    page: Optional[int]
+    num_saved: int
+
+    def __init__(self, index: int, worker_factory: Callable[[int], PageWorker], threads: bool = False) -> None:
+        """Start a worker process, or thread if threads is True, running worker_factory(index)."""
+        self.index = index
+        self.conn, child_conn = Pipe()
+        worker_type = threading.Thread if threads else Process
+        self.process = worker_type(target=_run_worker, args=(child_conn, worker_factory, index), daemon=True)
+        self.process.start()
+        if not threads:
+            child_conn.close()
+        self.page = None
+        self.num_saved = 0
+
+    def sentinels(self) -> list:
+        """Return the objects that are ready when the worker process exits (none for a thread,
+        which closes its end of the pipe when it stops instead).
+        """
+        return [self.process.sentinel] if isinstance(self.process, Process) else []
+
+    def exit_message(self) -> str:
+        """Return the description of the exit of the worker."""
+        if isinstance(self.process, Process):
+            return f"worker {self.index} exited with code {self.process.exitcode}"
+        else:
+            return f"worker {self.index} stopped"
+
+
+def schedule_pages(pages: list[int], worker_factory: Callable[[int], PageWorker], num_workers: int,
+                   max_retries: int = 3, first_index: int = 0,
+                   on_progress: Optional[Callable[[int, int], None]] = None,
+                   threads: bool = False) -> dict[int, str]:
+    """Save pages with num_workers worker processes, and return the error of every page that
+    could not be saved, by page.
+
+    Every worker process runs worker_factory(index), with an index unique to the process from
+    first_index upward, and is then given pages to save until none is left. on_progress(page,
+    num_records) is called in this process every time a page is saved.
+
+    A page is tried up to max_retries + 1 times. A worker that exits is replaced while pages are
+    left, but only num_workers * max_retries workers that exit before saving any page are; once
+    no worker is left, the pages left are returned as failed.
+
+    If threads is True, the workers are threads of this process instead, and worker_factory can
+    return workers sharing objects with each other and with the caller.
+
+    Preconditions:
+        - num_workers >= 1
+        - max_retries >= 0
+        - threads or worker_factory can be pickled
+    """
+    queue = deque(pages)
+    attempts = {}
+    failed = {}
+    restarts = num_workers * max_retries
+    next_index = first_index
+
+    def retry(page: int, error: str) -> None:
+        """Put page back in the queue, unless it has failed too many times."""
+        attempts[page] = attempts.get(page, 0) + 1
+        if attempts[page] > max_retries:
+            failed[page] = error
+        else:
+            queue.append(page)
+
+    def handle_report(worker: _Worker) -> bool:
+        """Handle the report of the page worker was saving, and return whether the worker is
+        ready for another page.
+        """
+        page, num_records, error, ready = worker.conn.recv()
+        worker.page = None
+        if page is not None and error is None:
+            worker.num_saved += 1
+            if on_progress is not None:
+                on_progress(page, num_records)
+        elif page is not None and not ready:
+            # The worker broke rather than the page: try the page again first, without counting it
+            queue.appendleft(page)
+        elif page is not None:
+            retry(page, error)
+
+        return ready
+
+    running = []
+    for _ in range(min(num_workers, len(queue))):
+        running.append(_Worker(next_index, worker_factory, threads))
+        next_index += 1
+
+    idle = []
+    while len(running) > 0:
+        while len(idle) > 0 and len(queue) > 0:
+            worker = idle.pop()
+            worker.page = queue.popleft()
+            worker.conn.send(worker.page)
+
+        if len(queue) == 0 and len(idle) == len(running):
+            break
+
+        ready = wait([worker.conn for worker in running] + [s for worker in running for s in worker.sentinels()])
+        for worker in list(running):
+            stopped = False
+            if worker.conn in ready and worker.conn.poll():
+                try:
+                    if handle_report(worker):
+                        idle.append(worker)
+                        continue
+                except EOFError:
+                    stopped = True
+
+            if stopped or any(s in ready for s in worker.sentinels()) or not worker.process.is_alive():
+                worker.process.join()
+                running.remove(worker)
+                if worker in idle:
+                    idle.remove(worker)
+                if worker.page is not None:
+                    retry(worker.page, worker.exit_message())
+                if worker.num_saved == 0:
+                    restarts -= 1
+                if len(queue) > 0 and restarts >= 0:
+                    running.append(_Worker(next_index, worker_factory, threads))
+                    next_index += 1
+
+    for worker in running:
+        worker.conn.send(None)
+    for worker in running:
+        worker.process.join()
+
+    for page in queue:
+        failed[page] = "no worker left to save the page"
+
+    return failed
+
+
+def _run_worker(conn: Connection, worker_factory: Callable[[int], PageWorker], index: int) -> None:
+    """Save the pages sent through conn with worker_factory(index), reporting every one through
+    conn as (page, number of records saved, error or None, whether the worker is ready for
+    another page), until None is sent. conn is closed when the worker stops.
+    """
+    worker = None
+    try:
+        worker = worker_factory(index)
+        conn.send((None, 0, None, True))
+        page = conn.recv()
+        while page is not None:
+            try:
+                conn.send((page, worker.save_page(page), None, True))
+            except WorkerBroken as error:
+                conn.send((page, 0, repr(error), False))
+                return
+            except Exception as error:  # a failed page is retried by the scheduler
+                conn.send((page, 0, repr(error), True))
+            page = conn.recv()
+    finally:
+        if worker is not None:
+            worker.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'disable': ['W0703'],
+        'extra-imports': ['collections', 'multiprocessing', 'multiprocessing.connection', 'threading'],
+    })
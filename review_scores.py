@@ -0,0 +1,288 @@
+"""Python file that computes review scores from the columns of a review dataset, with array operations.
+
+The rows of a review dataset are parsed into columns at once: the evaluation items (ITEM1 to
+ITEM11) into a numeric array with a mask of the missing ("N/A") values, STNUM and STRSP into
+integer arrays, and the course, professor, term and year into lists. The score and the weight
+of every row are then computed with one of the named strategies in STRATEGIES, selected by
+the strategy parameter of base.load_graph.
+
+When a chunk of text only contains plain ASCII rows with numeric items, its columns are
+parsed straight from its bytes with numpy. Any other text is parsed row by row with csv.
+A dataset in the columnar format (see columnar.py) is read a row group at a time, and only
+the columns needed for the scores.
+"""
+
+from __future__ import annotations
+from typing import Iterable, Optional
+import csv
+import io
+import numpy as np
+from columnar import ColumnarFile
+
+# The evaluation items of a review row, in the order of their columns
+ITEMS = ("ITEM1", "ITEM2", "ITEM3", "ITEM4", "ITEM5", "ITEM6", "ITEM9", "ITEM10", "ITEM11")
+# The columns of a review row (see scrape_review.py)
+NUM_COLUMNS = 19
+FIRST_ITEM_COLUMN = 8
+STNUM_COLUMN = 17
+STRSP_COLUMN = 18
+# The ways rows can be weighted when averaging the scores of a (course, professor) pair
+WEIGHTS = ("responses", "response_rate")
+# Response rates are weighted in whole multiples of 1 / RATE_UNITS
+RATE_UNITS = 10000
+
+
+class ReviewColumns:
+    """The columns of the rows of a review dataset.
+
+    Instance Attributes:
+        - courses: The course code of every row.
+        - professors: The professor of every row, as "<last name> <first name>".
+        - terms: The term of every row.
+        - years: The year of every row.
+        - items: The value of every item of every row, with 0.0 for missing values.
+        - present: Whether every item of every row has a value.
+        - stnum: The number of students invited to complete the evaluation of every row, or 0 if unknown.
+        - strsp: The number of students who completed the evaluation of every row.
+
+    Representation Invariants:
+        - len(self.courses) == len(self.professors) == len(self.terms) == len(self.years)
+        - self.items.shape == self.present.shape == (len(self.courses), len(ITEMS))
+        - self.stnum.shape == self.strsp.shape == (len(self.courses),)
+    """
+    courses: list[str]
+    professors: list[str]
+    terms: list[str]
+    years: list[str]
+    items: np.ndarray
+    present: np.ndarray
+    stnum: np.ndarray
+    strsp: np.ndarray
+
+    def __init__(self, courses: list[str], professors: list[str], terms: list[str], years: list[str],
+                 items: np.ndarray, present: np.ndarray, stnum: np.ndarray, strsp: np.ndarray) -> None:
+        """Initialize the columns of a review dataset."""
+        self.courses = courses
+        self.professors = professors
+        self.terms = terms
+        self.years = years
+        self.items = items
+        self.present = present
+        self.stnum = stnum
+        self.strsp = strsp
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.courses)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[list[str]]) -> ReviewColumns:
+        """Return the columns of the given review rows, split into their columns.
+
+        Preconditions:
+            - every row in rows is a row of a review dataset, split into its columns
+        """
+        rows = list(rows)
+        cells = [row[FIRST_ITEM_COLUMN:FIRST_ITEM_COLUMN + len(ITEMS)] for row in rows]
+        present = np.array([[value != "N/A" for value in values] for values in cells], dtype=bool)
+        items = np.array([[float(value) if value != "N/A" else 0.0 for value in values] for values in cells],
+                         dtype=np.float64)
+
+        return cls([row[2] for row in rows], [row[4] + " " + row[5] for row in rows],
+                   [row[6] for row in rows], [row[7] for row in rows],
+                   items.reshape(len(rows), len(ITEMS)), present.reshape(len(rows), len(ITEMS)),
+                   np.array([int(row[STNUM_COLUMN]) if row[STNUM_COLUMN] != "N/A" else 0 for row in rows],
+                            dtype=np.int64),
+                   np.array([int(row[STRSP_COLUMN]) for row in rows], dtype=np.int64))
+
+    @classmethod
+    def from_columnar(cls, file: ColumnarFile, row_group: int) -> ReviewColumns:
+        """Return the columns of the rows of the given row group of a columnar review dataset.
+        Only the course, professor, term, year, item, STNUM and STRSP columns are read from the
+        file, and "N/A" STNUM and STRSP are read as 0.
+
+        Preconditions:
+            - file.kind == "reviews"
+            - 0 <= row_group < len(file.row_group_sizes)
+        """
+        items = np.stack([file.column(item.lower(), row_group) for item in ITEMS], axis=1)
+        present = ~np.isnan(items)
+        stnum = file.column("stnum", row_group)
+        strsp = file.column("strsp", row_group)
+
+        # Every distinct (last name, first name) is only joined once
+        last_names = file.column("lname", row_group).astype(np.int64)
+        first_names = file.column("fname", row_group).astype(np.int64)
+        pairs, pair_ids = np.unique(last_names * len(file.dictionaries["fname"]) + first_names, return_inverse=True)
+        names = np.array([file.dictionaries["lname"][pair // len(file.dictionaries["fname"])] + " "
+                          + file.dictionaries["fname"][pair % len(file.dictionaries["fname"])]
+                          for pair in pairs.tolist()], dtype=object)
+
+        return cls(file.values("code", row_group), names[pair_ids.reshape(-1)].tolist(),
+                   file.values("term", row_group), file.values("year", row_group),
+                   np.where(present, items, 0.0), present, np.maximum(stnum, 0), np.maximum(strsp, 0))
+
+    @classmethod
+    def from_text(cls, text: str) -> ReviewColumns:
+        """Return the columns of the review rows in text, one row per line."""
+        columns = _parse_ascii(text) if text.isascii() and '"' not in text else None
+        if columns is None:
+            columns = cls.from_rows(csv.reader(io.StringIO(text), delimiter=":"))
+
+        return columns
+
+
+class ScoreStrategy:
+    """A way to score review rows, and to weight them in the "response" aggregate of the reviews
+    of a (course, professor) pair (see base.aggregate_review_score).
+
+    Instance Attributes:
+        - items: The items summed up into the score of a row.
+        - divisor: The sum of the items of a row is divided by divisor.
+        - weight: How the rows of a pair are weighted: by the number of students who completed
+          the evaluation ("responses"), or by its response rate, STRSP / STNUM ("response_rate").
+
+    Representation Invariants:
+        - all(item in ITEMS for item in self.items)
+        - self.divisor > 0
+        - self.weight in WEIGHTS
+    """
+    items: tuple[str, ...]
+    divisor: float
+    weight: str
+
+    def __init__(self, items: tuple[str, ...], divisor: float, weight: str = "responses") -> None:
+        """Initialize a scoring strategy."""
+        self.items = items
+        self.divisor = divisor
+        self.weight = weight
+
+
+# The named scoring strategies. "default" gives the same scores as base.review_score_sum.
+STRATEGIES = {
+    "default": ScoreStrategy(ITEMS, 40),
+    "no_workload": ScoreStrategy(tuple(item for item in ITEMS if item != "ITEM10"), 40),
+    "response_rate": ScoreStrategy(ITEMS, 40, "response_rate")
+}
+
+
+def row_scores(columns: ReviewColumns, strategy: str = "default") -> np.ndarray:
+    """Return the score of every row in columns with the given strategy.
+
+    The items are added up one column at a time, from the first to the last, so the scores
+    of the "default" strategy are exactly the ones of base.review_score_sum.
+
+    Preconditions:
+        - strategy in STRATEGIES
+    """
+    score_strategy = STRATEGIES[strategy]
+    scores = np.zeros(len(columns), dtype=np.float64)
+    for i, item in enumerate(ITEMS):
+        if item in score_strategy.items:
+            scores += columns.items[:, i]
+
+    return scores / score_strategy.divisor
+
+
+def row_weights(columns: ReviewColumns, strategy: str = "default") -> np.ndarray:
+    """Return the weight of every row in columns with the given strategy, as whole numbers so that
+    weighted sums are exact: response rates are in units of 1 / RATE_UNITS.
+
+    Preconditions:
+        - strategy in STRATEGIES
+    """
+    if STRATEGIES[strategy].weight == "response_rate":
+        rates = np.divide(columns.strsp, columns.stnum, out=np.zeros(len(columns)), where=columns.stnum > 0)
+        return np.rint(rates * RATE_UNITS).astype(np.int64)
+    else:
+        return columns.strsp.astype(np.int64)
+
+
+def _parse_ascii(text: str) -> Optional[ReviewColumns]:
+    """Return the columns of the review rows in text, parsed from its bytes with numpy, or None if
+    a row does not have NUM_COLUMNS columns, or an item is neither "N/A" nor a number with up to
+    two decimals, or STNUM or STRSP is neither "N/A" nor a whole number.
+
+    Preconditions:
+        - text.isascii() and '"' not in text
+    """
+    if text != "" and not text.endswith("\n"):
+        text += "\n"
+    data = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    separators = np.flatnonzero((data == ord(":")) | (data == ord("\n")))
+    num_rows = text.count("\n")
+    if len(separators) != num_rows * NUM_COLUMNS:
+        return None
+
+    # Every row ends with a newline, so the fields of a row are between its separators
+    ends = separators.reshape(num_rows, NUM_COLUMNS)
+    if num_rows > 0 and not np.all(data[ends[:, -1]] == ord("\n")):
+        return None
+    starts = np.empty_like(ends)
+    starts[:, 1:] = ends[:, :-1] + 1
+    starts[1:, 0] = ends[:-1, -1] + 1
+    starts[:1, 0] = 0
+
+    # Pad the data so that the first four characters of every field can be read
+    padded = np.zeros(len(data) + 4, dtype=np.uint8)
+    padded[:len(data)] = data
+    item_starts = starts[:, FIRST_ITEM_COLUMN:FIRST_ITEM_COLUMN + len(ITEMS)]
+    lengths = ends[:, FIRST_ITEM_COLUMN:FIRST_ITEM_COLUMN + len(ITEMS)] - item_starts
+    chars = [padded[item_starts + i].astype(np.int64) for i in range(4)]
+    digits = [(char >= ord("0")) & (char <= ord("9")) for char in chars]
+
+    missing = (lengths == 3) & (chars[0] == ord("N")) & (chars[1] == ord("/")) & (chars[2] == ord("A"))
+    decimal = (lengths >= 3) & (chars[1] == ord(".")) & digits[2] & ((lengths == 3) | digits[3])
+    valid = missing | (digits[0] & ((lengths == 1) | (decimal & (lengths <= 4))))
+    if not np.all(valid):
+        return None
+
+    # Items are parsed as whole hundredths, so dividing by 100 gives the same value as float()
+    hundredths = ((chars[0] - ord("0")) * 100 + np.where(lengths >= 3, (chars[2] - ord("0")) * 10, 0)
+                  + np.where(lengths == 4, chars[3] - ord("0"), 0))
+    items = np.where(missing, 0, hundredths) / 100
+
+    stnum = _parse_whole_numbers(padded, starts[:, STNUM_COLUMN], ends[:, STNUM_COLUMN])
+    strsp = _parse_whole_numbers(padded, starts[:, STRSP_COLUMN], ends[:, STRSP_COLUMN], allow_missing=False)
+    if stnum is None or strsp is None:
+        return None
+
+    def fields(column: int) -> list[str]:
+        """Return the field in the given column of every row."""
+        return [text[start:end] for start, end in zip(starts[:, column].tolist(), ends[:, column].tolist())]
+
+    last_names = fields(4)
+    professors = [last_name + " " + first_name for last_name, first_name in zip(last_names, fields(5))]
+    return ReviewColumns(fields(2), professors, fields(6), fields(7), items, ~missing, stnum, strsp)
+
+
+def _parse_whole_numbers(padded: np.ndarray, starts: np.ndarray, ends: np.ndarray, allow_missing: bool = True,
+                         max_digits: int = 9) -> Optional[np.ndarray]:
+    """Return the whole numbers written between starts and ends in padded, with 0 for "N/A" if
+    allow_missing is True, or None if one of them is not such a number of up to max_digits digits.
+    """
+    lengths = ends - starts
+    missing = ((lengths == 3) & (padded[starts] == ord("N")) & (padded[starts + 1] == ord("/"))
+               & (padded[starts + 2] == ord("A")) & allow_missing)
+    lengths = np.where(missing, 0, lengths)
+    if len(lengths) > 0 and (np.any((lengths < 1) & ~missing) or lengths.max() > max_digits):
+        return None
+
+    numbers = np.zeros(len(starts), dtype=np.int64)
+    for i in range(int(lengths.max(initial=0))):
+        in_number = i < lengths
+        char = np.where(in_number, padded[starts + i].astype(np.int64), ord("0"))
+        if not np.all((char >= ord("0")) & (char <= ord("9"))):
+            return None
+        numbers = np.where(in_number, numbers * 10 + char - ord("0"), numbers)
+
+    return numbers
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['csv', 'io', 'numpy', 'columnar']
+    })
@@ -0,0 +1,250 @@
+"""
+This is a helper module for scrape_review to save the reviews of every worker as they are downloaded.
+
+Every worker appends the rows of every page it downloads to its own shard file, and then
+records the page in its checkpoint file with the size of the shard at that point. When the
+download is restarted, every shard is cut back to the size of its last checkpoint, so the rows
+of a page are kept only if the page was fully saved, and the pages in the checkpoints are not
+downloaded again. Once every page is saved, the shards are merged into the dataset in the order
+of the records, without loading them into memory.
+
+A shard holds one row per line, prefixed by the index of the record and a colon. The rows of
+a worker are in the order of the records, but a shard appended to by several runs (with a
+different number of workers) can hold several such sorted runs.
+"""
+
+from __future__ import annotations
+from typing import IO, Iterator
+import heapq
+import json
+import os
+import shutil
+
+# The file recording the download settings of the shards of a directory
+MANIFEST_FILE = "manifest.json"
+
+
+class ShardWriter:
+    """The shard and checkpoint files of a worker.
+
+    Instance Attributes:
+        - index: The index of the worker.
+    """
+    index: int
+    # Private Instance Attributes:
+    #   - _shard: the shard file, opened for appending
+    #   - _checkpoint: the checkpoint file, opened for appending
+    _shard: IO[bytes]
+    _checkpoint: IO[bytes]
+
+    def __init__(self, shard_dir: str, index: int) -> None:
+        """Open the shard and checkpoint files of worker index in shard_dir for appending."""
+        self.index = index
+        os.makedirs(shard_dir, exist_ok=True)
+        self._shard = open(_shard_path(shard_dir, index), 'ab')
+        self._checkpoint = open(_checkpoint_path(shard_dir, index), 'ab')
+
+    def __enter__(self) -> ShardWriter:
+        """Return this writer, which is closed at the end of the with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this writer."""
+        self.close()
+
+    def write_page(self, page: int, rows: list[tuple[int, str]]) -> None:
+        """Save the rows of page, as (record index, row), and then record the page as saved.
+        Both files are written to disk before returning.
+
+        Preconditions:
+            - rows is sorted by record index
+            - all('\\n' not in row for _, row in rows)
+        """
+        self._shard.write("".join(f"{record}:{row}\n" for record, row in rows).encode())
+        _sync(self._shard)
+        self._checkpoint.write(f"{page} {self._shard.tell()}\n".encode())
+        _sync(self._checkpoint)
+
+    def close(self) -> None:
+        """Close the shard and checkpoint files."""
+        self._shard.close()
+        self._checkpoint.close()
+
+
+def prepare_shards(shard_dir: str, manifest: dict) -> set[int]:
+    """Prepare shard_dir for a download with the given settings, and return the pages already saved.
+
+    If shard_dir holds the shards of a download with other settings, they are deleted. Otherwise,
+    every shard is cut back to the size of its last checkpoint, dropping the rows of the page it
+    was saving when the download stopped.
+    """
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as f:
+            if json.load(f) != manifest:
+                shutil.rmtree(shard_dir)
+
+    os.makedirs(shard_dir, exist_ok=True)
+    with open(manifest_path, 'w') as w:
+        json.dump(manifest, w)
+
+    saved_pages = set()
+    for index in _shard_indices(shard_dir):
+        pages, checkpoint_bytes, shard_bytes = _read_checkpoint(shard_dir, index)
+        saved_pages.update(pages)
+        if os.path.isfile(_checkpoint_path(shard_dir, index)):
+            os.truncate(_checkpoint_path(shard_dir, index), checkpoint_bytes)
+        os.truncate(_shard_path(shard_dir, index), shard_bytes)
+
+    return saved_pages
+
+
+def count_saved_records(shard_dir: str) -> int:
+    """Return the number of rows of the pages saved in the shards of shard_dir."""
+    count = 0
+    for index in _shard_indices(shard_dir):
+        shard_bytes = _read_checkpoint(shard_dir, index)[2]
+        with open(_shard_path(shard_dir, index), 'rb') as f:
+            count += f.read(shard_bytes).count(b"\n")
+
+    return count
+
+
+def next_shard_index(shard_dir: str) -> int:
+    """Return the smallest index of a worker that has no shard in shard_dir, and is larger than
+    every index that has one.
+    """
+    return max(_shard_indices(shard_dir), default=-1) + 1
+
+
+def merge_shards(shard_dir: str, save_path: str, remove: bool = True) -> int:
+    """Write the rows of every shard in shard_dir to save_path in the order of their record index
+    (see merged_rows), and return the number of rows written.
+    If remove is True, shard_dir is deleted once save_path is written.
+    """
+    num_rows = 0
+    with open(save_path + ".tmp", 'wb') as w:
+        for row in merged_rows(shard_dir):
+            w.write(row)
+            num_rows += 1
+
+    os.replace(save_path + ".tmp", save_path)
+    if remove:
+        shutil.rmtree(shard_dir)
+
+    return num_rows
+
+
+def merged_rows(shard_dir: str) -> Iterator[bytes]:
+    """Yield the rows of every shard in shard_dir in the order of their record index, each with
+    its newline and without its record index. Only one row of every record is yielded.
+
+    Only the rows of the pages in the checkpoints are yielded: the rows a worker was writing when
+    it stopped are ignored. Every sorted run of every shard is read in parallel, so the memory used
+    only depends on the number of runs.
+    """
+    files = []
+    runs = []
+    for index in _shard_indices(shard_dir):
+        path = _shard_path(shard_dir, index)
+        for start, end in _sorted_runs(path, _read_checkpoint(shard_dir, index)[2]):
+            f = open(path, 'rb')
+            f.seek(start)
+            files.append(f)
+            runs.append(_read_run(f, end - start))
+
+    last_record = -1
+    try:
+        for record, row in heapq.merge(*runs, key=lambda item: item[0]):
+            if record != last_record:
+                yield row
+                last_record = record
+    finally:
+        for f in files:
+            f.close()
+
+
+def _read_checkpoint(shard_dir: str, index: int) -> tuple[set[int], int, int]:
+    """Return the pages in the checkpoint of worker index, the size of the complete lines of the
+    checkpoint, and the size of the shard when the last of these pages was saved.
+    """
+    pages = set()
+    checkpoint_bytes, shard_bytes = 0, 0
+    checkpoint_path = _checkpoint_path(shard_dir, index)
+    if os.path.isfile(checkpoint_path):
+        with open(checkpoint_path, 'rb') as f:
+            for line in f:
+                parts = line.split()
+                # The last line may be partly written
+                if not line.endswith(b"\n") or len(parts) != 2:
+                    break
+                pages.add(int(parts[0]))
+                checkpoint_bytes += len(line)
+                shard_bytes = int(parts[1])
+
+    return pages, checkpoint_bytes, shard_bytes
+
+
+def _sorted_runs(path: str, size: int) -> list[tuple[int, int]]:
+    """Return the start and end positions of the sorted runs of rows in the first size bytes of
+    the shard at path.
+    """
+    runs = []
+    start, position, last_record = 0, 0, -1
+    with open(path, 'rb') as f:
+        for line in f:
+            if position >= size:
+                break
+            record = int(line[:line.index(b":")])
+            if record < last_record:
+                runs.append((start, position))
+                start = position
+            last_record = record
+            position += len(line)
+    if position > start:
+        runs.append((start, position))
+
+    return runs
+
+
+def _read_run(f: IO[bytes], num_bytes: int) -> Iterator[tuple[int, bytes]]:
+    """Yield (record index, row) for the rows of the next num_bytes bytes of f."""
+    while num_bytes > 0:
+        line = f.readline()
+        num_bytes -= len(line)
+        record, row = line.split(b":", 1)
+        yield int(record), row
+
+
+def _shard_indices(shard_dir: str) -> list[int]:
+    """Return the indices of the workers with a shard in shard_dir."""
+    return sorted(int(name[len("shard_"):-len(".csv")]) for name in os.listdir(shard_dir)
+                  if name.startswith("shard_") and name.endswith(".csv"))
+
+
+def _shard_path(shard_dir: str, index: int) -> str:
+    """Return the path of the shard of worker index."""
+    return os.path.join(shard_dir, f"shard_{index}.csv")
+
+
+def _checkpoint_path(shard_dir: str, index: int) -> str:
+    """Return the path of the checkpoint of worker index."""
+    return os.path.join(shard_dir, f"checkpoint_{index}.txt")
+
+
+def _sync(f: IO[bytes]) -> None:
+    """Write what was written to f to disk."""
+    f.flush()
+    os.fsync(f.fileno())
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'disable': ['R1732'],
+        'extra-imports': ['heapq', 'json', 'os', 'shutil'],
+        'allowed-io': ['ShardWriter.__init__', 'prepare_shards', 'count_saved_records', 'merge_shards', 'merged_rows',
+                       '_read_checkpoint', '_sorted_runs'],
+    })
@@ -0,0 +1,109 @@
+"""Python file that reads a review dataset in fixed-size chunks, in a background thread.
+
+The reader thread reads the file a chunk of text at a time, always ending a chunk at the end
+of a row, and processes every chunk while the caller is busy with the previous ones. At most
+max_memory bytes of text are read ahead of the caller, so the memory used by the reader does
+not depend on the size of the file.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Iterator
+import os
+import queue
+import threading
+import time
+
+# The default size of a chunk of text, in bytes
+CHUNK_BYTES = 1024 * 1024
+# The default budget of the chunks read ahead of the caller, in bytes
+MAX_MEMORY = 8 * 1024 * 1024
+
+
+def stream_chunks(path: str, process: Callable[[str], Any], chunk_bytes: int = CHUNK_BYTES,
+                  max_memory: int = MAX_MEMORY, report: bool = False) -> Iterator[Any]:
+    """Yield process(text) for the text of every chunk of rows of the file at path, in the order of the file.
+
+    Every chunk is about chunk_bytes long, ends at the end of a row, and is processed by a background thread.
+    The thread stops reading once it is max_memory bytes of chunks ahead of the caller.
+    If report is True, print the number of rows processed so far and the rows per second.
+    An exception raised while reading or processing a chunk is raised again by this generator.
+
+    Preconditions:
+        - chunk_bytes >= 1
+        - max_memory >= chunk_bytes
+    """
+    # Every chunk in the queue and the one being processed are counted against max_memory
+    chunks = queue.Queue(maxsize=max(1, max_memory // chunk_bytes - 1))
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_chunks, args=(path, process, chunk_bytes, chunks, stop), daemon=True)
+    reader.start()
+
+    total_bytes = os.path.getsize(path)
+    num_rows = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            elif isinstance(chunk, BaseException):
+                raise chunk
+
+            result, chunk_rows, position = chunk
+            yield result
+
+            num_rows += chunk_rows
+            if report:
+                elapsed = time.perf_counter() - start
+                print(f"Loaded {num_rows} rows ({position / max(total_bytes, 1):.0%}), "
+                      f"{num_rows / max(elapsed, 1e-9):.0f} rows/s", end="\r")
+    finally:
+        stop.set()
+        if report:
+            print()
+        reader.join()
+
+
+def _read_chunks(path: str, process: Callable[[str], Any], chunk_bytes: int, chunks: queue.Queue,
+                 stop: threading.Event) -> None:
+    """Read the file at path in chunks of rows, and put (process(text), number of rows, position in
+    the file) in chunks for every chunk, followed by None. If an exception is raised, put it in
+    chunks instead. Stop early once stop is set.
+    """
+    try:
+        position = 0
+        with open(path, 'r') as f:
+            while not stop.is_set():
+                text = f.read(chunk_bytes)
+                if text == "":
+                    break
+                elif not text.endswith("\n"):
+                    # Finish the last row of the chunk
+                    text += f.readline()
+
+                position += len(text)
+                num_rows = text.count("\n") + (not text.endswith("\n"))
+                _put(chunks, (process(text), num_rows, position), stop)
+        _put(chunks, None, stop)
+    except Exception as error:
+        _put(chunks, error, stop)
+
+
+def _put(chunks: queue.Queue, item: Any, stop: threading.Event) -> None:
+    """Put item in chunks once there is room for it, unless stop is set first."""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['os', 'queue', 'threading', 'time'],
+        'allowed-io': ['stream_chunks', '_read_chunks']
+    })
@@ -26,59 +26,158 @@ It could take a long while to download all the data and convert them into csv fi
 from the website because the amount of data is SUPER ENORMOUS, so be patient.
 """
 
-from os.path import abspath
+from os.path import abspath, isfile
+from typing import Optional
+import hashlib
+import json
+import os
 from bs4 import BeautifulSoup, Tag
-from dataset_util import get_url_html, in_a_row, get_info_from_html
+from block_parser import stream_blocks
+from columnar import ColumnarWriter
+from dataset_util import in_a_row, get_info_from_html
+from page_fetcher import PageFetcher
+
+COURSE_URL = "https://artsci.calendar.utoronto.ca/print/view/pdf/course_search/print_page/debug?page={page}"
+# The file of the cache directory recording the last scrape saved to every path
+SCRAPES_FILE = "scrape_course.json"
+# The class of the html element of every course, only found on the pages with courses
+COURSE_ROW_CLASS = b"views-row"
+# The selector of the html element of every course
+COURSE_BLOCK_SELECTOR = ".no-break.w3-row.views-row"
+# The selector of every piece of course information within the html element of a course
+COURSE_CSS_SELECTORS = {
+    "code_and_name": ".views-field-title",
+    # "prev_code": "views-field-field-previous-course-number .field-content",
+    # "hours": ".views-field-field-hours .field-content", "detail": ".views-field-body",
+    "prereq": ".views-field-field-prerequisite .field-content",
+    "coreq": ".views-field-field-corequisite .field-content",
+    # "recommended_prep": ".views-field-field-recommended .field-content",
+    # "exclusions": ".views-field-field-exclusion .field-content",
+    # "dist_req": ".views-field-field-distribution-requirements .field-content",
+    "breadth_req": ".views-field-field-breadth-requirements .field-content"
+}
 
 
 def get_course_info_from_html(block: Tag) -> dict[str, str]:
     """Helper function of scrape_course. Convert html to a mapping of course information."""
-    css_selector_mapping = {
-        "code_and_name": ".views-field-title",
-        # "prev_code": "views-field-field-previous-course-number .field-content",
-        # "hours": ".views-field-field-hours .field-content", "detail": ".views-field-body",
-        "prereq": ".views-field-field-prerequisite .field-content",
-        "coreq": ".views-field-field-corequisite .field-content",
-        # "recommended_prep": ".views-field-field-recommended .field-content",
-        # "exclusions": ".views-field-field-exclusion .field-content",
-        # "dist_req": ".views-field-field-distribution-requirements .field-content",
-        "breadth_req": ".views-field-field-breadth-requirements .field-content"
-    }
-
-    # Adjust some of the data
-    course_data = get_info_from_html(block, css_selector_mapping)
+    return adjust_course_info(get_info_from_html(block, COURSE_CSS_SELECTORS))
+
+
+def adjust_course_info(course_data: dict[str, str]) -> dict[str, str]:
+    """Helper function of scrape_course. Split the code and the name of the course in course_data."""
     lst = course_data["code_and_name"].split(" - ")
     course_data["code"], course_data["name"] = lst.pop(0), str.join(" - ", lst)
     course_data.pop("code_and_name")
     return course_data
 
 
-def scrape_course(save_dir: str = "", filename: str = "course.csv", lim: int = -1) -> None:
+def scrape_course(save_dir: str = "", filename: str = "course.csv", lim: int = -1, url: str = COURSE_URL,
+                  max_pages: int = 1, cache_dir: str = "", max_concurrency: int = 4, streaming: bool = True,
+                  columnar: bool = False) -> None:
     """
     Scrape all the course information from the url specified.
-    This method uses Beautiful Soup 4 to access DOM element in html.
-    
+
+    If streaming is True, every page is parsed incrementally (see block_parser), and every
+    course is saved as soon as its html element is closed. Otherwise, this method uses
+    Beautiful Soup 4 to access DOM element in html, which keeps the tree of a whole page in
+    memory. Both save the same file.
+
+    url is the url of every page of the catalogue, with {page} in place of the page number.
+    Pages are downloaded concurrently (up to max_concurrency at once) from page 1 to the first
+    page without courses, or to page max_pages if max_pages >= 1. If cache_dir is not empty,
+    the pages are cached there, with the settings of the last scrape saved to every file. If
+    every page is unchanged, and the saved file is the unmodified result of a scrape of every
+    course with the same settings, it is kept as it is. The courses of every page are saved as soon
+    as the page is downloaded, so only the pages being downloaded are kept in memory.
+
+    If columnar is True, the courses are saved in the columnar format (see columnar.py) instead
+    of csv, so a course information holding "|" is kept as it is.
+
     Preconditions:
       - lim >= 1
     """
-    url = "https://artsci.calendar.utoronto.ca/print/view/pdf/course_search/print_page/debug?page=1"
-    html_content = get_url_html(url)
-
-    # Use Beautiful Soup to parse and access DOM element
-    document = BeautifulSoup(html_content, 'html.parser')
-    blocks = document.select(".no-break.w3-row.views-row")
-
-    # Save the course information into csv
     save_path = abspath(f"{save_dir}/{filename}")
+    scrape = {"url": url, "lim": lim, "max_pages": max_pages, "columnar": columnar, "complete": True}
+    order = ["code", 'name', 'prereq', 'coreq', 'breadth_req']
+
+    # Save the course information of every page as it is downloaded, into a temporary csv file
+    # or a columnar file, which replaces the saved file at the end
     num_record_saved = 0
-    with open(save_path, "w") as w:
-        for block in blocks:
-            if num_record_saved >= lim and lim >= 1:
+    changed = False
+    writer = ColumnarWriter(save_path, "courses") if columnar else open(save_path + ".tmp", "w")
+    with PageFetcher(cache_dir, max_concurrency) as fetcher, writer as w:
+        for page in fetcher.fetch_pages(url, lambda page: COURSE_ROW_CLASS not in page.content, max_pages=max_pages):
+            changed = changed or page.changed
+            if streaming:
+                courses = (adjust_course_info(course_data) for course_data in
+                           stream_blocks(page.content, COURSE_BLOCK_SELECTOR, COURSE_CSS_SELECTORS))
+            else:
+                # Use Beautiful Soup to parse and access DOM element
+                document = BeautifulSoup(page.content, 'html.parser')
+                courses = (get_course_info_from_html(block) for block in document.select(COURSE_BLOCK_SELECTOR))
+
+            for course_data in courses:
+                if num_record_saved >= lim >= 1:
+                    break
+                if columnar:
+                    w.write_row([course_data[key] for key in order])
+                else:
+                    w.write(f"{in_a_row(course_data, order, '|')}\n")
+                num_record_saved += 1
+
+            if num_record_saved >= lim >= 1:
+                scrape["complete"] = False
                 break
-            course_data = get_course_info_from_html(block)
-            order = ["code", 'name', 'prereq', 'coreq', 'breadth_req']
-            w.write(f"{in_a_row(course_data, order, '|')}\n")
-            num_record_saved += 1
+
+        # A complete scrape of unchanged pages would save the same courses again
+        keep_saved = (lim < 1 and not changed and isfile(save_path)
+                      and _last_scrape(cache_dir, save_path) == {**scrape, "sha256": _file_digest(save_path)})
+        if columnar and keep_saved:
+            w.discard()
+
+    if not columnar and keep_saved:
+        os.remove(save_path + ".tmp")
+    elif not columnar:
+        os.replace(save_path + ".tmp", save_path)
+
+    if cache_dir != '' and not keep_saved:
+        _save_scrape(cache_dir, save_path, {**scrape, "sha256": _file_digest(save_path)})
+
+
+def _last_scrape(cache_dir: str, save_path: str) -> Optional[dict]:
+    """Return the settings of the last scrape saved to save_path, as recorded in cache_dir, or None
+    if there is none.
+    """
+    try:
+        with open(os.path.join(cache_dir, SCRAPES_FILE), 'r') as f:
+            return json.load(f).get(save_path)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_scrape(cache_dir: str, save_path: str, scrape: dict) -> None:
+    """Record scrape in cache_dir as the settings of the last scrape saved to save_path."""
+    path = os.path.join(cache_dir, SCRAPES_FILE)
+    try:
+        with open(path, 'r') as f:
+            scrapes = json.load(f)
+    except (OSError, ValueError):
+        scrapes = {}
+
+    scrapes[save_path] = scrape
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", 'w') as w:
+        json.dump(scrapes, w)
+    os.replace(path + ".tmp", path)
+
+
+def _file_digest(path: str) -> str:
+    """Return the sha256 digest of the file at path, in hexadecimal."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 if __name__ == "__main__":
@@ -86,8 +185,9 @@ if __name__ == "__main__":
     # python_ta.check_all(config={
     #     'max-line-length': 120,
     #     'disable': ['R1732'],
-    #     'extra-imports': ['bs4', 'dataset_util', 'os.path'],
-    #     'allowed-io': ['scrape_course'],
+    #     'extra-imports': ['bs4', 'dataset_util', 'hashlib', 'json', 'os', 'os.path', 'page_fetcher', 'block_parser',
+    #                    'columnar'],
+    #     'allowed-io': ['scrape_course', '_last_scrape', '_save_scrape', '_file_digest'],
     #     'max-nested-blocks': 4
     # })
 
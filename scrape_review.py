@@ -36,35 +36,71 @@ from the website because the amount of data is SUPER ENORMOUS, so be patient.
 
 from os.path import abspath
 from getpass import getpass
-from multiprocessing import Process, Manager
-from time import sleep
+from functools import partial
+import json
+import shutil
+from typing import Callable
 from bs4 import BeautifulSoup, Tag
+from block_parser import stream_blocks
+from columnar import ColumnarWriter
 from dataset_util import in_a_row, get_info_from_html
-from review_page import EvalPage, QuercusPage
+from review_page import ChromeDriver, Driver, QuercusPage, SessionPool
+from review_scheduler import PageWorker, WorkerBroken, schedule_pages
+from review_shards import ShardWriter, count_saved_records, merge_shards, merged_rows, next_shard_index, \
+    prepare_shards
+
+# The columns of the csv file, in order
+REVIEW_COLUMNS = [
+    "dept", "div", "code", "lec", "lname", "fname", "term", "year", "item1", "item2",
+    "item3", "item4", "item5", "item6", "item9", "item10", "item11", "stnum", "strsp"
+]
+
+
+# The selector of the html element of every review
+REVIEW_BLOCK_SELECTOR = ".gData"
+# The selector of every piece of review information within the html element of a review
+REVIEW_CSS_SELECTORS = {item: f"td:nth-child({i + 1})" for i, item in enumerate([
+    "dept", "div", "code_lec", "lname", "fname", "term", "year", "item1", "item2",
+    "item3", "item4", "item5", "item6", "item9", "item10", "item11", "stnum", "strsp"
+])}
+# The attribute of the html element of every review holding its course code
+REVIEW_CODE_ATTRIBUTE = "sk"
 
 
 def get_review_info_from_html(block: Tag) -> dict[str, str]:
     """Helper function of scrape_review. Convert html to a mapping of course information."""
-    css_selector_list = [
-        "dept", "div", "code_lec", "lname", "fname", "term", "year", "item1", "item2",
-        "item3", "item4", "item5", "item6", "item9", "item10", "item11", "stnum", "strsp"
-    ]
-    css_selector_mapping = {}
-    for i in range(len(css_selector_list)):
-        item = css_selector_list[i]
-        css_selector_mapping[item] = f"td:nth-child({i + 1})"
-
-    review_data = get_info_from_html(block, css_selector_mapping)
-    # Adjust some of the data
+    review_data = get_info_from_html(block, REVIEW_CSS_SELECTORS)
+    review_data["code"] = block.get(REVIEW_CODE_ATTRIBUTE)
+    return adjust_review_info(review_data)
+
+
+def get_review_info_from_page(html: str, streaming: bool = True) -> list[dict[str, str]]:
+    """Helper function of scrape_review. Convert every review of a page to a mapping of course
+    information, in the order of the page.
+
+    If streaming is True, the page is parsed incrementally (see block_parser), reading the cells
+    of every review as they are parsed. Otherwise, this method uses Beautiful Soup 4 to access
+    DOM element in html. Both return the same information.
+    """
+    if streaming:
+        return [adjust_review_info(review_data) for review_data in
+                stream_blocks(html, REVIEW_BLOCK_SELECTOR, REVIEW_CSS_SELECTORS,
+                              block_attributes={"code": REVIEW_CODE_ATTRIBUTE})]
+
+    document = BeautifulSoup(html, "html.parser")
+    return [get_review_info_from_html(block) for block in document.select(REVIEW_BLOCK_SELECTOR)]
+
+
+def adjust_review_info(review_data: dict[str, str]) -> dict[str, str]:
+    """Helper function of scrape_review. Split the lecture code from the course code and lecture
+    of the review in review_data."""
     code_lec = review_data["code_lec"]
-    code = block.get("sk")
     tmp = code_lec[::-1]
     if "-" in tmp:
         tmp = tmp[:tmp.index("-")]
     else:
         tmp = tmp[:7]
     lec = tmp[::-1].strip()
-    review_data["code"] = code
     review_data["lec"] = lec
     review_data.pop("code_lec")
     return review_data
@@ -77,63 +113,101 @@ def print_progress(i: int, total: int, length: int = 50, prefix: str = "") -> No
     print(f"{prefix} [{bar_str}] {percent}% | {i} out of {total}", end="\r")
 
 
-def progress_monitor(dct: dict[int, str], total: int, length: int = 50, prefix: str = "") -> None:
-    """Print the overall progress constantly untill done."""
-    completed = len(dct)
-
-    while completed < total:
-        completed = len(dct)
-        print_progress(completed, total, length, prefix)
-        sleep(0.01)
-
+class ReviewWorker(PageWorker):
+    """A worker of scrape_review, saving the reviews of the pages it is given to its own shard.
 
-def open_and_save(url: str, index: int, process_num: int, row_data: dict[int, str], lim: int = -1, max_records: int = 10) -> None:
+    Instance Attributes:
+        - pool: The evaluation pages the reviews are downloaded from, shared with the other workers.
+        - shard: The shard of the worker.
+        - total_r: The number of records to download.
+        - max_records: The number of records of every page.
+        - streaming: Whether pages are parsed incrementally (see get_review_info_from_page).
+        - columnar: Whether rows are saved as JSON lists of their values, for a columnar file,
+          rather than as csv rows.
     """
-    Open a single process of webdriver to save data of each pages from start to end inclusive
-    into the row_data list and return the list to user.
-    This method uses Beautiful Soup 4 to access DOM element in html.
+    pool: SessionPool
+    shard: ShardWriter
+    total_r: int
+    max_records: int
+    streaming: bool
+    columnar: bool
+
+    def __init__(self, pool: SessionPool, shard: ShardWriter, total_r: int, max_records: int,
+                 streaming: bool = True, columnar: bool = False) -> None:
+        """Initialize a worker saving the reviews of the pages of pool to shard."""
+        self.pool = pool
+        self.shard = shard
+        self.total_r = total_r
+        self.max_records = max_records
+        self.streaming = streaming
+        self.columnar = columnar
+
+    def save_page(self, num_page: int) -> int:
+        """Save the reviews of the page num_page to the shard, and return the number of reviews saved.
+        Raise WorkerBroken if every browser of the worker broke and could not be replaced.
+        """
+        try:
+            html = self.pool.get_data(num_page)
+        except Exception as error:
+            if self.pool.size == 0:
+                raise WorkerBroken(f"the browsers of the worker are broken: {error!r}") from error
+            raise
+
+        rows = []
+        for j, review_data in enumerate(get_review_info_from_page(html, self.streaming)):
+            record_index = (num_page - 1) * self.max_records + j
+            if record_index >= self.total_r:
+                break
+            if self.columnar:
+                rows.append((record_index, json.dumps([review_data[key] for key in REVIEW_COLUMNS])))
+            else:
+                rows.append((record_index, in_a_row(review_data, REVIEW_COLUMNS)))
+
+        self.shard.write_page(num_page, rows)
+        return len(rows)
+
+    def close(self) -> None:
+        """Close the shard of the worker. The pool is closed by its owner."""
+        self.shard.close()
+
+
+def start_review_worker(pool: SessionPool, shard_dir: str, total_r: int, max_records: int, streaming: bool,
+                        columnar: bool, index: int) -> ReviewWorker:
+    """Return a worker downloading reviews with the pages of pool, and saving them to the shard
+    index of shard_dir.
 
     Preconditions:
-      - lim >= 1
-      - max_records in [5, 10, 15, 20, 25, 50, 100]
+      - max_records == pool.max_records
     """
-    page = EvalPage(url, max_records)
-
-    total_r = page.get_num_records()
-    if lim >= 1:
-        total_r = lim
-    total_p = total_r // max_records
-    if total_r % max_records != 0:
-        total_p += 1
-    inlen = total_p // process_num
-    if total_r % process_num != 0:
-        inlen += 1
-
-    start = inlen * index + 1
-    end = min(inlen * (index + 1) + 1, total_p + 1)
-
-    for i in range(start, end):
-        html = page.get_data(i)
-        document = BeautifulSoup(html, "html.parser")
-        blocks = document.select(".gData")
-        for j in range(len(blocks)):
-            record_index = (i - 1) * max_records + j
-            if record_index >= total_r:
-                return
-
-            order = [
-                "dept", "div", "code", "lec", "lname", "fname", "term", "year", "item1", "item2",
-                "item3", "item4", "item5", "item6", "item9", "item10", "item11", "stnum", "strsp"
-            ]
-            row_data[record_index] = in_a_row(get_review_info_from_html(blocks[j]), order)
-
-
-def scrape_review(save_dir: str = "", filename: str = "review.csv", lim: int = -1, max_records: int = 10, process_num: int = 1) -> None:
+    return ReviewWorker(pool, ShardWriter(shard_dir, index), total_r, max_records, streaming, columnar)
+
+
+def scrape_review(save_dir: str = "", filename: str = "review.csv", lim: int = -1, max_records: int = 10,
+                  process_num: int = 1, max_retries: int = 3, url: str = "",
+                  driver_factory: Callable[[], Driver] = ChromeDriver, streaming: bool = True,
+                  columnar: bool = False) -> None:
     """
     Scrape all the review information from the url specified.
     lim: number of dataset to download. Set to -1 to download all data
     max_records: number of data to download each time
-    process_num: number of webdrivers to download at the same time
+    process_num: number of browsers to download with at the same time
+    max_retries: number of times a page that fails to download is tried again
+    url: link of the evaluation page. Leave empty to log in to Quercus and find it
+    driver_factory: function starting a browser (see review_page.Driver)
+    streaming: whether to parse every page incrementally rather than with Beautiful Soup 4
+      (see get_review_info_from_page)
+    columnar: whether to save the reviews in the columnar format (see columnar.py) rather than csv,
+      so a review information holding ":" is kept as it is
+
+    The browsers are started once, in a pool whose first browser is the one that logged in to
+    Quercus, and a browser that breaks is replaced (see review_page.SessionPool). The pages are
+    downloaded by process_num worker threads sharing the pool, each taking the next page left as
+    soon as it is done with one, and a worker that stops is replaced (see review_scheduler).
+    The rows of every worker are saved to its own shard in the directory <filename>.shards as
+    every page is downloaded. If the download stops, running it again with the same lim and
+    max_records only downloads the pages that were not saved, unless the number of records on
+    the evaluation page changed in between. Once every page is saved, the shards are merged into
+    the csv file (see review_shards).
 
     Note:
       - A relationship between the maximum number of process, the total number of data and number of data to download each time is:
@@ -153,50 +227,65 @@ def scrape_review(save_dir: str = "", filename: str = "review.csv", lim: int = -
       - max_records in [5, 10, 15, 20, 25, 50, 100]
     """
 
-    print("Authentication Required.\n")
-    utorid = input("Enter your UTORid: ")
-    passwd = getpass("Enter your password: ")
-    print("\nLoading Quercus and Evaluation Page...", end="\r")
-    url = QuercusPage().get_link(utorid, passwd)
-
-    processes = []
-    with Manager() as manager:
-        row_data = manager.dict()
-
-        total_r = min(lim, 38632)
-
-        max_process_num = total_r // max_records
-        if total_r % max_records != 0:
-            max_process_num += 1
-
-        if process_num > max_process_num:
-            print("Warning: too many processes are used. The number of process is adjusted")
-            process_num = max_process_num
-
-        for i in range(process_num):
-            p = Process(target=open_and_save, args=(url, i, process_num, row_data, lim, max_records,))
-            p.start()
-            processes.append(p)
-
-        sleep(10)
+    if url == "":
+        print("Authentication Required.\n")
+        utorid = input("Enter your UTORid: ")
+        passwd = getpass("Enter your password: ")
+        print("\nLoading Quercus and Evaluation Page...", end="\r")
+        driver = driver_factory()
+        try:
+            url = QuercusPage(driver).get_link(utorid, passwd)
+        except Exception:
+            driver.quit()
+            raise
+        drivers = [driver]
         print("Loading Quercus and Evaluation Page...Done")
-        monitor = Process(target=progress_monitor, args=(row_data, total_r, 50, "Downloading data:",))
-        monitor.start()
-
-        for p in processes:
-            p.join()
-
-        monitor.join()
-        print("Downloading data...Done ")
-        print("Saving data to csv file...", end="\r")
-
-        save_path = f"{save_dir}/{filename}"
-        with open(abspath(save_path), "w") as w:
-            sorted_data = sorted(row_data.items())
-            for _, value in sorted_data:
-                w.write(f"{value}\n")
-
-        print("Saving data to csv file...Done\n")
+    else:
+        drivers = []
+
+    with SessionPool(url, process_num, max_records, driver_factory, drivers=drivers) as pool:
+        # The number of records is read from the evaluation page
+        with pool.session() as page:
+            num_records = page.get_num_records()
+        total_r = min(lim, num_records) if lim >= 1 else num_records
+
+        save_path = abspath(f"{save_dir}/{filename}")
+        shard_dir = f"{save_path}.shards"
+        saved_pages = prepare_shards(shard_dir, {"total_r": total_r, "max_records": max_records,
+                                                 "columnar": columnar})
+        completed = [count_saved_records(shard_dir)]
+        if len(saved_pages) > 0:
+            print(f"Resuming download: {len(saved_pages)} pages already saved")
+
+        total_p = total_r // max_records
+        if total_r % max_records != 0:
+            total_p += 1
+        pages = [i for i in range(1, total_p + 1) if i not in saved_pages]
+
+        def report(_: int, num_records: int) -> None:
+            """Add the records of a page saved to the progress bar."""
+            completed[0] += num_records
+            print_progress(completed[0], total_r, 50, "Downloading data:")
+
+        print_progress(completed[0], total_r, 50, "Downloading data:")
+        worker_factory = partial(start_review_worker, pool, shard_dir, total_r, max_records, streaming, columnar)
+        failed = schedule_pages(pages, worker_factory, process_num, max_retries, next_shard_index(shard_dir), report,
+                                threads=True)
+
+    if len(failed) > 0:
+        print(f"\n{len(failed)} pages failed to download, for example page {min(failed)}: {failed[min(failed)]}")
+        print("Run again to download the pages that were not saved.")
+        return
+
+    print("\nDownloading data...Done ")
+    print("Saving data to csv file...", end="\r")
+    if columnar:
+        with ColumnarWriter(save_path, "reviews") as writer:
+            writer.write_rows(json.loads(row) for row in merged_rows(shard_dir))
+        shutil.rmtree(shard_dir)
+    else:
+        merge_shards(shard_dir, save_path)
+    print("Saving data to csv file...Done\n")
 
 
 if __name__ == "__main__":
@@ -205,7 +294,8 @@ if __name__ == "__main__":
     import python_ta
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ['bs4', 'dataset_util', 'os.path', 'time', 'multiprocessing', 'review_page', 'getpass'],
+        'extra-imports': ['bs4', 'block_parser', 'columnar', 'dataset_util', 'os.path', 'functools', 'json', 'shutil',
+                          'review_page', 'review_scheduler', 'review_shards', 'getpass'],
         'allowed-io': ['scrape_review'],
         'max-nested-blocks': 4
     })
@@ -0,0 +1,455 @@
+"""SERVER
+This is a python file that serves course recommendations over HTTP, as JSON.
+
+The graph is loaded once at startup (from its snapshot if there is an up-to-date one), and
+the scoring is done by a pool of worker processes, so the event loop only parses requests and
+stays responsive under load. Every worker loads its own copy of the graph from the snapshot,
+which is fast but not shared (see snapshot.py). Recommendation requests that
+arrive together are grouped into one Graph.recommend_courses_batch call per worker task.
+
+Endpoints (parameters are taken from the query string, or from a JSON object in the body
+of a POST request):
+GET /recommend?course=CSC108H1&course=MAT137Y1&limit=3&merge=false
+    {"recommendations": {course: [recommended courses]}}, or a single list of courses if merge
+GET /similarity?item1=CSC108H1&item2=CSC148H1
+    {"score": similarity score}
+GET /lookup?q=CSC10&kind=course&limit=5
+    {"exists": whether q is a vertex of that kind, "similar": [...], "completions": [...]}
+GET /health
+    {"status": "ok", "courses": number of courses}
+
+Items are matched case-insensitively, so "csc108h1" finds CSC108H1 and "ballyk barbara" finds
+the professor "Ballyk Barbara". Items that are not strings (breadth requirements are integers)
+are matched by their string. Items of the same kind that only differ in case are matched exactly.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import json
+import os
+import base
+from fuzzy_index import FuzzyIndex
+from snapshot import KINDS, open_snapshot
+
+# The largest request body accepted, in bytes
+MAX_BODY_BYTES = 1024 * 1024
+# The largest number of courses recommended per course
+MAX_LIMIT = 100
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+# The graph of a worker process, loaded once by _init_worker
+_worker_graph = None
+
+
+def _init_worker(snapshot_path: str) -> None:
+    """Initialize a worker process with the graph in the snapshot at snapshot_path."""
+    global _worker_graph
+    _worker_graph = base.Graph.from_snapshot(open_snapshot(snapshot_path))
+    _worker_graph.build_engine()
+    _worker_graph.enable_cache()
+
+
+def _worker_ready() -> bool:
+    """Return whether the graph of this worker is loaded."""
+    return _worker_graph is not None
+
+
+def _recommend_batch(students: list[list[str]], limit: int, merge: bool) -> list:
+    """Return the recommendations of every student, computed by the graph of this worker."""
+    return _worker_graph.recommend_courses_batch(students, limit, merge)
+
+
+def _similarity(item1: str, item2: str) -> float:
+    """Return the similarity score between the two items, computed by the graph of this worker."""
+    return _worker_graph.similarity_score(item1, item2)
+
+
+class RequestError(ValueError):
+    """Exception raised when a request can't be answered, with the HTTP status to answer with.
+
+    Instance Attributes:
+        - status: The HTTP status code of the response.
+    """
+    status: int
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendationServer:
+    """An HTTP server answering recommendation, similarity and lookup requests on a course graph.
+
+    Instance Attributes:
+        - host: The address the server listens on.
+        - port: The port the server listens on. Set to 0 to pick any free port.
+        - max_batch: The largest number of recommendation requests scored in one worker task.
+        - max_wait: How long a recommendation request may wait for others to batch with, in seconds.
+
+    Representation Invariants:
+        - self.max_batch >= 1
+        - self.max_wait >= 0
+    """
+    host: str
+    port: int
+    max_batch: int
+    max_wait: float
+    # Private Instance Attributes:
+    #   - _graph: the graph, used to check the requested items and for lookups
+    #   - _lookups: the fuzzy lookup index of the vertices of every kind, by their lookup key
+    #   - _lookup_items: the item of every lookup key, by kind. The key of an item is its string in
+    #       upper case, or its exact string if another item of its kind has the same upper case key
+    #   - _ambiguous_keys: the upper case keys shared by several items, by kind
+    #   - _snapshot_path: the path of the graph snapshot opened by the workers
+    #   - _process_num: the number of worker processes
+    #   - _pool: the worker processes, or None if the server is not started
+    #   - _queue: the recommendation requests waiting to be batched, as
+    #       (courses, limit, merge, future of the recommendation)
+    #   - _tasks: the running asyncio tasks, kept until they are done
+    #   - _server: the asyncio server, or None if the server is not started
+    _graph: base.Graph
+    _lookups: dict[str, FuzzyIndex]
+    _lookup_items: dict[str, dict[str, Any]]
+    _ambiguous_keys: dict[str, set[str]]
+    _snapshot_path: str
+    _process_num: int
+    _pool: Optional[ProcessPoolExecutor]
+    _queue: Optional[asyncio.Queue]
+    _tasks: set[asyncio.Task]
+    _server: Optional[asyncio.AbstractServer]
+
+    def __init__(self, reviews_file: str, course_file: str, snapshot_path: str, host: str = "127.0.0.1",
+                 port: int = 8000, process_num: int = 0, max_batch: int = 32, max_wait: float = 0.002) -> None:
+        """Load the graph of the given datasets, saving or reusing its snapshot at snapshot_path.
+        process_num: number of worker processes. Set to 0 to use every core
+
+        Preconditions:
+            - snapshot_path != ''
+            - process_num >= 0
+            - max_batch >= 1
+            - max_wait >= 0
+        """
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._graph = base.load_graph(reviews_file, course_file, snapshot_path)
+        self._lookup_items, self._ambiguous_keys = {}, {}
+        for kind in KINDS:
+            self._lookup_items[kind], self._ambiguous_keys[kind] = _lookup_keys(self._graph.get_all_vertices(kind))
+        self._lookups = {kind: FuzzyIndex(items) for kind, items in self._lookup_items.items()}
+        self._snapshot_path = snapshot_path
+        self._process_num = process_num or os.cpu_count()
+        self._pool = None
+        self._queue = None
+        self._tasks = set()
+        self._server = None
+
+    async def start(self) -> None:
+        """Start the worker processes and listen for connections."""
+        self._pool = ProcessPoolExecutor(self._process_num, initializer=_init_worker,
+                                         initargs=(self._snapshot_path,))
+        # Start the workers before accepting connections: a worker forked while a connection is
+        # open would keep its socket open after the server closes it
+        await asyncio.get_running_loop().run_in_executor(self._pool, _worker_ready)
+        self._queue = asyncio.Queue()
+        self._spawn(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Start the server if needed, and answer requests until it is closed."""
+        if self._server is None:
+            await self.start()
+        print(f"Serving course recommendations on http://{self.host}:{self.port}")
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop listening for connections and shut the worker processes down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _spawn(self, coroutine: Any) -> None:
+        """Run coroutine as a task, keeping a reference to it until it is done."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the HTTP requests of a connection, keeping it open between requests if the
+        client allows it.
+        """
+        try:
+            keep_alive = True
+            while keep_alive:
+                request_line = await reader.readline()
+                if request_line.strip() == b"":
+                    break
+
+                headers = {}
+                line = await reader.readline()
+                while line.strip() != b"":
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                    line = await reader.readline()
+
+                parts = request_line.decode("latin-1").split()
+                keep_alive = (len(parts) == 3 and parts[2] == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                try:
+                    if len(parts) != 3:
+                        raise RequestError(400, "Malformed request line")
+                    body = await self._read_body(reader, headers)
+                    status, payload = 200, await self._dispatch(parts[0], parts[1], body)
+                except RequestError as error:
+                    status, payload = error.status, {"error": str(error)}
+                    keep_alive = keep_alive and error.status != 413
+
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1"))
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: dict[str, str]) -> bytes:
+        """Return the body of a request with the given headers.
+
+        Raise RequestError if the body is too large.
+        """
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length") from None
+
+        if length > MAX_BODY_BYTES or length < 0:
+            raise RequestError(413, f"The request body must be at most {MAX_BODY_BYTES} bytes")
+
+        return await reader.readexactly(length)
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Any:
+        """Return the response to the request of the given method, target and body.
+
+        Raise RequestError if the request can't be answered.
+        """
+        if method not in ("GET", "POST"):
+            raise RequestError(405, f"Method {method} is not allowed")
+
+        url = urlsplit(target)
+        params = {name: values if len(values) > 1 else values[0] for name, values in parse_qs(url.query).items()}
+        if body.strip() != b"":
+            try:
+                body_params = json.loads(body)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                raise RequestError(400, "The request body is not valid JSON") from None
+            if not isinstance(body_params, dict):
+                raise RequestError(400, "The request body must be a JSON object")
+            params.update(body_params)
+
+        if url.path == "/recommend":
+            return await self._recommend(params)
+        elif url.path == "/similarity":
+            return await self._similarity(params)
+        elif url.path == "/lookup":
+            return self._lookup(params)
+        elif url.path == "/health":
+            return {"status": "ok", "courses": len(self._lookups["course"])}
+        else:
+            raise RequestError(404, f"Unknown endpoint {url.path}")
+
+    async def _recommend(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Return the recommendations of the courses in params, through the batching queue."""
+        courses = params.get("course", params.get("courses", []))
+        courses = [courses] if isinstance(courses, str) else courses
+        if not isinstance(courses, list) or not all(isinstance(course, str) for course in courses):
+            raise RequestError(400, "course must be a course code or a list of course codes")
+
+        found = [self._find("course", course) for course in courses]
+        unknown = [course for course, item in zip(courses, found) if item is None]
+        if len(unknown) > 0:
+            raise RequestError(404, f"Unknown courses: {str.join(', ', unknown)}")
+        courses = list(dict.fromkeys(found))
+
+        limit = _int_param(params, "limit", 3, 1, MAX_LIMIT)
+        merge = _bool_param(params, "merge", False)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((courses, limit, merge, future))
+        return {"recommendations": await future}
+
+    async def _similarity(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Return the similarity score between the items in params, computed by a worker."""
+        items = []
+        for name in ("item1", "item2"):
+            item = params.get(name)
+            if not isinstance(item, str):
+                raise RequestError(400, f"{name} must be a string")
+            found = next((found for found in (self._find(kind, item) for kind in KINDS) if found is not None), None)
+            if found is None:
+                raise RequestError(404, f"Unknown item {item}")
+            items.append(found)
+
+        score = await asyncio.get_running_loop().run_in_executor(self._pool, _similarity, *items)
+        return {"score": score}
+
+    def _lookup(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Return whether the query in params is a vertex of the requested kind, with the similar
+        vertices and the vertices it is a prefix of.
+        """
+        query = params.get("q")
+        if not isinstance(query, str):
+            raise RequestError(400, "q must be a string")
+
+        kind = params.get("kind", "course")
+        if kind not in self._lookups:
+            raise RequestError(400, f"kind must be one of {str.join(', ', KINDS)}")
+
+        key = self._query_key(kind, query)
+        lookup = self._lookups[kind]
+        items = self._lookup_items[kind]
+        limit = _int_param(params, "limit", 5, 1, MAX_LIMIT)
+        return {"exists": key in items,
+                "similar": [items[other] for other in lookup.similar(key, limit)],
+                "completions": [items[other] for other in lookup.complete(key, limit)]}
+
+    def _query_key(self, kind: str, query: str) -> str:
+        """Return the lookup key of query among the items of the given kind: query itself if its
+        upper case key is shared by several items, and its upper case key otherwise.
+        """
+        key = _lookup_key(query)
+        return query if key in self._ambiguous_keys[kind] else key
+
+    def _find(self, kind: str, query: str) -> Optional[Any]:
+        """Return the item of the given kind matched by query, or None if there is none."""
+        return self._lookup_items[kind].get(self._query_key(kind, query))
+
+    async def _batch_loop(self) -> None:
+        """Group the queued recommendation requests into batches and score every batch in a worker.
+
+        A batch is sent as soon as it has max_batch requests, or max_wait seconds after its first
+        request. Batches are scored concurrently, so a slow batch never holds back the next ones.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+
+            # Requests with the same settings are scored together
+            groups = {}
+            for courses, limit, merge, future in batch:
+                groups.setdefault((limit, merge), []).append((courses, future))
+            for (limit, merge), requests in groups.items():
+                students = [courses for courses, _ in requests]
+                scoring = loop.run_in_executor(self._pool, _recommend_batch, students, limit, merge)
+                self._spawn(_resolve_batch(scoring, [future for _, future in requests]))
+
+
+async def _resolve_batch(scoring: asyncio.Future, futures: list[asyncio.Future]) -> None:
+    """Set the result of every request in a batch once the batch is scored."""
+    try:
+        recommendations = await scoring
+    except Exception as error:
+        for future in futures:
+            if not future.done():
+                future.set_exception(RequestError(500, f"Scoring failed: {error!r}"))
+        return
+
+    for future, recommendation in zip(futures, recommendations):
+        if not future.done():
+            future.set_result(recommendation)
+
+
+def _lookup_key(item: Any) -> str:
+    """Return the string an item is matched by in lookups: its string, in upper case."""
+    return str(item).upper()
+
+
+def _lookup_keys(items: Iterable[Any]) -> tuple[dict[str, Any], set[str]]:
+    """Return the items by their lookup key, and the lookup keys shared by several items.
+
+    The items that share a lookup key are keyed by their exact string instead, so that none of
+    them replaces another.
+    """
+    by_key = {}
+    for item in items:
+        by_key.setdefault(_lookup_key(item), []).append(item)
+
+    keyed, ambiguous = {}, set()
+    for key, same_key in by_key.items():
+        if len(same_key) == 1:
+            keyed[key] = same_key[0]
+        else:
+            ambiguous.add(key)
+            keyed.update((str(item), item) for item in same_key)
+    return keyed, ambiguous
+
+
+def _int_param(params: dict[str, Any], name: str, default: int, low: int, high: int) -> int:
+    """Return the integer parameter name in params, or default if it is not specified.
+
+    Raise RequestError if it is not an integer between low and high.
+    """
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise RequestError(400, f"{name} must be an integer") from None
+
+    if not low <= value <= high:
+        raise RequestError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _bool_param(params: dict[str, Any], name: str, default: bool) -> bool:
+    """Return the boolean parameter name in params, or default if it is not specified.
+
+    Raise RequestError if it is not a boolean.
+    """
+    value = params.get(name, default)
+    if isinstance(value, str) and value.lower() in ("true", "1", "false", "0"):
+        return value.lower() in ("true", "1")
+    elif isinstance(value, bool):
+        return value
+    else:
+        raise RequestError(400, f"{name} must be true or false")
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['concurrent.futures', 'urllib.parse', 'asyncio', 'json', 'os', 'base', 'fuzzy_index',
+    #                       'snapshot'],
+    #     'allowed-io': ['RecommendationServer.serve_forever'],
+    # })
+
+    server = RecommendationServer("dataset/review_full.csv", "dataset/course.csv", "dataset/review_full.snapshot")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
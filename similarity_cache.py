@@ -0,0 +1,122 @@
+"""Python file that contains a bounded LRU cache for similarity scores and recommendations.
+
+The cache holds the entries of a single version of a graph: as soon as it is used with a
+newer version (bumped whenever a vertex or an edge is added), every older entry is dropped.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Optional
+import sys
+
+
+class LRUCache:
+    """A cache that evicts its least recently used entries once it goes over its memory budget.
+
+    Instance Attributes:
+        - max_bytes: The memory budget of the cache, in (estimated) bytes.
+        - hits: The number of lookups that found an up-to-date entry.
+        - misses: The number of lookups that found no entry or a stale entry.
+        - evictions: The number of entries evicted to stay under max_bytes.
+
+    Representation Invariants:
+        - self.max_bytes >= 0
+        - self._bytes <= self.max_bytes
+    """
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    # Private Instance Attributes:
+    #   - _version: the graph version of the entries
+    #   - _entries: maps every key to (value, size), from the least to the most recently used
+    #   - _bytes: the total estimated size of the entries
+    _version: int
+    _entries: OrderedDict[Any, tuple[Any, int]]
+    _bytes: int
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Initialize an empty cache with the given memory budget."""
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._version = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        """Return the number of entries in the cache."""
+        return len(self._entries)
+
+    def get(self, key: Any, version: int) -> Optional[Any]:
+        """Return the value cached under key for the given graph version, or None if there is none."""
+        self._check_version(version)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Any, value: Any, version: int) -> None:
+        """Cache value under key for the given graph version, evicting the least recently used
+        entries if the cache goes over its memory budget.
+        A value larger than the whole budget is not cached.
+        """
+        self._check_version(version)
+        if key in self._entries:
+            self._remove(key)
+
+        size = estimate_size(key) + estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry from the cache, keeping the counters."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Return the counters of the cache, with its number of entries and estimated size."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _check_version(self, version: int) -> None:
+        """Drop every entry if they are from another graph version than version."""
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def _remove(self, key: Any) -> None:
+        """Remove the entry of key from the cache."""
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+def estimate_size(obj: Any) -> int:
+    """Return the estimated size of obj in bytes, including the items of tuples, lists
+    and frozensets.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list, frozenset)):
+        size += sum(estimate_size(item) for item in obj)
+
+    return size
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['collections', 'sys'],
+    })
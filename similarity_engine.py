@@ -0,0 +1,220 @@
+"""Python file that contains a precomputed similarity engine for course graphs.
+
+The engine encodes the programme, professor, breadth_req and course_level neighbours of
+every course as integer-indexed sparse vectors, so that one course can be scored against
+the whole catalogue in a single vectorized pass. The scores are exactly the ones returned by
+_Vertex.get_similarity_score.
+"""
+
+from __future__ import annotations
+from typing import Any, Iterable, TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    from base import Graph
+
+# Feature kinds in the order they are summed up by _Vertex.get_similarity_score
+KIND_WEIGHTS = {"programme": 0.4, "professor": 0.2, "breadth_req": 0.2, "course_level": 0.2}
+
+
+class SimilarityEngine:
+    """A sparse feature matrix of all the courses in a graph.
+
+    Instance Attributes:
+        - codes: The course codes, indexed by course id.
+
+    Representation Invariants:
+        - all(self._course_ids[self.codes[i]] == i for i in range(len(self.codes)))
+    """
+    codes: list[str]
+    # Private Instance Attributes:
+    #   - _course_ids: maps every course code to its course id
+    #   - _rank: the position of every course id in the sorted list of course codes
+    #   - _attr_ids: maps (kind, item) of every attribute vertex to its attribute id
+    #   - _postings: the course ids and edge weights attached to every attribute id
+    #   - _features: the attribute ids and edge weights of every course id, per kind
+    #   - _degree: the number of neighbours of every course id, per kind
+    #   - _total_degree: the total number of neighbours of every course id
+    _course_ids: dict[str, int]
+    _rank: np.ndarray
+    _attr_ids: dict[tuple[str, Any], int]
+    _postings: list[tuple[np.ndarray, np.ndarray]]
+    _features: list[dict[str, tuple[np.ndarray, np.ndarray]]]
+    _degree: dict[str, np.ndarray]
+    _total_degree: np.ndarray
+
+    def __init__(self, graph: Graph) -> None:
+        """Build the engine from every course vertex in graph."""
+        self.codes = []
+        self._course_ids = {}
+        self._rank = np.zeros(0, dtype=np.int64)
+        self._attr_ids = {}
+        self._postings = []
+        self._features = []
+        self._degree = {kind: np.zeros(0, dtype=np.int64) for kind in KIND_WEIGHTS}
+        self._total_degree = np.zeros(0, dtype=np.int64)
+        self.update(graph, sorted(graph.get_all_vertices("course")))
+
+    def update(self, graph: Graph, courses: Iterable[str]) -> None:
+        """Re-encode the given courses from graph, adding the ones that are not in this engine yet.
+
+        Only the given courses and the postings of their old and new neighbours are changed.
+
+        Preconditions:
+            - all(course in graph.get_all_vertices("course") for course in courses)
+        """
+        courses = list(dict.fromkeys(courses))
+        new_codes = [code for code in courses if code not in self._course_ids]
+        if len(new_codes) > 0:
+            self._add_courses(new_codes)
+
+        # Collect the new postings of every touched course, and every attribute to rebuild
+        touched = np.array(sorted(self._course_ids[code] for code in courses), dtype=np.int64)
+        changed_attrs = set()
+        new_postings = {}
+        for code in courses:
+            course_id = self._course_ids[code]
+            for attr_ids, _ in self._features[course_id].values():
+                changed_attrs.update(attr_ids.tolist())
+
+            self._total_degree[course_id] = len(graph.get_weighted_neighbours(code))
+            features = {}
+            for kind in KIND_WEIGHTS:
+                attrs = graph.get_weighted_neighbours(code, kind)
+                ids = []
+                for item, weight in attrs.items():
+                    key = (kind, item)
+                    if key not in self._attr_ids:
+                        self._attr_ids[key] = len(self._postings)
+                        self._postings.append((np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)))
+                    attr_id = self._attr_ids[key]
+                    ids.append(attr_id)
+                    new_postings.setdefault(attr_id, ([], []))
+                    new_postings[attr_id][0].append(course_id)
+                    new_postings[attr_id][1].append(weight)
+                features[kind] = (np.array(ids, dtype=np.int64),
+                                  np.array(list(attrs.values()), dtype=np.float64))
+                self._degree[kind][course_id] = len(ids)
+            self._features[course_id] = features
+
+        changed_attrs.update(new_postings)
+
+        for attr_id in changed_attrs:
+            ids, weights = self._postings[attr_id]
+            added_ids, added_weights = new_postings.get(attr_id, ([], []))
+            added_ids = np.array(added_ids, dtype=np.int64)
+            added_weights = np.array(added_weights, dtype=np.float64)
+            if len(ids) > 0:
+                keep = ~np.isin(ids, touched)
+                added_ids = np.concatenate([ids[keep], added_ids])
+                added_weights = np.concatenate([weights[keep], added_weights])
+            self._postings[attr_id] = (added_ids, added_weights)
+
+    def _add_courses(self, codes: list[str]) -> None:
+        """Give new course ids to the given courses, with no neighbours yet.
+
+        Preconditions:
+            - all(code not in self for code in codes)
+        """
+        for code in codes:
+            self._course_ids[code] = len(self.codes)
+            self.codes.append(code)
+            self._features.append({})
+
+        padding = np.zeros(len(codes), dtype=np.int64)
+        for kind in KIND_WEIGHTS:
+            self._degree[kind] = np.concatenate([self._degree[kind], padding])
+        self._total_degree = np.concatenate([self._total_degree, padding])
+
+        self._rank = np.zeros(len(self.codes), dtype=np.int64)
+        self._rank[sorted(range(len(self.codes)), key=self.codes.__getitem__)] = np.arange(len(self.codes))
+
+    def __contains__(self, code: Any) -> bool:
+        """Return whether code is a course known by this engine."""
+        return code in self._course_ids
+
+    def score_all(self, code: str) -> np.ndarray:
+        """Return the similarity score between the given course and every course, indexed by course id.
+
+        Raise ValueError if code is not a course known by this engine.
+        """
+        if code not in self._course_ids:
+            raise ValueError
+
+        course_id = self._course_ids[code]
+        num_courses = len(self.codes)
+        scores = np.zeros(num_courses, dtype=np.float64)
+        if self._total_degree[course_id] == 0:
+            return scores
+
+        for kind, kind_weight in KIND_WEIGHTS.items():
+            attr_ids, weights = self._features[course_id][kind]
+            if len(attr_ids) == 0:
+                # Nothing is shared, so every score of this kind is 0
+                shared = np.zeros(num_courses, dtype=np.int64)
+                matched = shared
+            else:
+                postings = [self._postings[attr_id] for attr_id in attr_ids]
+                ids = np.concatenate([p[0] for p in postings])
+                other_weights = np.concatenate([p[1] for p in postings])
+                own_weights = np.repeat(weights, [len(p[0]) for p in postings])
+                shared = np.bincount(ids, minlength=num_courses)
+                matched = np.bincount(ids[other_weights == own_weights], minlength=num_courses)
+
+            union = self._degree[kind][course_id] + self._degree[kind] - shared
+            ratio = np.divide(matched, union, out=np.zeros(num_courses), where=union != 0)
+            scores += kind_weight * ratio
+
+        scores[self._total_degree == 0] = 0.0
+        return scores
+
+    def recommend(self, code: str, limit: int = 3) -> list[str]:
+        """Return up to <limit> courses most similar to the given course, in the same order as
+        Graph.recommend_courses.
+
+        Preconditions:
+            - code in self
+            - limit >= 1
+        """
+        return [course for course, _ in self.ranked(code, limit)]
+
+    def ranked(self, code: str, limit: int = 3) -> list[tuple[str, float]]:
+        """Return up to <limit> courses most similar to the given course with their similarity scores,
+        in the same order as Graph.recommend_courses.
+
+        Preconditions:
+            - code in self
+            - limit >= 1
+        """
+        scores = self.score_all(code)
+        candidates = np.ones(len(self.codes), dtype=bool)
+        candidates[self._course_ids[code]] = False
+        return [(self.codes[i], float(scores[i])) for i in self._top_k(scores, candidates, limit)]
+
+    def _top_k(self, scores: np.ndarray, candidates: np.ndarray, limit: int) -> np.ndarray:
+        """Return the ids of the <limit> candidates with the highest scores, breaking ties
+        by course code.
+        """
+        ids = np.flatnonzero(candidates)
+        limit = min(limit, len(ids))
+        if limit <= 0:
+            return ids[:0]
+
+        candidate_scores = scores[ids]
+        threshold = np.partition(candidate_scores, len(ids) - limit)[len(ids) - limit]
+        above = ids[candidate_scores > threshold]
+        tied = ids[candidate_scores == threshold]
+        tied = tied[np.argsort(self._rank[tied])[:limit - len(above)]]
+
+        selected = np.concatenate([above, tied])
+        order = np.lexsort((self._rank[selected], -scores[selected]))
+        return selected[order]
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['numpy', 'base'],
+    })
@@ -0,0 +1,143 @@
+"""Python file that contains an inverted index of the courses in a course graph.
+
+The index maps every programme, professor, breadth_req and course_level vertex to the courses
+attached to it. Courses that share none of these vertices with a course have a similarity
+score of 0 with it, so recommendations only need to score the courses found through the index.
+The kinds are scanned from the heaviest to the lightest, and the scan stops as soon as the
+courses that are not found yet can no longer make it into the top courses.
+"""
+
+from __future__ import annotations
+from typing import Any, Iterable, TYPE_CHECKING
+import heapq
+from similarity_engine import KIND_WEIGHTS
+
+if TYPE_CHECKING:
+    from base import Graph
+
+
+class SimilarityIndex:
+    """An inverted index from attribute vertices to the courses attached to them.
+
+    Representation Invariants:
+        - all(course in self._postings[(kind, item)] for course in self._features
+              for kind in self._features[course] for item in self._features[course][kind])
+    """
+    # Private Instance Attributes:
+    #   - _codes: all the course codes, sorted
+    #   - _features: the neighbours of every course and their edge weights, per kind
+    #   - _degree: the total number of neighbours of every course
+    #   - _postings: the courses attached to every (kind, item) attribute vertex
+    _codes: list[str]
+    _features: dict[str, dict[str, dict[Any, float]]]
+    _degree: dict[str, int]
+    _postings: dict[tuple[str, Any], set[str]]
+
+    def __init__(self, graph: Graph) -> None:
+        """Build the index from every course vertex in graph."""
+        self._codes = []
+        self._features = {}
+        self._degree = {}
+        self._postings = {}
+        self.update(graph, graph.get_all_vertices("course"))
+
+    def __contains__(self, code: Any) -> bool:
+        """Return whether code is a course known by this index."""
+        return code in self._features
+
+    def update(self, graph: Graph, courses: Iterable[str]) -> None:
+        """Re-index the given courses from graph, adding the ones that are not in this index yet.
+
+        Preconditions:
+            - all(course in graph.get_all_vertices("course") for course in courses)
+        """
+        courses = set(courses)
+        has_new_courses = not courses.issubset(self._features)
+        for code in courses:
+            for kind, attrs in self._features.get(code, {}).items():
+                for item in attrs:
+                    self._postings[(kind, item)].discard(code)
+
+            self._features[code] = {kind: graph.get_weighted_neighbours(code, kind) for kind in KIND_WEIGHTS}
+            self._degree[code] = len(graph.get_weighted_neighbours(code))
+            for kind, attrs in self._features[code].items():
+                for item in attrs:
+                    self._postings.setdefault((kind, item), set()).add(code)
+
+        if has_new_courses:
+            self._codes = sorted(self._features)
+
+    def similarity_score(self, code1: str, code2: str) -> float:
+        """Return the similarity score between the two courses, as computed by
+        _Vertex.get_similarity_score.
+
+        Preconditions:
+            - code1 in self and code2 in self
+        """
+        if self._degree[code1] == 0 or self._degree[code2] == 0:
+            return 0.0
+
+        score = 0.0
+        for kind, kind_weight in KIND_WEIGHTS.items():
+            attrs1 = self._features[code1][kind]
+            attrs2 = self._features[code2][kind]
+            shared = 0
+            matched = 0
+            for item in attrs1:
+                if item in attrs2:
+                    shared += 1
+                    if attrs1[item] == attrs2[item]:
+                        matched += 1
+
+            union = len(attrs1) + len(attrs2) - shared
+            if union != 0:
+                score += kind_weight * (matched / union)
+
+        return score
+
+    def ranked(self, code: str, limit: int = 3) -> list[tuple[str, float]]:
+        """Return up to <limit> courses most similar to the given course with their similarity scores,
+        in the same order as Graph.recommend_courses.
+
+        Preconditions:
+            - code in self
+            - limit >= 1
+        """
+        scores = {}
+        remaining = {kind: kind_weight for kind, kind_weight in KIND_WEIGHTS.items()
+                     if len(self._features[code][kind]) > 0}
+
+        for kind in KIND_WEIGHTS:
+            # Courses that are not scored yet share nothing of the kinds scanned so far
+            bound = sum(remaining.values())
+            top = heapq.nsmallest(limit, ((-score, crs) for crs, score in scores.items()))
+            if len(top) == limit and -top[-1][0] > bound:
+                return [(crs, -score) for score, crs in top]
+
+            for item in self._features[code][kind]:
+                for crs in self._postings[(kind, item)]:
+                    if crs != code and crs not in scores:
+                        scores[crs] = self.similarity_score(code, crs)
+            remaining.pop(kind, None)
+
+        # The courses that are still not scored share nothing with code, so their score is 0,
+        # and only the first <limit> of them by course code can make it into the top courses
+        num_zeros = 0
+        for crs in self._codes:
+            if num_zeros >= limit:
+                break
+            if crs != code and crs not in scores:
+                scores[crs] = 0.0
+                num_zeros += 1
+
+        top = heapq.nsmallest(limit, ((-score, crs) for crs, score in scores.items()))
+        return [(crs, -score) for score, crs in top]
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['heapq', 'base', 'similarity_engine'],
+    })
@@ -0,0 +1,210 @@
+"""Python file that reads and writes binary snapshots of a loaded course graph.
+
+A snapshot stores the vertices of a graph as integer ids with a kind table, and the edges
+in CSR form (indptr, indices and weights arrays). The arrays are memory-mapped when a
+snapshot is opened, so loading a graph from a snapshot only copies its arrays into the graph,
+without parsing the source files.
+
+Snapshots make warm starts fast. They do not let processes share one copy of a graph. Only the
+pages of the snapshot file are shared by the processes that open it: Graph.from_snapshot copies
+the vertices and edges into Python objects, because every read path of Graph (neighbours,
+similarity scores, the similarity engine and index) works on those objects. So every worker
+process that loads a graph (see server.py and precompute_similarity.py) holds a full private copy
+of it, as large as a graph built from the source files.
+
+The snapshot file has the following layout:
+  - MAGIC, followed by the length of the header as a little-endian unsigned 64-bit integer
+  - the header, a JSON object with the source key and the offset, dtype and length of every array
+  - the arrays, each aligned to 8 bytes
+"""
+
+from __future__ import annotations
+from typing import Any, Optional
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b"CRSGRAPH"
+VERSION = 2
+KINDS = ("course", "programme", "course_level", "breadth_req", "professor")
+
+
+def source_key(*paths: str) -> str:
+    """Return a key identifying the current content of the given source files,
+    based on their size and modification time.
+    """
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+
+    return str.join("|", parts)
+
+
+def write_snapshot(path: str, key: str, items: list[Any], kinds: list[str],
+                   adjacency: list[list[tuple[int, Any]]], review_stats: Optional[list[tuple]] = None) -> None:
+    """Write a snapshot of a graph to path.
+
+    items and kinds are the item and kind of every vertex, indexed by vertex id, and
+    adjacency[i] is the list of (vertex id, weight) of the neighbours of vertex i.
+    review_stats is a list of (course id, professor id, term index, score sum, number of reviews,
+    weighted score sum, weight sum) of the reviews the graph was built from, all integers.
+    The snapshot is written to a temporary file first, so an existing snapshot at path is
+    never left half written.
+
+    Preconditions:
+        - len(items) == len(kinds) == len(adjacency)
+        - all(kind in KINDS for kind in kinds)
+        - all(isinstance(item, (int, str)) for item in items)
+    """
+    encoded = [str(item).encode("utf-8") for item in items]
+    item_offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    item_offsets[1:] = np.cumsum([len(e) for e in encoded])
+    indptr = np.zeros(len(items) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(neighbours) for neighbours in adjacency])
+    weights = [weight for neighbours in adjacency for _, weight in neighbours]
+
+    arrays = {
+        "kinds": np.array([KINDS.index(kind) for kind in kinds], dtype=np.uint8),
+        "item_is_int": np.array([isinstance(item, int) for item in items], dtype=np.uint8),
+        "item_offsets": item_offsets,
+        "item_data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "indptr": indptr,
+        "indices": np.array([u for neighbours in adjacency for u, _ in neighbours], dtype=np.int32),
+        "weights": np.array(weights, dtype=np.float64),
+        "weight_is_int": np.array([isinstance(weight, int) for weight in weights], dtype=np.uint8),
+        "review_stats": np.array(review_stats or [], dtype=np.int64).reshape(-1)
+    }
+
+    header = {"version": VERSION, "key": key, "num_vertices": len(items), "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = [offset, array.dtype.str, len(array)]
+        offset += _aligned(array.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as w:
+        w.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+        w.write(b"\0" * (data_start - w.tell()))
+        for array in arrays.values():
+            w.write(array.tobytes())
+            w.write(b"\0" * (_aligned(array.nbytes) - array.nbytes))
+    os.replace(tmp_path, path)
+
+
+def _aligned(num_bytes: int) -> int:
+    """Return num_bytes rounded up to a multiple of 8."""
+    return (num_bytes + 7) // 8 * 8
+
+
+class GraphSnapshot:
+    """A read-only, memory-mapped snapshot of a graph.
+
+    Instance Attributes:
+        - key: The key of the source files the snapshot was built from.
+        - kinds: The kind of every vertex, as an index into KINDS.
+        - indptr: The neighbours of vertex i are indices[indptr[i]:indptr[i + 1]].
+        - indices: The vertex ids of the neighbours of every vertex.
+        - weights: The edge weights, aligned with indices.
+    """
+    key: str
+    kinds: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    weights: np.ndarray
+    # Private Instance Attributes:
+    #   - _mmap: the memory map of the snapshot file
+    #   - _arrays: the arrays stored in the snapshot, by name
+    _mmap: mmap.mmap
+    _arrays: dict[str, np.ndarray]
+
+    def __init__(self, path: str) -> None:
+        """Memory-map the snapshot at path.
+
+        Raise ValueError if path is not a snapshot written by this version of write_snapshot.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError
+
+        header_len = struct.unpack("<Q", self._mmap[len(MAGIC):len(MAGIC) + 8])[0]
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_len].decode("utf-8"))
+        if header["version"] != VERSION:
+            raise ValueError
+
+        data_start = _aligned(header_start + header_len)
+        self._arrays = {}
+        for name, (offset, dtype, length) in header["arrays"].items():
+            self._arrays[name] = np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=length,
+                                               offset=data_start + offset)
+
+        self.key = header["key"]
+        self.kinds = self._arrays["kinds"]
+        self.indptr = self._arrays["indptr"]
+        self.indices = self._arrays["indices"]
+        self.weights = self._arrays["weights"]
+
+    def __len__(self) -> int:
+        """Return the number of vertices in the snapshot."""
+        return len(self.kinds)
+
+    def items(self) -> list[Any]:
+        """Return the item of every vertex, indexed by vertex id."""
+        offsets = self._arrays["item_offsets"].tolist()
+        is_int = self._arrays["item_is_int"].tolist()
+        raw = self._arrays["item_data"].tobytes()
+        if raw.isascii():
+            # Byte offsets are also character offsets, so decode everything at once
+            data = raw.decode("ascii")
+            strings = [data[offsets[i]:offsets[i + 1]] for i in range(len(is_int))]
+        else:
+            strings = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(is_int))]
+
+        return [int(s) if is_int[i] else s for i, s in enumerate(strings)]
+
+    def edge_weights(self) -> list[Any]:
+        """Return the edge weights aligned with indices, with integer weights restored as int."""
+        weights = self.weights.tolist()
+        for i in np.flatnonzero(self._arrays["weight_is_int"]).tolist():
+            weights[i] = int(weights[i])
+
+        return weights
+
+    def review_stats(self) -> list[tuple]:
+        """Return the review statistics stored in the snapshot, as passed to write_snapshot."""
+        return [tuple(row) for row in self._arrays["review_stats"].reshape(-1, 7).tolist()]
+
+
+def open_snapshot(path: str, key: str = '') -> Optional[GraphSnapshot]:
+    """Return the snapshot at path, or None if there is no valid snapshot at path.
+    If key is specified, also return None if the snapshot was built from other source files.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        snapshot = GraphSnapshot(path)
+    except (ValueError, KeyError, struct.error, json.JSONDecodeError):
+        return None
+
+    if key != '' and snapshot.key != key:
+        return None
+    else:
+        return snapshot
+
+
+if __name__ == "__main__":
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['json', 'mmap', 'os', 'struct', 'numpy'],
+        'allowed-io': ['write_snapshot', 'GraphSnapshot.__init__']
+    })
@@ -0,0 +1,358 @@
+"""SYNTHETIC_DATASET
+This is a python file that generates synthetic course and review datasets, in the formats
+written by scrape_course.py and scrape_review.py and read by base.load_graph, for testing the
+graph and the recommender at a larger scale than the bundled datasets.
+
+The course dataset is pipe-delimited (CODE|NAME|PREREQ|COREQ|BREADTH_REQ) and the review
+dataset is colon-delimited with the 19 columns described in scrape_review.py. Breadth
+requirements are written in lower case and separated by commas without spaces, which is the
+form base.load_course_breadthreqs recognizes. "Thought, belief, and behaviour (2)" contains
+commas itself, so it is never recognized and is not generated.
+
+Everything is drawn from random generators seeded with DatasetConfig.seed, so the same
+configuration always generates the same files. The courses are kept in memory (a few arrays of
+one entry per course), but the reviews are generated and written a batch of rows at a time,
+so the number of reviews is only limited by the disk.
+
+Usage:
+    python synthetic_dataset.py --programmes 2000 --courses-per-level 20 20 20 20 \\
+        --professors 40000 --reviews-per-course 50 --save-dir dataset/synthetic
+"""
+
+from __future__ import annotations
+from typing import Optional
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+BREADTH_REQS = {
+    1: "creative and cultural representations (1)",
+    3: "society and its institutions (3)",
+    4: "living things and their environment (4)",
+    5: "the physical and mathematical universes (5)"
+}
+TERMS = ("Fall", "Winter", "Summer")
+# The mean of every item of the review dataset, from ITEM1 to ITEM11 (ITEM10 is the workload)
+ITEM_MEANS = (4.2, 4.1, 4.0, 4.0, 4.0, 3.9, 3.9, 3.4, 3.8)
+# The probability that a course has a second breadth requirement, besides the one of its programme
+SECOND_BREADTH_RATE = 0.25
+# The probability that a course of level 2 or above lists a course of its programme as prerequisite
+PREREQ_RATE = 0.6
+# The probability that a professor of a course is from another programme
+CROSS_PROGRAMME_RATE = 0.1
+
+_FIRST_NAMES = ("Alex", "Ana", "Ben", "Chen", "David", "Elena", "Farah", "Grace", "Hiro", "Ines", "Jamal", "Julia",
+                "Kofi", "Lena", "Maria", "Mei", "Nadia", "Omar", "Priya", "Raj", "Sara", "Tomas", "Wei", "Yusuf")
+_SYLLABLES = ("ba", "ber", "ca", "den", "dor", "el", "fa", "gan", "har", "is", "ka", "lin", "mar", "mo", "nel",
+              "ov", "pa", "ri", "san", "ta", "ton", "va", "wi", "zo")
+_NAME_WORDS = ("Introduction to", "Topics in", "Foundations of", "Methods in", "Advanced", "Seminar in",
+               "Theory of", "Practice of")
+_MAX_PROGRAMMES = 26 ** 3
+_MAX_COURSES_PER_LEVEL = 200
+
+
+class DatasetConfig:
+    """The shape of a synthetic dataset.
+
+    Instance Attributes:
+        - num_programmes: The number of programmes, every one with a three letter code.
+        - courses_per_level: The number of courses of every programme at level 1, 2, 3 and 4.
+        - num_professors: The number of professors, evenly shared among the programmes.
+        - reviews_per_course: The mean number of reviews of a course.
+        - breadth_mix: The relative weight of every breadth requirement (a key of BREADTH_REQS),
+          or of no breadth requirement (0), among the programmes.
+        - popularity_skew: The exponent of the Zipf-like popularity of the courses and professors:
+          0 gives every course the same expected number of reviews, and the higher it is, the more
+          the reviews go to a few popular courses and professors.
+        - professors_per_course: The maximum number of professors teaching a course.
+        - years: The first and last year of the reviews.
+        - seed: The seed of the random generators.
+
+    Representation Invariants:
+        - 1 <= self.num_programmes <= 26 ** 3
+        - len(self.courses_per_level) == 4
+        - all(0 <= n <= 200 for n in self.courses_per_level)
+        - self.num_professors >= 1
+        - self.reviews_per_course >= 0
+        - all(k == 0 or k in BREADTH_REQS for k in self.breadth_mix)
+        - sum(self.breadth_mix.values()) > 0
+        - self.popularity_skew >= 0
+        - self.professors_per_course >= 1
+        - self.years[0] <= self.years[1]
+    """
+    num_programmes: int
+    courses_per_level: tuple[int, int, int, int]
+    num_professors: int
+    reviews_per_course: float
+    breadth_mix: dict[int, float]
+    popularity_skew: float
+    professors_per_course: int
+    years: tuple[int, int]
+    seed: int
+
+    def __init__(self, num_programmes: int = 150, courses_per_level: tuple[int, int, int, int] = (6, 8, 10, 10),
+                 num_professors: int = 3000, reviews_per_course: float = 8.0,
+                 breadth_mix: Optional[dict[int, float]] = None, popularity_skew: float = 1.0,
+                 professors_per_course: int = 3, years: tuple[int, int] = (2012, 2023), seed: int = 0) -> None:
+        """Initialize a dataset configuration. The default one is about the size of review_full.csv."""
+        self.num_programmes = num_programmes
+        self.courses_per_level = courses_per_level
+        self.num_professors = num_professors
+        self.reviews_per_course = reviews_per_course
+        self.breadth_mix = breadth_mix if breadth_mix is not None else {0: 0.1, 1: 0.3, 3: 0.35, 4: 0.1, 5: 0.15}
+        self.popularity_skew = popularity_skew
+        self.professors_per_course = professors_per_course
+        self.years = years
+        self.seed = seed
+
+    def num_courses(self) -> int:
+        """Return the number of courses of the dataset."""
+        return self.num_programmes * sum(self.courses_per_level)
+
+
+class _Courses:
+    """The courses of a synthetic dataset, in the order of the course dataset.
+
+    Instance Attributes:
+        - codes: The code of every course.
+        - programmes: The programme of every course, as an index of programme_codes.
+        - levels: The level of every course, from 1 to 4.
+        - programme_codes: The code of every programme.
+    """
+    codes: list[str]
+    programmes: np.ndarray
+    levels: np.ndarray
+    programme_codes: list[str]
+
+    def __init__(self, config: DatasetConfig) -> None:
+        """Generate the courses of the dataset of config. They don't depend on random numbers."""
+        # Spread the programme codes over the alphabet instead of starting at AAA, AAB, AAC, ...
+        self.programme_codes = [_letters(i * 7919 % _MAX_PROGRAMMES) for i in range(config.num_programmes)]
+        self.codes = []
+        programmes, levels = [], []
+        for programme, programme_code in enumerate(self.programme_codes):
+            for level, num_courses in enumerate(config.courses_per_level, 1):
+                for j in range(num_courses):
+                    # Half courses (H) and full courses (Y) alternate: XXX100H1, XXX100Y1, XXX101H1, ...
+                    self.codes.append(f"{programme_code}{level}{j // 2:02}{'HY'[j % 2]}1")
+                    programmes.append(programme)
+                    levels.append(level)
+        self.programmes = np.array(programmes, dtype=np.int64)
+        self.levels = np.array(levels, dtype=np.int64)
+
+
+def generate_courses(config: DatasetConfig, course_file: str) -> int:
+    """Write the course dataset of config to course_file, and return the number of courses.
+
+    Every programme gets a breadth requirement drawn from config.breadth_mix, which all its
+    courses have, and some courses have a second one. Some courses of level 2 or above have a
+    course of a lower level of their programme as prerequisite.
+    """
+    rng = np.random.default_rng([config.seed, 0])
+    courses = _Courses(config)
+    n = len(courses.codes)
+
+    breadth_keys = list(config.breadth_mix)
+    breadth_p = np.array([config.breadth_mix[k] for k in breadth_keys], dtype=float)
+    breadth_p /= breadth_p.sum()
+    programme_breadth = rng.choice(len(breadth_keys), size=config.num_programmes, p=breadth_p)
+    second_breadth = np.where(rng.random(n) < SECOND_BREADTH_RATE, rng.choice(len(breadth_keys), size=n, p=breadth_p),
+                              -1)
+    has_prereq = rng.random(n) < PREREQ_RATE
+    prereq_offset = rng.random(n)
+    names = rng.integers(len(_NAME_WORDS), size=n)
+
+    # The first course of every (programme, level), to draw prerequisites from
+    first_of_level = {}
+    for i in range(n):
+        first_of_level.setdefault((int(courses.programmes[i]), int(courses.levels[i])), i)
+
+    with open(course_file + ".tmp", 'w') as w:
+        for i in range(n):
+            programme, level = int(courses.programmes[i]), int(courses.levels[i])
+            breadthreqs = []
+            for key in (programme_breadth[programme], second_breadth[i]):
+                if key >= 0 and breadth_keys[key] != 0 and BREADTH_REQS[breadth_keys[key]] not in breadthreqs:
+                    breadthreqs.append(BREADTH_REQS[breadth_keys[key]])
+
+            prereq = ""
+            lower_levels = [lv for lv in range(1, level) if (programme, lv) in first_of_level]
+            if has_prereq[i] and len(lower_levels) > 0:
+                prereq_level = lower_levels[-1]
+                first = first_of_level[(programme, prereq_level)]
+                num_candidates = config.courses_per_level[prereq_level - 1]
+                prereq = courses.codes[first + int(prereq_offset[i] * num_candidates)]
+
+            name = f"{_NAME_WORDS[names[i]]} {courses.programme_codes[programme]} {level}"
+            w.write(f"{courses.codes[i]}|{name}|{prereq}||{','.join(breadthreqs)}\n")
+    os.replace(course_file + ".tmp", course_file)
+
+    return n
+
+
+def generate_reviews(config: DatasetConfig, reviews_file: str, batch_rows: int = 100000,
+                     report: bool = False) -> int:
+    """Write the review dataset of config to reviews_file, and return the number of reviews.
+
+    The reviews of every course are written together, in the order of the course dataset, a
+    batch of about batch_rows rows at a time. The number of reviews of a course and the
+    professor of a review follow a Zipf-like popularity with exponent config.popularity_skew.
+    Every course and professor has its own quality, so the scores of a (course, professor) pair
+    are consistent across its reviews.
+    If report is True, print the number of rows written so far and the rows per second.
+
+    Preconditions:
+        - batch_rows >= 1
+    """
+    rng = np.random.default_rng([config.seed, 1])
+    courses = _Courses(config)
+    n = len(courses.codes)
+
+    # The number of reviews of every course
+    popularity = _zipf_weights(n, config.popularity_skew, rng)
+    counts = rng.multinomial(round(config.reviews_per_course * n), popularity) if n > 0 else np.zeros(0, np.int64)
+
+    # The professors of every course: mostly from the programme of the course, popular ones first
+    per_programme = -(-config.num_professors // config.num_programmes)
+    k = config.professors_per_course
+    rank = rng.choice(per_programme, size=(n, k), p=_zipf_weights(per_programme, config.popularity_skew, rng))
+    professors = courses.programmes[:, None] + rank * config.num_programmes
+    cross = rng.random((n, k)) < CROSS_PROGRAMME_RATE
+    professors = np.where(cross | (professors >= config.num_professors),
+                          rng.integers(config.num_professors, size=(n, k)), professors)
+    slot_p = _zipf_weights(k, 1.0, None)
+
+    course_quality = rng.normal(0.0, 0.35, n)
+    professor_quality = rng.normal(0.0, 0.3, config.num_professors)
+    # Lower level courses are larger
+    class_size = rng.lognormal(np.log(np.array([1, 150, 80, 40, 20]))[courses.levels], 0.6)
+
+    prefixes = [f"{courses.programme_codes[courses.programmes[i]]}:ARTSC:{code}:"
+                for i, code in enumerate(courses.codes)]
+    names = [f"{_last_name(i)}:{_FIRST_NAMES[i % len(_FIRST_NAMES)]}" for i in range(config.num_professors)]
+    terms = [f"{term}:{year}" for year in range(config.years[0], config.years[1] + 1) for term in TERMS]
+    items = [f"{i / 10:.1f}" for i in range(51)]
+    item_means = np.array(ITEM_MEANS)
+
+    total_rows = int(counts.sum())
+    ends = np.cumsum(counts)
+    num_rows = 0
+    start = time.perf_counter()
+    with open(reviews_file + ".tmp", 'w') as w:
+        first = 0
+        while first < n:
+            # The courses of this batch: at least one, and about batch_rows rows
+            last = max(first + 1, int(np.searchsorted(ends, num_rows + batch_rows, side='right')))
+            batch_counts = counts[first:last]
+            course = np.repeat(np.arange(first, last), batch_counts)
+            m = len(course)
+
+            professor = professors[course, rng.choice(k, size=m, p=slot_p)]
+            section = np.where(rng.random(m) < 0.15, "LEC5101", "LEC0101")
+            term = rng.integers(len(terms), size=m)
+            quality = course_quality[course] + professor_quality[professor] + rng.normal(0.0, 0.15, m)
+            scores = quality[:, None] + item_means[None, :] + rng.normal(0.0, 0.2, (m, len(ITEM_MEANS)))
+            scores = np.clip(np.rint(scores * 10), 10, 50).astype(np.int64)
+            invited = np.maximum(5, np.rint(class_size[course] * rng.lognormal(0.0, 0.3, m))).astype(np.int64)
+            responded = np.maximum(1, rng.binomial(invited, rng.uniform(0.2, 0.6, m)))
+
+            w.writelines(
+                f"{prefixes[c]}{s}:{names[p]}:{terms[t]}:{':'.join([items[x] for x in row])}:{inv}:{resp}\n"
+                for c, s, p, t, row, inv, resp in zip(course.tolist(), section.tolist(), professor.tolist(),
+                                                      term.tolist(), scores.tolist(), invited.tolist(),
+                                                      responded.tolist()))
+
+            num_rows += m
+            first = last
+            if report:
+                elapsed = time.perf_counter() - start
+                print(f"Written {num_rows} rows ({num_rows / max(total_rows, 1):.0%}), "
+                      f"{num_rows / max(elapsed, 1e-9):.0f} rows/s", end="\r")
+    os.replace(reviews_file + ".tmp", reviews_file)
+    if report:
+        print()
+
+    return num_rows
+
+
+def generate_dataset(config: DatasetConfig, save_dir: str, reviews_filename: str = "review.csv",
+                     course_filename: str = "course.csv", report: bool = False) -> tuple[str, str]:
+    """Write the review and course datasets of config to save_dir, and return their paths.
+    Files that already exist are not written again.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    reviews_file = os.path.join(save_dir, reviews_filename)
+    course_file = os.path.join(save_dir, course_filename)
+
+    if not os.path.isfile(course_file):
+        generate_courses(config, course_file)
+    if not os.path.isfile(reviews_file):
+        generate_reviews(config, reviews_file, report=report)
+
+    return reviews_file, course_file
+
+
+def _zipf_weights(n: int, skew: float, rng: Optional[np.random.Generator]) -> np.ndarray:
+    """Return the probabilities of n items whose popularity follows Zipf's law with exponent skew.
+    The most popular item is the first one if rng is None, or a random one otherwise.
+    """
+    weights = 1.0 / np.arange(1, n + 1, dtype=float) ** skew
+    if rng is not None:
+        rng.shuffle(weights)
+
+    return weights / weights.sum()
+
+
+def _letters(i: int) -> str:
+    """Return the three letter code of i, where 0 <= i < 26 ** 3."""
+    return "".join(chr(ord('A') + i // 26 ** p % 26) for p in (2, 1, 0))
+
+
+def _last_name(i: int) -> str:
+    """Return a last name that is different for every i >= 0."""
+    syllables = [_SYLLABLES[i % len(_SYLLABLES)]]
+    i //= len(_SYLLABLES)
+    while i > 0 or len(syllables) < 2:
+        syllables.append(_SYLLABLES[i % len(_SYLLABLES)])
+        i //= len(_SYLLABLES)
+
+    return "".join(syllables).capitalize()
+
+
+if __name__ == "__main__":
+    # import python_ta
+    # python_ta.check_all(config={
+    #     'max-line-length': 120,
+    #     'extra-imports': ['argparse', 'os', 'sys', 'time', 'numpy'],
+    #     'allowed-io': ['generate_courses', 'generate_reviews'],
+    # })
+
+    parser = argparse.ArgumentParser(description="Generate synthetic course and review datasets.")
+    parser.add_argument("--programmes", type=int, default=150)
+    parser.add_argument("--courses-per-level", nargs=4, type=int, default=[6, 8, 10, 10],
+                        help="the number of courses of every programme at level 1, 2, 3 and 4")
+    parser.add_argument("--professors", type=int, default=3000)
+    parser.add_argument("--reviews-per-course", type=float, default=8.0)
+    parser.add_argument("--breadth-mix", nargs=5, type=float, default=[0.1, 0.3, 0.35, 0.1, 0.15],
+                        help="the weights of no breadth requirement, and of breadth requirements 1, 3, 4 and 5")
+    parser.add_argument("--popularity-skew", type=float, default=1.0)
+    parser.add_argument("--professors-per-course", type=int, default=3)
+    parser.add_argument("--years", nargs=2, type=int, default=[2012, 2023])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-dir", default="dataset/synthetic")
+    args = parser.parse_args()
+
+    if not 1 <= args.programmes <= _MAX_PROGRAMMES:
+        sys.exit(f"--programmes must be between 1 and {_MAX_PROGRAMMES}")
+    elif not all(0 <= n <= _MAX_COURSES_PER_LEVEL for n in args.courses_per_level):
+        sys.exit(f"--courses-per-level must be between 0 and {_MAX_COURSES_PER_LEVEL}")
+
+    dataset_config = DatasetConfig(args.programmes, tuple(args.courses_per_level), args.professors,
+                                   args.reviews_per_course, dict(zip((0, 1, 3, 4, 5), args.breadth_mix)),
+                                   args.popularity_skew, args.professors_per_course, tuple(args.years), args.seed)
+    start_time = time.perf_counter()
+    paths = generate_dataset(dataset_config, args.save_dir, report=True)
+    print(f"{dataset_config.num_courses()} courses written to {paths[1]}, "
+          f"reviews written to {paths[0]} in {time.perf_counter() - start_time:.1f}s")
@@ -0,0 +1,5 @@
+"""Shared setup of the tests: the modules of the project are imported from the repository root."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
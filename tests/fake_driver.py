@@ -0,0 +1,158 @@
+"""A fake browser for the pages of review_page, showing the evaluation grid of given review rows
+without Chrome, and failing as often as asked.
+"""
+from __future__ import annotations
+from html import escape
+import random
+from review_page import Driver
+
+# The link of the evaluation page found by QuercusPage.get_link in a fake browser
+EVAL_URL = "https://evaluations.example/grid"
+# The page sizes of the grid, by option index
+PAGE_SIZES = [5, 10, 15, 20, 25, 50, 100]
+
+
+class FakeDriver(Driver):
+    """A fake browser showing the evaluation grid of rows, the rows of a review csv file.
+
+    Loading a page of the grid fails with TimeoutError with probability failure_rate, and breaks the
+    browser (every later call raises ConnectionError) with probability crash_rate.
+
+    Instance Attributes:
+        - rows: The review rows shown by the grid.
+        - failure_rate: The probability that loading a page fails.
+        - crash_rate: The probability that loading a page breaks the browser.
+        - page: The page of the grid shown.
+        - page_size: The number of rows of every page of the grid.
+        - alive: Whether the browser still responds.
+        - num_loads: The number of pages of the grid loaded.
+    """
+    rows: list[list[str]]
+    failure_rate: float
+    crash_rate: float
+    page: int
+    page_size: int
+    alive: bool
+    num_loads: int
+    # Private Instance Attributes:
+    #   - _rng: the random generator of the failures
+    _rng: random.Random
+
+    def __init__(self, rows: list[list[str]], failure_rate: float = 0.0, crash_rate: float = 0.0,
+                 seed: int = 0) -> None:
+        """Start a fake browser."""
+        self.rows = rows
+        self.failure_rate = failure_rate
+        self.crash_rate = crash_rate
+        self.page = 1
+        self.page_size = 10
+        self.alive = True
+        self.num_loads = 0
+        self._rng = random.Random(seed)
+
+    def open(self, url: str) -> None:
+        """Load the page at url."""
+        self._check()
+
+    def text(self, css_selector: str) -> str:
+        """Return the text of the number of records or the number of pages of the grid."""
+        self._check()
+        if css_selector == "#fbvGridNbItemsTotalLvl1":
+            return f"Total {len(self.rows)}"
+        return str(-(-len(self.rows) // self.page_size))
+
+    def attribute(self, css_selector: str, name: str) -> str:
+        """Return the html of the page of the grid shown, or the link of the evaluation page."""
+        self._check()
+        if css_selector != "#fbvGrid":
+            return EVAL_URL
+
+        trs = []
+        for dept, div, code, lec, *rest in self.rows[(self.page - 1) * self.page_size:self.page * self.page_size]:
+            tds = "".join(f"<td>{escape(cell)}</td>" for cell in [dept, div, f"{code}-{lec}"] + rest)
+            trs.append(f'<tr class="gData" sk="{escape(code)}">{tds}</tr>')
+        return f'<table id="fbvGrid"><tbody>{"".join(trs)}</tbody></table>'
+
+    def type_text(self, css_selector: str, text: str, submit: bool = False, clear: bool = False) -> None:
+        """Go to the page text of the grid, which may fail or break the browser."""
+        self._check()
+        if css_selector != "#gridPaging__getFbvGrid":
+            return
+
+        draw = self._rng.random()
+        if draw < self.crash_rate:
+            self.alive = False
+            raise ConnectionError("the browser crashed")
+        elif draw < self.crash_rate + self.failure_rate:
+            raise TimeoutError("the page took too long to load")
+        self.page = int(text)
+        self.num_loads += 1
+
+    def click(self, css_selector: str) -> None:
+        """Click the specified element."""
+        self._check()
+
+    def select_option(self, css_selector: str, index: int) -> None:
+        """Set the number of rows of every page of the grid."""
+        self._check()
+        self.page_size = PAGE_SIZES[index]
+
+    def switch_to_frame(self, css_selector: str, timeout: float) -> None:
+        """Control the specified frame."""
+        self._check()
+
+    def wait_until_absent(self, css_selector: str, timeout: float) -> None:
+        """Return at once: the fake grid is always loaded."""
+        self._check()
+
+    def is_alive(self) -> bool:
+        """Return whether the browser still responds."""
+        return self.alive
+
+    def quit(self) -> None:
+        """Close the browser."""
+        self.alive = False
+
+    def _check(self) -> None:
+        """Raise ConnectionError if the browser is broken."""
+        if not self.alive:
+            raise ConnectionError("the browser is not responding")
+
+
+class FakeBrowsers:
+    """A driver factory starting fake browsers of the same rows, each with its own seed, and
+    failing to start a browser with probability start_failure_rate.
+
+    Instance Attributes:
+        - rows: The review rows shown by the browsers.
+        - failure_rate: The probability that loading a page fails.
+        - crash_rate: The probability that loading a page breaks the browser.
+        - start_failure_rate: The probability that a browser fails to start.
+        - started: The browsers started, in order.
+    """
+    rows: list[list[str]]
+    failure_rate: float
+    crash_rate: float
+    start_failure_rate: float
+    started: list[FakeDriver]
+    # Private Instance Attributes:
+    #   - _rng: the random generator of the seeds and the start failures
+    _rng: random.Random
+
+    def __init__(self, rows: list[list[str]], failure_rate: float = 0.0, crash_rate: float = 0.0,
+                 start_failure_rate: float = 0.0, seed: int = 0) -> None:
+        """Initialize the factory."""
+        self.rows = rows
+        self.failure_rate = failure_rate
+        self.crash_rate = crash_rate
+        self.start_failure_rate = start_failure_rate
+        self.started = []
+        self._rng = random.Random(seed)
+
+    def __call__(self) -> FakeDriver:
+        """Start a fake browser, or raise RuntimeError if it fails to start."""
+        if self._rng.random() < self.start_failure_rate:
+            raise RuntimeError("the browser failed to start")
+        driver = FakeDriver(self.rows, self.failure_rate, self.crash_rate, self._rng.randrange(2 ** 32))
+        self.started.append(driver)
+        return driver
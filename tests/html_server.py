@@ -0,0 +1,98 @@
+"""A local HTTP stand-in for the sites the scrapers download from, serving saved html pages."""
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import hashlib
+import threading
+
+
+class SavedPagesServer:
+    """An HTTP server on a free local port, serving the saved pages by path and query, with an
+    ETag and a Last-Modified header, and answering conditional requests with 304 Not Modified.
+
+    Instance Attributes:
+        - pages: The body of every page, by path and query (such as "/catalogue?page=1").
+        - failures: The number of requests of every page still to be answered with 503.
+        - requests: The path and query of every request, with its status, in order.
+    """
+    pages: dict[str, bytes]
+    failures: dict[str, int]
+    requests: list[tuple[str, int]]
+    # Private Instance Attributes:
+    #   - _server: the HTTP server
+    #   - _thread: the thread serving the requests
+    #   - _lock: the lock of failures and requests
+    _server: ThreadingHTTPServer
+    _thread: threading.Thread
+    _lock: threading.Lock
+
+    def __init__(self, pages: dict[str, bytes]) -> None:
+        """Start serving the given pages."""
+        self.pages = pages
+        self.failures = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+        self._thread.start()
+
+    def url(self, path: str) -> str:
+        """Return the url of the given path (and query) on this server."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}{path}"
+
+    def statuses(self, path: str) -> list[int]:
+        """Return the statuses of the requests of path, in order."""
+        with self._lock:
+            return [status for requested, status in self.requests if requested == path]
+
+    def respond(self, path: str, if_none_match: str | None) -> tuple[int, bytes, str]:
+        """Return the status, body and ETag of the answer to a request of path."""
+        with self._lock:
+            if self.failures.get(path, 0) > 0:
+                self.failures[path] -= 1
+                status, body, etag = 503, b"unavailable", ""
+            elif path not in self.pages:
+                status, body, etag = 404, b"not found", ""
+            else:
+                body = self.pages[path]
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                status = 304 if if_none_match == etag else 200
+            self.requests.append((path, status))
+        return status, body, etag
+
+    def close(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _handler(server: SavedPagesServer) -> type[BaseHTTPRequestHandler]:
+    """Return the request handler class of server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        """Answers GET requests from the saved pages of server."""
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            """Answer a GET request."""
+            url = urlsplit(self.path)
+            path = url.path + (f"?{url.query}" if url.query else "")
+            status, body, etag = server.respond(path, self.headers.get("If-None-Match"))
+            self.send_response(status)
+            if etag != "":
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", "Mon, 02 Sep 2024 00:00:00 GMT")
+            if status == 503:
+                self.send_header("Retry-After", "0")
+            if status == 304:
+                body = b""
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            """Do not log requests."""
+
+    return Handler
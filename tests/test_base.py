@@ -0,0 +1,65 @@
+"""Tests of the aggregation and the scoring of the reviews of a (course, professor) pair by base.load_graph."""
+import pytest
+import base
+
+# Three reviews of CSC108H1 by Ballyk Barbara: (term, year, every item, STNUM, STRSP), in file order.
+# Their scores are 0.45, 0.9 and 0.225, by 30, 20 and 10 students, with response rates 0.5, 1 and 1.
+REVIEWS = [("Fall", "2022", "2.0", "60", "30"), ("Fall", "2020", "4.0", "20", "20"),
+           ("Winter", "2021", "1.0", "10", "10")]
+EXPECTED = {
+    "last": 0.225,
+    "mean": (0.45 + 0.9 + 0.225) / 3,
+    "response": (0.45 * 30 + 0.9 * 20 + 0.225 * 10) / 60,
+    "recency": (0.45 + 0.9 * 0.25 + 0.225 * 0.5 ** (5 / 3)) / (1 + 0.25 + 0.5 ** (5 / 3))
+}
+
+
+@pytest.fixture
+def datasets(tmp_path: str) -> tuple[str, str]:
+    """A review dataset of REVIEWS and another pair, and a course dataset of their courses."""
+    reviews_file, course_file = str(tmp_path / "reviews.csv"), str(tmp_path / "course.csv")
+    with open(reviews_file, "w") as w:
+        for term, year, item, stnum, strsp in REVIEWS:
+            w.write(str.join(":", ["CSC", "ARTSC", "CSC108H1", "LEC0101", "Ballyk", "Barbara", term, year]
+                             + [item] * 9 + [stnum, strsp]) + "\n")
+        w.write("MAT:ARTSC:MAT137Y1:LEC0101:Smith:Jo:Fall:2022:" + ":".join(["3.0"] * 9) + ":40:20\n")
+    with open(course_file, "w") as w:
+        w.write("CSC108H1|Introduction to Computer Programming|||The Physical and Mathematical Universes (5)\n")
+        w.write("MAT137Y1|Calculus with Proofs|||The Physical and Mathematical Universes (5)\n")
+    return reviews_file, course_file
+
+
+@pytest.mark.parametrize("aggregate", base.AGGREGATES)
+@pytest.mark.parametrize("chunk_bytes", [1 << 20, 1])
+def test_aggregates(datasets: tuple[str, str], aggregate: str, chunk_bytes: int) -> None:
+    """The weight of a reviewed pair is aggregated as requested, whether its rows are read in one
+    chunk or in several chunks, and a pair with one review keeps its score.
+    """
+    graph = base.load_graph(*datasets, aggregate=aggregate, chunk_bytes=chunk_bytes)
+
+    weight = EXPECTED[aggregate]
+    assert graph.get_weighted_neighbours("CSC108H1", "professor") == {"Ballyk Barbara": pytest.approx(weight)}
+    assert graph.get_weighted_neighbours("MAT137Y1", "professor") == {"Smith Jo": pytest.approx(27 / 40)}
+
+
+def test_last_is_default(datasets: tuple[str, str]) -> None:
+    """By default, the weight of a pair is the score of its last review, as the graph was always built."""
+    graph = base.load_graph(*datasets)
+    weight = EXPECTED["last"]
+    assert graph.get_weighted_neighbours("CSC108H1", "professor") == {"Ballyk Barbara": pytest.approx(weight)}
+
+
+@pytest.mark.parametrize("strategy, aggregate, weight", [
+    ("default", "last", 0.225), ("no_workload", "last", 0.2),
+    ("default", "response", EXPECTED["response"]), ("response_rate", "response", (0.45 * 0.5 + 0.9 + 0.225) / 2.5)
+])
+def test_strategies(datasets: tuple[str, str], tmp_path: str, strategy: str, aggregate: str, weight: float) -> None:
+    """Every strategy changes the weights of the edges, and is part of the key of the snapshot: the
+    workload item is left out of the scores of "no_workload", and the reviews are weighted by their
+    response rate in the "response" aggregate of "response_rate".
+    """
+    snapshot_path = str(tmp_path / "graph.snapshot")
+    base.load_graph(*datasets, snapshot_path, aggregate)
+    graph = base.load_graph(*datasets, snapshot_path, aggregate, strategy=strategy)
+
+    assert graph.get_weighted_neighbours("CSC108H1", "professor") == {"Ballyk Barbara": pytest.approx(weight)}
@@ -0,0 +1,28 @@
+"""Tests of the measurements and the baseline comparison of benchmark.py."""
+import numpy as np
+import benchmark
+
+MB = 1024 * 1024
+
+
+def test_peak_memory_of_every_operation() -> None:
+    """The peak memory of an operation is measured on its own, whatever ran before it."""
+    kept = []
+    first = benchmark._measure(lambda _: kept.append(np.ones(32 * MB, dtype=np.uint8)), 0.0, 1)
+    second = benchmark._measure(lambda _: np.ones(8 * MB, dtype=np.uint8).sum(), 0.0, 1)
+
+    assert 32 * MB <= first["peak_memory_bytes"] < 34 * MB
+    assert 8 * MB <= second["peak_memory_bytes"] < 10 * MB
+
+
+def test_compare() -> None:
+    """Slower operations and higher peak memories are regressions, and baselines without peak
+    memories are only compared on speed.
+    """
+    def results(ops_per_sec: float, peak_memory_bytes: int) -> dict:
+        return {"results": {"full/load_graph": {"ops_per_sec": ops_per_sec, "peak_memory_bytes": peak_memory_bytes}}}
+
+    assert benchmark.compare(results(100, 10 * MB), results(110, 10 * MB)) == []
+    assert len(benchmark.compare(results(70, 10 * MB), results(100, 10 * MB))) == 1
+    assert len(benchmark.compare(results(100, 20 * MB), results(100, 10 * MB))) == 1
+    assert benchmark.compare(results(100, 20 * MB), {"results": {"full/load_graph": {"ops_per_sec": 100}}}) == []
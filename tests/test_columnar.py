@@ -0,0 +1,103 @@
+"""Tests of the columnar format of the datasets: conversion, row groups, values and load_graph."""
+import math
+import os
+import numpy as np
+import pytest
+import base
+from columnar import DELIMITERS, SCHEMAS, ColumnarFile, ColumnarWriter, convert_dataset, is_columnar
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), "..", "dataset")
+REVIEWS_FILE = os.path.join(DATASET_DIR, "review_large.csv")
+COURSE_FILE = os.path.join(DATASET_DIR, "course.csv")
+
+
+def _text_rows(path: str, kind: str) -> list[list[str]]:
+    """Return the rows of the dataset of the given kind at path, in the text format."""
+    with open(path) as f:
+        return [line.rstrip("\n").split(DELIMITERS[kind]) for line in f
+                if line.strip() != "" and not line.startswith("#")]
+
+
+def _same_values(row: list[str], other: list[str], kind: str) -> bool:
+    """Return whether two rows of the given kind have the same values. Numbers are compared as
+    numbers, as a float column gives "4" back as "4.0".
+    """
+    for column_type, value, other_value in zip(SCHEMAS[kind].values(), row, other):
+        if column_type == "float" and "N/A" not in (value, other_value):
+            if float(value) != float(other_value):
+                return False
+        elif value != other_value:
+            return False
+    return len(row) == len(other)
+
+
+@pytest.mark.parametrize("text_path, kind", [(REVIEWS_FILE, "reviews"), (COURSE_FILE, "courses")])
+def test_round_trip(tmp_path: str, text_path: str, kind: str) -> None:
+    """A converted dataset gives back every row, in order, across several row groups."""
+    path = str(tmp_path / "dataset.columns")
+    text_rows = _text_rows(text_path, kind)
+    assert convert_dataset(text_path, path, kind, row_group_rows=500) == len(text_rows)
+
+    assert is_columnar(path) and not is_columnar(text_path)
+    file = ColumnarFile(path)
+    assert file.kind == kind and len(file) == len(text_rows)
+    assert len(file.row_group_sizes) == math.ceil(len(text_rows) / 500)
+    assert sum(file.row_group_sizes) == len(text_rows) and set(file.row_group_sizes[:-1]) == {500}
+    rows = list(file.rows())
+    assert len(rows) == len(text_rows)
+    assert all(_same_values(row, text_row, kind) for row, text_row in zip(rows, text_rows))
+
+
+def test_values_holding_delimiters(tmp_path: str) -> None:
+    """Values holding the delimiters of the text formats are kept as they are, whereas the text
+    format cannot be converted.
+    """
+    path = str(tmp_path / "courses.columns")
+    rows = [["CSC108H1", "Intro: Programming | Python", "", "", "society and its institutions (3)"],
+            ["CSC148H1", "Théorie", "CSC108H1|CSC110Y1", "a:b", "society and its institutions (3)"],
+            ["MAT137Y1", "", "", "", "the physical and mathematical universes (5)"]]
+    with ColumnarWriter(path, "courses", row_group_rows=2) as writer:
+        writer.write_rows(rows)
+
+    assert list(ColumnarFile(path).rows()) == rows
+    assert list(ColumnarFile(path).rows(["prereq", "code"])) == [[row[2], row[0]] for row in rows]
+
+    text_path = str(tmp_path / "course.csv")
+    with open(text_path, "w") as w:
+        w.write(str.join("\n", (str.join("|", row) for row in rows)) + "\n")
+    with pytest.raises(ValueError):
+        convert_dataset(text_path, path, "courses")
+    assert list(ColumnarFile(path).rows()) == rows
+
+
+def test_missing_numbers(tmp_path: str) -> None:
+    """"N/A" is kept in float and int columns, as NaN and -1."""
+    path = str(tmp_path / "reviews.columns")
+    row = ["CSC", "ARTSC", "CSC108H1", "LEC0101", "Ballyk", "Barbara", "Fall", "2022"]
+    rows = [row + ["N/A", "4.5"] + ["4.25"] * 7 + ["N/A", "12"],
+            row + ["3.0", "N/A"] + ["5.0"] * 7 + ["40", "N/A"]]
+    with ColumnarWriter(path, "reviews", row_group_rows=1) as writer:
+        writer.write_rows(rows)
+
+    file = ColumnarFile(path)
+    assert list(file.rows()) == rows
+    assert math.isnan(file.column("item1", 0)[0]) and file.column("item2", 0).tolist() == [4.5]
+    assert file.column("stnum", 0).tolist() == [-1] and file.column("strsp", 1).tolist() == [-1]
+    assert file.column("stnum", 0).dtype == np.int64 and file.column("item3", 1).dtype == np.float64
+
+
+@pytest.mark.parametrize("row_group_rows", [300, 1 << 16])
+def test_load_graph(tmp_path: str, row_group_rows: int) -> None:
+    """load_graph builds the same graph from the columnar datasets as from the text datasets."""
+    reviews_path, course_path = str(tmp_path / "reviews.columns"), str(tmp_path / "course.columns")
+    convert_dataset(REVIEWS_FILE, reviews_path, "reviews", row_group_rows)
+    convert_dataset(COURSE_FILE, course_path, "courses", row_group_rows)
+
+    for aggregate in ("last", "mean"):
+        text_graph = base.load_graph(REVIEWS_FILE, COURSE_FILE, aggregate=aggregate)
+        columnar_graph = base.load_graph(reviews_path, course_path, aggregate=aggregate)
+        vertices = text_graph.get_all_vertices()
+        assert columnar_graph.get_all_vertices() == vertices
+        assert all(columnar_graph.get_all_vertices(kind) == text_graph.get_all_vertices(kind)
+                   for kind in ("course", "professor", "programme", "breadth_req", "course_level"))
+        assert all(columnar_graph.get_weighted_neighbours(v) == text_graph.get_weighted_neighbours(v) for v in vertices)
@@ -0,0 +1,69 @@
+"""Tests of page_fetcher.PageFetcher against a local server of saved pages."""
+from typing import Iterator
+import pytest
+import requests
+from html_server import SavedPagesServer
+from page_fetcher import PageFetcher
+
+PAGES = {f"/catalogue?page={n}": f"<html><body>page {n}</body></html>".encode() for n in range(1, 6)}
+
+
+@pytest.fixture
+def server() -> Iterator[SavedPagesServer]:
+    """A server of PAGES."""
+    server = SavedPagesServer(dict(PAGES))
+    yield server
+    server.close()
+
+
+def test_retries_failed_requests(server: SavedPagesServer) -> None:
+    """A page answered with 503 is requested again, up to the number of retries."""
+    server.failures["/catalogue?page=1"] = 2
+    with PageFetcher(retries=3, backoff=0) as fetcher:
+        page = fetcher.fetch(server.url("/catalogue?page=1"))
+
+    assert page.content == PAGES["/catalogue?page=1"] and page.changed
+    assert server.statuses("/catalogue?page=1") == [503, 503, 200]
+
+
+def test_gives_up_after_retries(server: SavedPagesServer) -> None:
+    """A page still failing after every retry raises an error."""
+    server.failures["/catalogue?page=1"] = 5
+    with PageFetcher(retries=1, backoff=0) as fetcher, pytest.raises(requests.RequestException):
+        fetcher.fetch(server.url("/catalogue?page=1"))
+    assert server.statuses("/catalogue?page=1") == [503, 503]
+
+
+def test_cached_pages_are_conditional(server: SavedPagesServer, tmp_path: str) -> None:
+    """A cached page is requested with its ETag, and reused if the server reports it unchanged."""
+    url = server.url("/catalogue?page=2")
+    with PageFetcher(str(tmp_path)) as fetcher:
+        first = fetcher.fetch(url)
+        second = fetcher.fetch(url)
+        server.pages["/catalogue?page=2"] = b"<html><body>new page 2</body></html>"
+        third = fetcher.fetch(url)
+
+    assert first.changed and first.content == PAGES["/catalogue?page=2"]
+    assert not second.changed and second.content == first.content
+    assert third.changed and third.content == b"<html><body>new page 2</body></html>"
+    assert server.statuses("/catalogue?page=2") == [200, 304, 200]
+
+
+def test_pages_in_order_up_to_the_last(server: SavedPagesServer) -> None:
+    """Paginated pages are yielded in order, up to the first page marked as last."""
+    with PageFetcher(max_concurrency=2) as fetcher:
+        pages = list(fetcher.fetch_pages(server.url("/catalogue?page={page}"),
+                                         lambda page: b"page 3" in page.content))
+
+    assert [page.content for page in pages] == [PAGES[f"/catalogue?page={n}"] for n in range(1, 4)]
+
+
+def test_pages_up_to_max_pages(server: SavedPagesServer) -> None:
+    """No page after max_pages is requested, and a missing page raises an error."""
+    with PageFetcher(max_concurrency=4) as fetcher:
+        pages = list(fetcher.fetch_pages(server.url("/catalogue?page={page}"), lambda page: False, max_pages=2))
+        assert len(pages) == 2 and server.statuses("/catalogue?page=3") == []
+        with pytest.raises(requests.HTTPError):
+            list(fetcher.fetch_pages(server.url("/catalogue?page={page}"), lambda page: False, first_page=4))
+
+    assert server.statuses("/catalogue?page=6") == [404]
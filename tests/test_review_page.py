@@ -0,0 +1,113 @@
+"""Tests of review_page.SessionPool with fake browsers, and of the browsers used by scrape_review."""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import pytest
+import scrape_review
+from fake_driver import EVAL_URL, FakeBrowsers
+from review_page import QuercusPage, SessionPool
+
+
+def _review_rows() -> list[list[str]]:
+    """Return the first rows of the bundled review_large dataset."""
+    with open(os.path.join(os.path.dirname(__file__), "..", "dataset", "review_large.csv")) as f:
+        return [line.rstrip("\n").split(":") for line in f if not line.startswith("#")][:200]
+
+
+ROWS = _review_rows()
+NUM_PAGES = len(ROWS) // 20
+
+
+def _download(pool: SessionPool, num_downloads: int) -> tuple[int, int]:
+    """Download num_downloads pages with pool from 8 threads, check that every page downloaded
+    shows its own rows, and return the number of pages downloaded and of downloads that failed.
+    """
+    def download(i: int) -> bool:
+        num_page = i % NUM_PAGES + 1
+        try:
+            html = pool.get_data(num_page)
+        except (TimeoutError, ConnectionError):
+            return False
+        reviews = scrape_review.get_review_info_from_page(html)
+        assert [review["code"] for review in reviews] == [row[2] for row in ROWS[(num_page - 1) * 20:num_page * 20]]
+        return True
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(download, range(num_downloads)))
+    return results.count(True), results.count(False)
+
+
+def test_reuses_browsers() -> None:
+    """The browsers of the pool are started once, and every one is used for many pages."""
+    browsers = FakeBrowsers(ROWS)
+    with SessionPool(EVAL_URL, 3, 20, browsers) as pool:
+        assert _download(pool, 100) == (100, 0)
+        assert pool.size == 3 and pool.replacements == 0
+
+    assert len(browsers.started) == 3
+    assert sum(driver.num_loads for driver in browsers.started) == 100
+    assert not any(driver.alive for driver in browsers.started)
+
+
+def test_replaces_broken_browsers() -> None:
+    """A browser that breaks during a download is replaced by a new one, and a page that fails
+    without breaking its browser keeps the browser.
+    """
+    browsers = FakeBrowsers(ROWS, failure_rate=0.1, crash_rate=0.1, start_failure_rate=0.2, seed=3)
+    pool = SessionPool(EVAL_URL, 3, 20, browsers, open_attempts=10)
+    num_saved, num_failed = _download(pool, 300)
+
+    assert num_saved + num_failed == 300 and num_saved > 200
+    assert pool.size == 3 and pool.replacements > 0
+    assert len(browsers.started) == 3 + pool.replacements
+    assert sum(1 for driver in browsers.started if driver.alive) == 3
+    pool.close()
+
+
+def test_check_replaces_idle_broken_browsers() -> None:
+    """check replaces the browsers that broke while they were not in use."""
+    browsers = FakeBrowsers(ROWS)
+    with SessionPool(EVAL_URL, 2, 20, browsers) as pool:
+        browsers.started[0].alive = False
+        assert pool.check() == 1
+        assert pool.size == 2 and pool.replacements == 1 and len(browsers.started) == 3
+        assert _download(pool, 10) == (10, 0)
+
+
+def test_gives_up_browsers_that_cannot_be_replaced() -> None:
+    """A browser that cannot be replaced is dropped, and a pool without browsers raises RuntimeError."""
+    browsers = FakeBrowsers(ROWS, crash_rate=1.0)
+    pool = SessionPool(EVAL_URL, 2, 20, browsers, open_attempts=2)
+    browsers.start_failure_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.get_data(1)
+
+    assert pool.size == 0
+    with pytest.raises(RuntimeError):
+        pool.get_data(1)
+
+
+def test_adopts_started_browsers() -> None:
+    """The browser that found the link of the evaluation page is the first browser of the pool."""
+    browsers = FakeBrowsers(ROWS)
+    login_driver = browsers()
+    url = QuercusPage(login_driver).get_link("utorid", "password")
+    with SessionPool(url, 2, 20, browsers, drivers=[login_driver]) as pool:
+        assert len(browsers.started) == 2 and pool.size == 2
+        assert _download(pool, 20) == (20, 0)
+        assert login_driver.alive
+
+    assert not login_driver.alive
+
+
+def test_scrape_starts_one_browser_per_worker(tmp_path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """scrape_review logs in with the first browser of its pool, and starts no other browser."""
+    monkeypatch.setattr("builtins.input", lambda prompt: "utorid")
+    monkeypatch.setattr(scrape_review, "getpass", lambda prompt: "password")
+    browsers = FakeBrowsers(ROWS)
+    scrape_review.scrape_review(str(tmp_path), "review.csv", max_records=20, process_num=3, driver_factory=browsers)
+
+    assert len(browsers.started) == 3
+    assert not any(driver.alive for driver in browsers.started)
+    with open(os.path.join(tmp_path, "review.csv")) as f:
+        assert [line.rstrip("\n").split(":") for line in f] == ROWS
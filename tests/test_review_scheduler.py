@@ -0,0 +1,83 @@
+"""Tests of review_scheduler.schedule_pages, and of scrape_review scheduling fake evaluation pages."""
+from functools import partial
+import os
+from fake_driver import FakeBrowsers
+from review_scheduler import PageWorker, schedule_pages
+from scrape_review import scrape_review
+
+PAGES = list(range(1, 31))
+
+
+def _review_rows() -> list[list[str]]:
+    """Return the first rows of the bundled review_large dataset."""
+    with open(os.path.join(os.path.dirname(__file__), "..", "dataset", "review_large.csv")) as f:
+        return [line.rstrip("\n").split(":") for line in f if not line.startswith("#")][:437]
+
+
+ROWS = _review_rows()
+
+
+def _first_call(marker_dir: str, name: str) -> bool:
+    """Return whether this is the first call with name, in any worker process."""
+    try:
+        with open(os.path.join(marker_dir, name), "x"):
+            return True
+    except FileExistsError:
+        return False
+
+
+class FlakyWorker(PageWorker):
+    """A worker saving every page as one record. It fails page 7 on its first two tries, always
+    fails page 13, and exits its process on the first try of page 21.
+    """
+    marker_dir: str
+
+    def __init__(self, marker_dir: str) -> None:
+        self.marker_dir = marker_dir
+
+    def save_page(self, num_page: int) -> int:
+        with open(os.path.join(self.marker_dir, "attempts"), "a") as f:
+            f.write(f"{num_page}\n")
+        if num_page == 7 and (_first_call(self.marker_dir, "7-1") or _first_call(self.marker_dir, "7-2")):
+            raise TimeoutError("page 7 is slow")
+        if num_page == 13:
+            raise ValueError("page 13 is broken")
+        if num_page == 21 and _first_call(self.marker_dir, "21"):
+            os._exit(3)
+        return 1
+
+
+def _start_flaky_worker(marker_dir: str, index: int) -> FlakyWorker:
+    """Return a FlakyWorker keeping its markers in marker_dir."""
+    return FlakyWorker(marker_dir)
+
+
+def test_retries_and_respawns(tmp_path: str) -> None:
+    """Failed pages are tried again up to max_retries times, and the page of a worker that exits is
+    given to another worker, while a new worker takes the place of the one that exited.
+    """
+    saved = []
+    failed = schedule_pages(PAGES, partial(_start_flaky_worker, str(tmp_path)), 3, max_retries=2,
+                            on_progress=lambda page, _: saved.append(page))
+
+    assert sorted(saved) == [page for page in PAGES if page != 13]
+    assert list(failed) == [13] and "page 13 is broken" in failed[13]
+    with open(os.path.join(tmp_path, "attempts")) as f:
+        attempts = [int(line) for line in f]
+    assert attempts.count(7) == 3 and attempts.count(13) == 3 and attempts.count(21) == 2
+
+
+def test_scrape_flaky_evaluation_pages(tmp_path: str) -> None:
+    """Reviews downloaded from fake evaluation pages that often fail or crash are saved exactly once,
+    in order, and all of them are downloaded when lim is -1.
+    """
+    browsers = FakeBrowsers(ROWS, failure_rate=0.2, crash_rate=0.1, seed=1)
+    for _ in range(5):
+        scrape_review(str(tmp_path), "review.csv", lim=-1, max_records=20, process_num=4, url="x",
+                      driver_factory=browsers)
+        if os.path.isfile(os.path.join(tmp_path, "review.csv")):
+            break
+
+    with open(os.path.join(tmp_path, "review.csv")) as f:
+        assert [line.rstrip("\n").split(":") for line in f] == ROWS
+    assert os.listdir(tmp_path) == ["review.csv"]
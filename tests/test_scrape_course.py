@@ -0,0 +1,108 @@
+"""Tests of scrape_course.scrape_course against a local server of catalogue pages."""
+from html import escape
+from typing import Iterator
+import os
+import pytest
+from columnar import ColumnarFile
+from html_server import SavedPagesServer
+from scrape_course import scrape_course
+
+COURSES_PER_PAGE = 4
+FIELD_CLASSES = ["views-field-field-prerequisite", "views-field-field-corequisite",
+                 "views-field-field-breadth-requirements"]
+
+
+def _catalogue_rows() -> list[list[str]]:
+    """Return the first rows of the bundled course dataset."""
+    with open(os.path.join(os.path.dirname(__file__), "..", "dataset", "course.csv")) as f:
+        return [line.rstrip("\n").split("|") for line, _ in zip(f, range(3 * COURSES_PER_PAGE))]
+
+
+def _render_page(rows: list[list[str]]) -> bytes:
+    """Return a catalogue page showing the courses of the given rows."""
+    blocks = []
+    for code, name, *fields in rows:
+        cells = "".join(f'<div class="{cls}"><span class="field-content">{escape(value)}</span></div>'
+                        for cls, value in zip(FIELD_CLASSES, fields))
+        blocks.append(f'<div class="no-break w3-row views-row">'
+                      f'<div class="views-field-title">{escape(code)} - {escape(name)}</div>{cells}</div>')
+    return f"<html><body>{''.join(blocks)}</body></html>".encode()
+
+
+ROWS = _catalogue_rows()
+
+
+@pytest.fixture
+def server() -> Iterator[SavedPagesServer]:
+    """A server of a catalogue of three pages of courses, followed by a page without courses."""
+    pages = {f"/catalogue?page={n + 1}": _render_page(ROWS[n * COURSES_PER_PAGE:(n + 1) * COURSES_PER_PAGE])
+             for n in range(3)}
+    pages["/catalogue?page=4"] = b"<html><body>No courses</body></html>"
+    server = SavedPagesServer(pages)
+    yield server
+    server.close()
+
+
+def _read_rows(path: str) -> list[list[str]]:
+    """Return the rows of a saved course csv file."""
+    with open(path) as f:
+        return [line.rstrip("\n").split("|") for line in f]
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_saves_every_page(server: SavedPagesServer, tmp_path: str, streaming: bool) -> None:
+    """The courses of every page are saved in order, up to the first page without courses."""
+    scrape_course(str(tmp_path), "course.csv", url=server.url("/catalogue?page={page}"), max_pages=-1,
+                  max_concurrency=2, streaming=streaming)
+
+    assert _read_rows(os.path.join(tmp_path, "course.csv")) == ROWS
+    assert os.listdir(tmp_path) == ["course.csv"]
+
+
+def test_stops_at_lim(server: SavedPagesServer, tmp_path: str) -> None:
+    """Only the first lim courses are saved."""
+    scrape_course(str(tmp_path), "course.csv", lim=COURSES_PER_PAGE + 1, url=server.url("/catalogue?page={page}"),
+                  max_pages=-1, max_concurrency=1)
+
+    assert _read_rows(os.path.join(tmp_path, "course.csv")) == ROWS[:COURSES_PER_PAGE + 1]
+
+
+def test_unchanged_catalogue_keeps_file(server: SavedPagesServer, tmp_path: str) -> None:
+    """A full scrape of unchanged cached pages keeps the saved file, and a changed page rewrites it."""
+    save_dir, cache_dir = tmp_path / "data", str(tmp_path / "cache")
+    os.makedirs(save_dir)
+    save_path = os.path.join(save_dir, "course.csv")
+
+    def scrape() -> None:
+        scrape_course(str(save_dir), "course.csv", url=server.url("/catalogue?page={page}"), max_pages=-1,
+                      cache_dir=cache_dir)
+
+    scrape()
+    os.utime(save_path, ns=(0, 0))
+    scrape()
+    assert os.stat(save_path).st_mtime_ns == 0 and set(server.statuses("/catalogue?page=1")) == {200, 304}
+    assert os.listdir(save_dir) == ["course.csv"]
+
+    server.pages["/catalogue?page=2"] = _render_page(ROWS[COURSES_PER_PAGE:2 * COURSES_PER_PAGE - 1])
+    scrape()
+    assert _read_rows(save_path) == ROWS[:2 * COURSES_PER_PAGE - 1] + ROWS[2 * COURSES_PER_PAGE:]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_full_scrape_after_limited_scrape(server: SavedPagesServer, tmp_path: str, columnar: bool) -> None:
+    """A full scrape of unchanged pages rewrites the file saved by a limited scrape."""
+    save_dir, cache_dir = tmp_path / "data", str(tmp_path / "cache")
+    os.makedirs(save_dir)
+    save_path = os.path.join(save_dir, "course.csv")
+
+    def scrape(lim: int) -> list[list[str]]:
+        scrape_course(str(save_dir), "course.csv", lim=lim, url=server.url("/catalogue?page={page}"), max_pages=-1,
+                      cache_dir=cache_dir, columnar=columnar)
+        if columnar:
+            return [list(row) for row in ColumnarFile(save_path).rows()]
+        return _read_rows(save_path)
+
+    assert scrape(2) == ROWS[:2]
+    assert scrape(-1) == ROWS
+    os.utime(save_path, ns=(0, 0))
+    assert scrape(-1) == ROWS and os.stat(save_path).st_mtime_ns == 0
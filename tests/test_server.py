@@ -0,0 +1,82 @@
+"""Tests of the lookups and requests of server.RecommendationServer."""
+import asyncio
+import pytest
+from server import RecommendationServer, RequestError
+from synthetic_dataset import DatasetConfig, generate_dataset
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory: pytest.TempPathFactory) -> RecommendationServer:
+    """A server on a small synthetic dataset, which has breadth_req vertices (integer items)."""
+    save_dir = tmp_path_factory.mktemp("dataset")
+    config = DatasetConfig(num_programmes=4, courses_per_level=(2, 2, 2, 2), num_professors=20,
+                           reviews_per_course=3.0, breadth_mix={1: 0.5, 3: 0.5})
+    reviews_file, course_file = generate_dataset(config, str(save_dir))
+    return RecommendationServer(reviews_file, course_file, str(save_dir / "graph.snapshot"), port=0,
+                                process_num=1)
+
+
+def test_starts_with_breadth_req_vertices(server: RecommendationServer) -> None:
+    """The server starts on a graph with integer items, and looks them up by their string."""
+    breadth_reqs = server._graph.get_all_vertices("breadth_req")
+    assert len(breadth_reqs) > 0 and all(isinstance(item, int) for item in breadth_reqs)
+
+    item = min(breadth_reqs)
+    result = server._lookup({"q": str(item), "kind": "breadth_req"})
+    assert result["exists"] and result["completions"][0] == item
+
+
+def test_lookup_professor_any_case(server: RecommendationServer) -> None:
+    """Mixed-case professor names are found whatever the case of the query."""
+    professor = sorted(server._graph.get_all_vertices("professor"))[0]
+    assert professor != professor.upper()
+
+    for query in (professor, professor.lower(), professor.upper()):
+        result = server._lookup({"q": query, "kind": "professor"})
+        assert result["exists"]
+        assert result["similar"][0] == professor
+    assert server._lookup({"q": professor[:3].lower(), "kind": "professor"})["completions"][0] == professor
+
+
+def test_unknown_course(server: RecommendationServer) -> None:
+    """Unknown courses are answered with 404."""
+    with pytest.raises(RequestError) as error:
+        asyncio.run(server._recommend({"course": "XYZ999H1"}))
+    assert error.value.status == 404
+
+
+def test_similarity_of_professors(server: RecommendationServer) -> None:
+    """The similarity of two professors is computed by a worker, given their names in any case."""
+    professor1, professor2 = sorted(server._graph.get_all_vertices("professor"))[:2]
+    expected = server._graph.similarity_score(professor1, professor2)
+
+    async def request() -> dict:
+        await server.start()
+        try:
+            return await server._similarity({"item1": professor1.lower(), "item2": professor2})
+        finally:
+            await server.close()
+
+    assert asyncio.run(request()) == {"score": expected}
+
+
+def test_lookup_items_differing_in_case(tmp_path: str) -> None:
+    """Professors whose names only differ in case are both kept, and are matched exactly."""
+    config = DatasetConfig(num_programmes=4, courses_per_level=(2, 2, 2, 2), num_professors=20,
+                           reviews_per_course=3.0)
+    reviews_file, course_file = generate_dataset(config, str(tmp_path))
+    with open(reviews_file) as f:
+        row = f.readline().rstrip("\n").split(":")
+    professor = f"{row[4]} {row[5]}"
+    with open(reviews_file, "a") as f:
+        f.write(str.join(":", row[:4] + [row[4].upper(), row[5].upper()] + row[6:]) + "\n")
+    server = RecommendationServer(reviews_file, course_file, str(tmp_path / "graph.snapshot"), port=0,
+                                  process_num=1)
+    assert {professor, professor.upper()} <= set(server._lookup_items["professor"].values())
+
+    for query in (professor, professor.upper()):
+        result = server._lookup({"q": query, "kind": "professor"})
+        assert result["exists"] and query in result["similar"]
+    assert not server._lookup({"q": professor.lower(), "kind": "professor"})["exists"]
+    other = sorted(server._graph.get_all_vertices("professor") - {professor, professor.upper()})[0]
+    assert server._lookup({"q": other.lower(), "kind": "professor"})["exists"]
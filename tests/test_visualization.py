@@ -0,0 +1,34 @@
+"""Tests of the layout cache of visualization.setup_graph."""
+import numpy as np
+import pytest
+import base
+from synthetic_dataset import DatasetConfig, generate_dataset
+from visualization import FORCE_LAYOUT, load_layout, save_layout, setup_graph
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory: pytest.TempPathFactory) -> base.Graph:
+    """The graph of a small synthetic dataset."""
+    save_dir = tmp_path_factory.mktemp("dataset")
+    config = DatasetConfig(num_programmes=4, courses_per_level=(2, 2, 2, 2), num_professors=20,
+                           reviews_per_course=3.0)
+    reviews_file, course_file = generate_dataset(config, str(save_dir))
+    return base.load_graph(reviews_file, course_file)
+
+
+@pytest.mark.parametrize("layout", [FORCE_LAYOUT, "spring_layout"])
+def test_keeps_saved_positions(graph: base.Graph, layout: str, tmp_path: str) -> None:
+    """The saved positions are shown and kept as they are, and only the new vertices are added."""
+    keys = [str(label) for label in graph.to_arrays()[0]]
+    layout_path = f"{tmp_path}/layout.npz"
+    saved = {key: [1000.0 + i, -1000.0 - i] for i, key in enumerate(keys[::2])}
+    save_layout(layout_path, list(saved), np.array(list(saved.values())))
+
+    fig = setup_graph(graph, layout, layout_path=layout_path, show=False)
+    shown = dict(zip(keys, zip(fig.data[1].x, fig.data[1].y)))
+    assert all(list(shown[key]) == position for key, position in saved.items())
+
+    cached = load_layout(layout_path)
+    assert set(cached) == set(keys)
+    assert all(cached[key] == position for key, position in saved.items())
+    assert all(cached[key] == list(shown[key]) for key in keys[1::2])
@@ -1,7 +1,16 @@
 """This is a function to visualize the graph.
+
+By default, the vertices are laid out by force_layout, a force-directed layout whose repulsion is
+approximated on a hierarchy of grids in the manner of Barnes-Hut, so every iteration takes
+O(n log n) time rather than the O(n^2) of networkx.spring_layout. Positions can be cached to a
+file, so a large graph is laid out once and every later view (for example the neighbourhood of
+a course) reuses its positions.
 """
+from typing import Optional
+import os
 import networkx as nx
-from plotly.graph_objs import Scatter, Figure
+import numpy as np
+from plotly.graph_objs import Scatter, Scattergl, Figure
 import base
 
 # Colours to use when visualizing different clusters.
@@ -17,40 +26,76 @@ VERTEX_BORDER_COLOUR = 'rgb(50, 50, 50)'
 BOOK_COLOUR = 'rgb(89, 205, 105)'
 USER_COLOUR = 'rgb(105, 89, 205)'
 
+# The name of the layout computed by force_layout, rather than by a networkx layout function
+FORCE_LAYOUT = 'force_layout'
+# Above this number of vertices, the graph is drawn with WebGL rather than SVG
+WEBGL_MIN_VERTICES = 5000
+
+# The cells of the next level of the grid hierarchy that are the children of the 3 x 3 cells around
+# the parent of a cell, relative to twice the position of the parent
+_CHILD_OFFSETS = np.array([(dx, dy) for dx in range(-2, 4) for dy in range(-2, 4)], dtype=np.int64)
+# The 8 cells next to a cell, relative to its position
+_NEAR_OFFSETS = np.array([(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2) if (dx, dy) != (0, 0)],
+                         dtype=np.int64)
+
+
+def setup_graph(graph: base.Graph, layout: str = FORCE_LAYOUT, max_vertices: int = 50000,
+                course: Optional[str] = None, hops: int = 2, layout_path: str = '',
+                show: bool = True) -> Figure:
+    """Use plotly to set up the visuals for the given graph, and return the figure.
+
+    layout is FORCE_LAYOUT or the name of a networkx layout function, such as 'spring_layout'.
+    If course is given, only the vertices at most hops edges away from course are shown (see
+    base.Graph.to_arrays). If layout_path is given, the positions saved in it are reused, only
+    the vertices it does not have are laid out (around the saved ones by FORCE_LAYOUT), and only
+    their positions are added to it: the saved positions are never moved.
 
-def setup_graph(graph: base.Graph, layout: str = 'spring_layout', max_vertices: int = 50000) -> None:
-    """Use plotly and networkx to set up the visuals for the given graph.
+    Preconditions:
+        - layout == FORCE_LAYOUT or layout is the name of a networkx layout function
+        - max_vertices >= 1
+        - hops >= 0
     """
-    graph_nx = graph.to_networkx(max_vertices)
+    labels, kinds, sources, targets = graph.to_arrays(max_vertices, course, hops)
 
-    pos = getattr(nx, layout)(graph_nx)
+    cached = load_layout(layout_path) if layout_path != '' and os.path.isfile(layout_path) else {}
+    keys = [str(label) for label in labels]
+    known = np.array([key in cached for key in keys], dtype=bool)
+    positions = np.zeros((len(labels), 2))
+    if known.any():
+        positions[known] = [cached[key] for key, is_known in zip(keys, known) if is_known]
 
-    x_values = [pos[k][0] for k in graph_nx.nodes]
-    y_values = [pos[k][1] for k in graph_nx.nodes]
-    labels = list(graph_nx.nodes)
+    if not known.all():
+        if layout == FORCE_LAYOUT:
+            positions = force_layout(len(labels), sources, targets, positions, known)
+        else:
+            graph_nx = nx.Graph()
+            graph_nx.add_nodes_from(range(len(labels)))
+            graph_nx.add_edges_from(zip(sources.tolist(), targets.tolist()))
+            pos = getattr(nx, layout)(graph_nx)
+            laid_out = np.array([pos[i] for i in range(len(labels))], dtype=np.float64).reshape(-1, 2)
+            positions[~known] = laid_out[~known]
 
-    kinds = [graph_nx.nodes[k]['kind'] for k in graph_nx.nodes]
+        if layout_path != '':
+            cached.update((key, position) for key, position, is_known in zip(keys, positions.tolist(), known)
+                          if not is_known)
+            save_layout(layout_path, list(cached), np.array(list(cached.values())).reshape(-1, 2))
 
     colours = [BOOK_COLOUR if kind == 'book' else USER_COLOUR for kind in kinds]
+    x_edges, y_edges = edge_coordinates(positions, sources, targets)
 
-    x_edges = []
-    y_edges = []
-    for edge in graph_nx.edges:
-        x_edges += [pos[edge[0]][0], pos[edge[1]][0], None]
-        y_edges += [pos[edge[0]][1], pos[edge[1]][1], None]
-
-    trace3 = Scatter(x=x_edges,
+    scatter = Scattergl if len(labels) > WEBGL_MIN_VERTICES else Scatter
+    trace3 = scatter(x=x_edges,
                      y=y_edges,
                      mode='lines',
                      name='edges',
                      line=dict(color=LINE_COLOUR, width=1),
                      hoverinfo='none',
                      )
-    trace4 = Scatter(x=x_values,
-                     y=y_values,
+    trace4 = scatter(x=positions[:, 0],
+                     y=positions[:, 1],
                      mode='markers',
                      name='nodes',
-                     marker=dict(symbol='circle-dot',
+                     marker=dict(symbol='circle-dot' if scatter is Scatter else 'circle',
                                  size=5,
                                  color=colours,
                                  line=dict(color=VERTEX_BORDER_COLOUR, width=0.5)
@@ -65,8 +110,165 @@ def setup_graph(graph: base.Graph, layout: str = 'spring_layout', max_vertices:
     fig.update_layout({'showlegend': False})
     fig.update_xaxes(showgrid=False, zeroline=False, visible=False)
     fig.update_yaxes(showgrid=False, zeroline=False, visible=False)
-    fig.show()
+    if show:
+        fig.show()
+
+    return fig
+
+
+def edge_coordinates(positions: np.ndarray, sources: np.ndarray,
+                     targets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the x and y coordinates of the lines of the edges from sources to targets, as plotted
+    by plotly: the two ends of every edge followed by NaN, which breaks the line.
+
+    Preconditions:
+        - positions.shape == (n, 2) for some n
+        - len(sources) == len(targets)
+        - all(0 <= i < len(positions) for i in sources) and all(0 <= i < len(positions) for i in targets)
+    """
+    x_edges = np.full(3 * len(sources), np.nan)
+    y_edges = np.full(3 * len(sources), np.nan)
+    x_edges[0::3] = positions[sources, 0]
+    x_edges[1::3] = positions[targets, 0]
+    y_edges[0::3] = positions[sources, 1]
+    y_edges[1::3] = positions[targets, 1]
+    return x_edges, y_edges
+
+
+def force_layout(num_vertices: int, sources: np.ndarray, targets: np.ndarray,
+                 initial: Optional[np.ndarray] = None, fixed: Optional[np.ndarray] = None,
+                 iterations: int = 50, seed: int = 0) -> np.ndarray:
+    """Return the positions of num_vertices vertices joined by the edges from sources to targets,
+    as an array of shape (num_vertices, 2), laid out by the Fruchterman-Reingold algorithm.
+
+    The repulsion between every pair of vertices is approximated with _repulsion, so every
+    iteration takes O(n log n) time. The vertices marked in fixed keep their position in initial,
+    and the others start next to their fixed neighbours, or at random in the unit square if they
+    have none.
+
+    Preconditions:
+        - len(sources) == len(targets)
+        - initial is None or initial.shape == (num_vertices, 2)
+        - fixed is None or (initial is not None and fixed.shape == (num_vertices,))
+        - iterations >= 1
+    """
+    rng = np.random.default_rng(seed)
+    positions = rng.random((num_vertices, 2))
+    if fixed is None or not fixed.any():
+        fixed = np.zeros(num_vertices, dtype=bool)
+    else:
+        positions[fixed] = initial[fixed]
+        # Start every free vertex at the mean position of its fixed neighbours, if it has any
+        ends = np.concatenate([sources, targets])
+        others = np.concatenate([targets, sources])
+        from_fixed = fixed[others]
+        counts = np.bincount(ends[from_fixed], minlength=num_vertices)
+        for axis in range(2):
+            sums = np.bincount(ends[from_fixed], positions[others[from_fixed], axis], minlength=num_vertices)
+            placed = ~fixed & (counts > 0)
+            positions[placed, axis] = sums[placed] / counts[placed] + rng.normal(0, 0.01, placed.sum())
+    if num_vertices <= 1 or fixed.all():
+        return positions
+
+    # The ideal distance between vertices, for the vertices to fill a unit square
+    k = np.sqrt(1.0 / num_vertices)
+    # Enough levels for the cells of the finest grid to hold about one vertex each
+    levels = int(np.clip(np.ceil(np.log(num_vertices) / np.log(4)) + 1, 2, 11))
+    temperature = 0.1
+    for _ in range(iterations):
+        force = _repulsion(positions, k * k, levels)
+
+        delta = positions[targets] - positions[sources]
+        distance = np.sqrt((delta * delta).sum(axis=1))
+        pull = delta * (distance / k)[:, None]
+        for axis in range(2):
+            force[:, axis] += np.bincount(sources, pull[:, axis], minlength=num_vertices)
+            force[:, axis] -= np.bincount(targets, pull[:, axis], minlength=num_vertices)
+
+        length = np.maximum(np.sqrt((force * force).sum(axis=1)), 1e-9)
+        step = force * (np.minimum(length, temperature) / length)[:, None]
+        step[fixed] = 0
+        positions += step
+        temperature -= 0.1 / (iterations + 1)
+
+    return positions
+
+
+def _repulsion(positions: np.ndarray, k2: float, levels: int) -> np.ndarray:
+    """Return the repulsive force k2 / distance on every vertex at positions from all the others.
+
+    The bounding square of the vertices is divided into a grid of 2^level x 2^level cells for every
+    level from 2 to levels. At every level, the vertices of the cells that are not next to the cell
+    of a vertex, but that are in the cells next to its parent cell one level up, push the vertex as
+    a single mass at their centroid. Every other vertex is counted once, at the first level at which
+    its cell is not next to the vertex's; at the finest level, the vertices of the cells next to a
+    vertex and of its own cell push it from their centroids too.
+
+    Preconditions:
+        - positions.shape == (n, 2) for some n >= 2
+        - levels >= 2
+    """
+    x, y = positions[:, 0], positions[:, 1]
+    lowest = positions.min(axis=0)
+    span = max(float((positions.max(axis=0) - lowest).max()), 1e-12)
+    unit = (positions - lowest) * ((1 - 1e-9) / span)
+    force_x, force_y = np.zeros(len(positions)), np.zeros(len(positions))
+
+    for level in range(2, levels + 1):
+        size = 2 ** level
+        cell_x = (unit[:, 0] * size).astype(np.int64)
+        cell_y = (unit[:, 1] * size).astype(np.int64)
+        cell_ids = cell_x * size + cell_y
+        counts = np.bincount(cell_ids, minlength=size * size).astype(np.float64)
+        sums_x = np.bincount(cell_ids, x, minlength=size * size)
+        sums_y = np.bincount(cell_ids, y, minlength=size * size)
+
+        others_x = (2 * (cell_x // 2))[:, None] + _CHILD_OFFSETS[None, :, 0]
+        others_y = (2 * (cell_y // 2))[:, None] + _CHILD_OFFSETS[None, :, 1]
+        far = (np.abs(others_x - cell_x[:, None]) > 1) | (np.abs(others_y - cell_y[:, None]) > 1)
+        if level == levels:
+            others_x = np.concatenate([others_x, cell_x[:, None] + _NEAR_OFFSETS[None, :, 0]], axis=1)
+            others_y = np.concatenate([others_y, cell_y[:, None] + _NEAR_OFFSETS[None, :, 1]], axis=1)
+            far = np.concatenate([far, np.ones((len(positions), len(_NEAR_OFFSETS)), dtype=bool)], axis=1)
+
+        valid = far & (others_x >= 0) & (others_x < size) & (others_y >= 0) & (others_y < size)
+        others = np.where(valid, others_x * size + others_y, 0)
+        masses = np.where(valid, counts[others], 0)
+        delta_x = x[:, None] - sums_x[others] / np.maximum(masses, 1)
+        delta_y = y[:, None] - sums_y[others] / np.maximum(masses, 1)
+        push = masses * k2 / np.maximum(delta_x * delta_x + delta_y * delta_y, 1e-12)
+        force_x += (delta_x * push).sum(axis=1)
+        force_y += (delta_y * push).sum(axis=1)
+
+    # The other vertices of the cell of every vertex at the finest level, at their centroid
+    masses = counts[cell_ids] - 1
+    delta_x = x - (sums_x[cell_ids] - x) / np.maximum(masses, 1)
+    delta_y = y - (sums_y[cell_ids] - y) / np.maximum(masses, 1)
+    push = masses * k2 / np.maximum(delta_x * delta_x + delta_y * delta_y, 1e-12)
+    force_x += delta_x * push
+    force_y += delta_y * push
+
+    return np.stack([force_x, force_y], axis=1)
+
+
+def load_layout(path: str) -> dict[str, list[float]]:
+    """Return the position of every vertex saved at path by save_layout, by item (as a string)."""
+    with np.load(path) as saved:
+        return dict(zip(saved["items"].tolist(), saved["positions"].tolist()))
+
+
+def save_layout(path: str, items: list, positions: np.ndarray) -> None:
+    """Save the positions of the vertices of the given items to path, an .npz file. Items are saved
+    as strings, so vertices whose items have the same string share a position.
+
+    Preconditions:
+        - positions.shape == (len(items), 2)
+    """
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, items=np.array(items, dtype=str), positions=positions)
+    os.replace(tmp_path, path)
 
 
 if __name__ == '__main__':
-    print(setup_graph(base.load_graph("dataset/review_full.csv", "dataset/course.csv")))
+    setup_graph(base.load_graph("dataset/review_full.csv", "dataset/course.csv", "dataset/review_full.snapshot"),
+                layout_path="dataset/review_full.layout.npz")